@@ -3,80 +3,595 @@ Enhanced Flask API for OvCare
 Provides ML predictions with temporal analysis
 """
 
-from flask import Flask, request, jsonify
+import time
+
+# Boot clock for the per-phase startup breakdown (see /ready)
+STARTUP_BEGAN = time.perf_counter()
+
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
-import pickle
+import hmac
 import numpy as np
 import os
 import json
+import sqlite3
 from datetime import datetime
 import sys
 
 # Import temporal analysis module
 from temporal_analysis import (
     extract_temporal_features,
+    extract_temporal_features_from_columns,
     adjust_risk_with_temporal_features,
-    get_risk_tier
+    temporal_risk_multiplier,
+    get_risk_tier,
+    get_risk_tiers
 )
+from prediction_cache import PredictionCache
+from model_manager import ModelManager, load_model_bundle, load_bundle_from_path
+from model_artifact import HEADER_FILE
+from drift_monitor import DriftMonitor
+from cascade import CascadeStats, DECISION_BOUNDARIES, decision_boundaries
+from feature_schema import BASE_FEATURE_DEFAULTS, TEMPORAL_FEATURE_COLUMNS, FEATURE_NAMES
+from attributions import attributor_for, top_contributions
+from risk_queue import RISK_QUEUE_DB_PATH
+from request_codec import decode_request_body
+from request_profiler import RequestProfile, ProfileStore, sample_profile
+from metrics import (
+    BATCH_SIZE_BUCKETS,
+    capture_stages,
+    time_stage,
+    observe,
+    inc,
+    set_gauge,
+    clear_gauge,
+    set_current_endpoint,
+    flush as flush_metrics,
+    render_prometheus
+)
+
+# Milliseconds per boot phase: imports, metadata load, model load, first inference
+startup_timings = {'imports_ms': (time.perf_counter() - STARTUP_BEGAN) * 1000}
 
 app = Flask(__name__)
 CORS(app)
 
-# Load model
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "model.pkl")
-METADATA_PATH = os.path.join(os.path.dirname(__file__), "model_metadata.json")
-
-if not os.path.exists(MODEL_PATH):
-    raise RuntimeError(f"model.pkl not found at {MODEL_PATH}. Run train.py first.")
-
-with open(MODEL_PATH, "rb") as f:
-    model = pickle.load(f)
-
-# Load metadata if available
-metadata = {}
-if os.path.exists(METADATA_PATH):
-    with open(METADATA_PATH, 'r') as f:
-        metadata = json.load(f)
-
-print("=" * 80)
-print("OvCare ML API Server")
-print("=" * 80)
-print(f"Model loaded from: {MODEL_PATH}")
-if metadata:
-    print(f"Model version: {metadata.get('model_version', 'Unknown')}")
-    print(f"Model type: {metadata.get('model_type', 'Unknown')}")
-    print(f"Training date: {metadata.get('training_date', 'Unknown')}")
-    metrics = metadata.get('metrics', {})
-    if metrics:
-        print(f"Model accuracy: {metrics.get('accuracy', 0):.4f}")
-print("=" * 80)
-
-
-def get_default_temporal_features():
-    """Get default temporal features when no history is available"""
-    return {
-        'CA125_velocity': 0.0,
-        'HE4_velocity': 0.0,
-        'CA125_acceleration': 0.0,
-        'HE4_acceleration': 0.0,
-        'CA125_HE4_ratio': 0.0,
-        'CA125_ma_7d': 0.0,
-        'HE4_ma_7d': 0.0,
-        'CA125_ma_30d': 0.0,
-        'HE4_ma_30d': 0.0,
-        'CA125_std_30d': 0.0,
-        'HE4_std_30d': 0.0
+# Load model (swappable at runtime through model_manager)
+model_bundle = load_model_bundle()
+startup_timings.update(model_bundle.load_timings)
+
+MAX_BATCH_SIZE = int(os.environ.get("OVCARE_MAX_BATCH_SIZE", 10000))
+
+# Per-patient streaming temporal state, opened on first use
+temporal_state_store = None
+
+# Background risk recompute queue, opened once the worker has created it
+risk_queue = None
+
+
+def new_model_caches():
+    """
+    Prediction and attribution caches for one hosted model
+    
+    Each model gets its own pair: a cache flushes whenever it sees a new
+    version token, so models sharing one would flush each other.
+    
+    Returns:
+        Tuple of (prediction cache, attribution cache)
+    """
+    return (
+        # Single-row model outputs; OVCARE_PREDICTION_CACHE_SIZE=0 disables it
+        PredictionCache(
+            max_size=int(os.environ.get("OVCARE_PREDICTION_CACHE_SIZE", 4096)),
+            ttl_seconds=float(os.environ.get("OVCARE_PREDICTION_CACHE_TTL", 300))
+        ),
+        # Single-row feature attributions; OVCARE_ATTRIBUTION_CACHE_SIZE=0 disables it
+        PredictionCache(
+            max_size=int(os.environ.get("OVCARE_ATTRIBUTION_CACHE_SIZE", 4096)),
+            ttl_seconds=float(os.environ.get("OVCARE_PREDICTION_CACHE_TTL", 300))
+        )
+    )
+
+
+# Caches of the default model
+prediction_cache, attribution_cache = new_model_caches()
+
+# Admin-requested request profiles (X-Profile: 1 or ?profile=1)
+profile_store = ProfileStore()
+
+# Number of per-prediction feature contributions returned
+ATTRIBUTION_TOP_N = int(os.environ.get("OVCARE_ATTRIBUTION_TOP_N", 5))
+
+# Streaming comparison of scored inputs with the training profile; OVCARE_DRIFT_MONITOR=0 disables it
+drift_monitor = None
+if os.environ.get("OVCARE_DRIFT_MONITOR", "1").lower() in ("1", "true", "yes"):
+    drift_monitor = DriftMonitor(
+        FEATURE_NAMES, window_seconds=float(os.environ.get("OVCARE_DRIFT_WINDOW_SECONDS", 3600))
+    )
+
+# Cascade scoring: the model's distilled screener answers rows far from every
+# risk tier boundary, the full ensemble the rest; OVCARE_CASCADE=0 disables it
+cascade_stats = None
+if os.environ.get("OVCARE_CASCADE", "1").lower() in ("1", "true", "yes"):
+    cascade_stats = CascadeStats(audit_rate=float(os.environ.get("OVCARE_CASCADE_AUDIT_RATE", 0.01)))
+
+# Optional micro-batching of concurrent single-row predictions (OVCARE_MICRO_BATCHING=1)
+micro_batcher = None
+if os.environ.get("OVCARE_MICRO_BATCHING", "0").lower() in ("1", "true", "yes"):
+    from micro_batcher import MicroBatcher
+    micro_batcher = MicroBatcher(
+        max_batch_size=int(os.environ.get("OVCARE_MICRO_BATCH_MAX_SIZE", 32)),
+        max_wait_ms=float(os.environ.get("OVCARE_MICRO_BATCH_MAX_WAIT_MS", 2))
+    )
+
+
+def extract_feature_importance(top_n=10, bundle=None):
+    """Extract top N feature importances (sorted once when the model loads)"""
+    return (bundle or model_manager.active).feature_importance[:top_n]
+
+
+def staged_predict_proba(model, X):
+    """
+    predict_proba with the scaler and the tree ensemble timed as separate stages
+    
+    Args:
+        model: sklearn Pipeline, CompiledEnsemble or bare classifier
+        X: Feature matrix
+        
+    Returns:
+        Class probabilities
+    """
+    if hasattr(model, "steps"):
+        with time_stage('scaler'):
+            Xt = model[:-1].transform(X)
+        with time_stage('ensemble'):
+            return model[-1].predict_proba(Xt)
+    if hasattr(model, "prepare"):
+        with time_stage('scaler'):
+            Xt = model.prepare(X)
+        with time_stage('ensemble'):
+            return model.predict_proba(Xt, prepared=True)
+    with time_stage('ensemble'):
+        return model.predict_proba(X)
+
+
+def active_screener(bundle):
+    """The bundle's cascade screener, or None when the cascade is off or untrained"""
+    return bundle.screener if cascade_stats is not None else None
+
+
+def predict_row(X, bundle, risk_multiplier=1.0, model_name=None):
+    """
+    Run the model on a single-row feature matrix through the prediction cache
+    
+    Args:
+        X: NumPy array of shape (1, n_features)
+        bundle: ModelBundle the request is being served with
+        risk_multiplier: Temporal multiplier the caller tiers the risk with;
+                         moves the boundaries the cascade screener must clear
+        model_name: Hosted model the bundle belongs to (default: the default
+                    model, the only one feeding the drift monitor and shadow model)
+        
+    Returns:
+        Tuple of (predicted class, probability row or None, 'screener' or 'ensemble')
+    """
+    model = bundle.model
+    screener = active_screener(bundle)
+    boundaries = DECISION_BOUNDARIES
+    variant = None
+    if screener is not None and risk_multiplier != 1.0:
+        boundaries = decision_boundaries(risk_multiplier)
+        # Whether the screener may answer depends on the boundaries
+        variant = f"x{risk_multiplier!r}"
+    primary_ms = None
+    
+    def score_full():
+        if micro_batcher is not None:
+            with time_stage('micro_batch'):
+                return micro_batcher.predict_proba_row(X[0], bundle)
+        return staged_predict_proba(model, X)[0]
+    
+    def compute():
+        nonlocal primary_ms
+        if not hasattr(model, "predict_proba"):
+            return int(model.predict(X)[0]), None, 'ensemble'
+        # One pass: the label is the most probable class
+        start = time.perf_counter()
+        fast = False
+        if screener is not None:
+            with time_stage('screener'):
+                screen_proba, fast = screener.screen(X, boundaries)
+            fast = bool(fast[0])
+            cascade_stats.record(1, int(fast))
+        proba = np.array([1.0 - screen_proba[0], screen_proba[0]]) if fast else score_full()
+        primary_ms = (time.perf_counter() - start) * 1000
+        if fast and cascade_stats.audit_sample(1):
+            with time_stage('cascade_audit'):
+                cascade_stats.record_audit(screen_proba, score_full()[1:2], boundaries)
+        return int(model.classes_[np.argmax(proba)]), proba, 'screener' if fast else 'ensemble'
+    
+    cache = prediction_caches[model_name or DEFAULT_MODEL_NAME]
+    pred, proba, scored_by = cache.get_or_compute(X, bundle.version_token, compute, variant)
+    if model_name not in (None, DEFAULT_MODEL_NAME):
+        return pred, proba, scored_by
+    if drift_monitor is not None:
+        drift_monitor.update(X, bundle)
+    # Screener answers would make shadow disagreement measure the screener
+    if shadow_scorer is not None and proba is not None and scored_by == 'ensemble':
+        shadow_scorer.submit(X, proba[1:2], bundle.version_token, primary_ms)
+    return pred, proba, scored_by
+
+
+def parse_request_payload():
+    """
+    Decode the request body into a payload dictionary
+    
+    Accepts JSON (the default), MessagePack and the columnar binary format of
+    request_codec, each optionally gzip-compressed (Content-Encoding: gzip).
+    """
+    return decode_request_body(
+        request.get_data(cache=False),
+        request.mimetype,
+        request.headers.get("Content-Encoding")
+    )
+
+
+def explain_rows(X, bundle, top_n=ATTRIBUTION_TOP_N, model_name=None):
+    """
+    Per-row feature contributions (path-dependent TreeSHAP, log-odds units)
+    
+    Args:
+        X: Feature matrix in model column order
+        bundle: ModelBundle the rows were scored with
+        top_n: Contributions returned per row, largest magnitude first
+        model_name: Hosted model the bundle belongs to (selects its cache)
+        
+    Returns:
+        List with one {"base_value", "contributions"} dictionary per row, or
+        None if the model cannot be explained
+    """
+    attributor = attributor_for(bundle)
+    if attributor is None:
+        return None
+    with time_stage('explain'):
+        if len(X) == 1:
+            contributions = attribution_caches[model_name or DEFAULT_MODEL_NAME].get_or_compute(
+                X, bundle.version_token, lambda: attributor.contributions(X)
+            )
+        else:
+            contributions = attributor.contributions(X)
+        return [
+            {
+                "base_value": attributor.expected_value,
+                "contributions": top_contributions(contributions[i], X[i], bundle.feature_names, top_n)
+            }
+            for i in range(len(X))
+        ]
+
+
+def get_temporal_state_store():
+    """Get the shared temporal state store, creating it on first use"""
+    global temporal_state_store
+    if temporal_state_store is None:
+        from temporal_state import TemporalStateStore
+        temporal_state_store = TemporalStateStore()
+    return temporal_state_store
+
+
+def build_batch_feature_matrix(data, schema):
+    """
+    Build a 2-D feature matrix for a batch of patients
+    
+    Args:
+        data: Either {"records": [...]} with one /predict payload per row, or
+              {"columns": {...}} with one array per feature name
+        schema: FeatureSchema of the model scoring the batch
+        
+    Returns:
+        NumPy array of shape (n_rows, n_features) in model column order, with
+        the same ratio and moving-average fallbacks as /predict
+    """
+    X = schema.matrix(data)
+    if len(X) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch size {len(X)} exceeds limit of {MAX_BATCH_SIZE}")
+    return X
+
+
+def build_warmup_matrix(bundle, n_rows=64):
+    """
+    Synthetic feature matrix around the default inputs for model warm-up
+    
+    Args:
+        bundle: ModelBundle to warm up (supplies the column layout)
+        n_rows: Number of rows to generate
+        
+    Returns:
+        NumPy array of shape (n_rows, n_features)
+    """
+    rng = np.random.default_rng(0)
+    columns = {
+        name: (np.full(n_rows, float(default)) * rng.uniform(0.5, 1.5, n_rows)).tolist()
+        for name, default in BASE_FEATURE_DEFAULTS
     }
+    return build_batch_feature_matrix({'columns': columns}, bundle.schema)
 
 
-def extract_feature_importance(top_n=10):
-    """Extract top N feature importances"""
-    if not metadata or 'feature_importance' not in metadata:
-        return []
+def record_startup_warmup(warmup):
+    """Add the startup model's warm-up to the boot breakdown and log it with the model"""
+    startup_timings.update({
+        'first_inference_ms': warmup['batch_ms'],
+        'attributions_ms': warmup['attributions_ms'],
+        'ready_ms': (time.perf_counter() - STARTUP_BEGAN) * 1000
+    })
+    for phase, ms in startup_timings.items():
+        set_gauge('ovcare_startup_phase_seconds', ms / 1000, phase=phase[:-3])
+    bundle = model_manager.active
+    print(f"OvCare ML API ready: model {bundle.version_token} ({bundle.engine}) from {bundle.source}")
+    print("Startup (ms): " + ", ".join(f"{phase[:-3]}={ms:.1f}" for phase, ms in startup_timings.items()))
+
+
+# Active model plus background reload/warm-up/swap
+model_manager = ModelManager(model_bundle, warmup_rows=build_warmup_matrix)
+
+# Name of the 25-feature temporal model; the only one the temporal endpoints,
+# drift monitor and shadow model use
+DEFAULT_MODEL_NAME = "default"
+
+# The 14-feature model of the retired python-ml service
+LEGACY_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "python-ml", "model.pkl")
+
+
+def configured_models():
+    """
+    Extra named models to host next to the default one
     
-    feature_imp = metadata['feature_importance']
-    sorted_features = sorted(feature_imp.items(), key=lambda x: x[1], reverse=True)
-    return sorted_features[:top_n]
+    OVCARE_MODELS="name=path,..." where each path is a model.pkl file or a
+    model_artifact/ directory. Unset, the legacy 14-feature model is hosted
+    as "legacy" when python-ml/model.pkl exists.
+    
+    Returns:
+        Dictionary of model name to path
+    """
+    spec = os.environ.get("OVCARE_MODELS")
+    if spec is None:
+        return {"legacy": LEGACY_MODEL_PATH} if os.path.exists(LEGACY_MODEL_PATH) else {}
+    models = {}
+    for entry in filter(None, (item.strip() for item in spec.split(","))):
+        name, _, path = entry.partition("=")
+        if not name.strip() or not path.strip():
+            raise ValueError(f"OVCARE_MODELS entries must look like name=path, got {entry!r}")
+        models[name.strip()] = path.strip()
+    return models
+
+
+# Every hosted model by name, each with its own reload, warm-up and caches
+model_managers = {DEFAULT_MODEL_NAME: model_manager}
+prediction_caches = {DEFAULT_MODEL_NAME: prediction_cache}
+attribution_caches = {DEFAULT_MODEL_NAME: attribution_cache}
+for _name, _path in configured_models().items():
+    if _name in model_managers:
+        raise ValueError(f"Model name {_name!r} is reserved")
+    try:
+        _bundle = load_bundle_from_path(_path)
+    except Exception as e:
+        print(f"Model {_name!r} unavailable: {e}")
+        continue
+    print(f"Model {_name!r}: {len(_bundle.feature_names)} features, {_bundle.engine}, from {_bundle.source}")
+    model_managers[_name] = ModelManager(
+        _bundle, warmup_rows=build_warmup_matrix,
+        loader=lambda path=_path: load_bundle_from_path(path),
+        watch_paths=(os.path.join(_path, HEADER_FILE) if os.path.isdir(_path) else _path,)
+    )
+    prediction_caches[_name], attribution_caches[_name] = new_model_caches()
+
+for _manager in model_managers.values():
+    _manager.start_watcher(float(os.environ.get("OVCARE_MODEL_WATCH_INTERVAL", 0)))
+
+# Optional shadow model (OVCARE_SHADOW_MODEL: a candidate model.pkl or
+# model_artifact/ directory) scored on a copy of live traffic in the background
+shadow_scorer = None
+if os.environ.get("OVCARE_SHADOW_MODEL"):
+    from shadow_scoring import ShadowScorer, load_shadow_bundle
+    shadow_scorer = ShadowScorer(
+        lambda: load_shadow_bundle(os.environ["OVCARE_SHADOW_MODEL"], os.environ.get("OVCARE_SHADOW_METADATA")),
+        warmup_rows=build_warmup_matrix,
+        max_queue_size=int(os.environ.get("OVCARE_SHADOW_QUEUE_SIZE", 256)),
+        workers=int(os.environ.get("OVCARE_SHADOW_WORKERS", 1))
+    )
+
+# Warm up (first inference, attribution tables) off the import path; /ready
+# answers 503 until it has finished. OVCARE_BLOCKING_WARMUP=1 warms up before
+# the app is returned instead, e.g. for gunicorn --preload
+if os.environ.get("OVCARE_BLOCKING_WARMUP", "0").lower() in ("1", "true", "yes"):
+    warmup = model_manager.warm_up_active()
+    if warmup is not None:
+        record_startup_warmup(warmup)
+    for _manager in model_managers.values():
+        if _manager is not model_manager:
+            _manager.warm_up_active()
+else:
+    for _manager in model_managers.values():
+        _manager.start_warm_up(on_ready=record_startup_warmup if _manager is model_manager else None)
+
+
+def get_model_manager(name):
+    """
+    ModelManager of a hosted model
+    
+    Raises:
+        KeyError: If no model of that name is hosted
+    """
+    manager = model_managers.get(name or DEFAULT_MODEL_NAME)
+    if manager is None:
+        raise KeyError(f"Unknown model {name!r}; hosted models: {sorted(model_managers)}")
+    return manager
+
+
+def is_admin_request():
+    """Check the X-Admin-Token header against OVCARE_ADMIN_TOKEN"""
+    token = os.environ.get("OVCARE_ADMIN_TOKEN")
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), token)
+
+
+def score_with_temporal_features(data, temporal_features, bundle):
+    """
+    Score one patient given their temporal features
+    
+    Args:
+        data: Request payload with the base biomarker fields
+        temporal_features: Dictionary from extract_temporal_features
+        bundle: ModelBundle the request is being served with
+        
+    Returns:
+        Response dictionary shared by the temporal prediction endpoints
+    """
+    # Construct feature vector; moving averages and the ratio come from
+    # history as they are, without the /predict fallbacks
+    X = bundle.schema.row(
+        data,
+        temporal={column: temporal_features[key] for key, column in TEMPORAL_FEATURE_COLUMNS.items()},
+        fallbacks=False
+    )
+    
+    # Make base prediction
+    pred, proba, scored_by = predict_row(X, bundle, temporal_risk_multiplier(temporal_features))
+    base_prob = 0.5
+    
+    if proba is not None:
+        base_prob = float(proba[1])
+    
+    # Adjust risk with temporal analysis
+    with time_stage('adjust_risk'):
+        adjusted_prob = adjust_risk_with_temporal_features(base_prob, temporal_features)
+    
+    # Determine risk tier
+    risk_tier = get_risk_tier(adjusted_prob)
+    
+    # Calculate confidence
+    confidence = float(max(proba)) if proba is not None else 0.5
+    
+    # Get top influencing factors
+    top_features = extract_feature_importance(5, bundle)
+    
+    result = {
+        "risk": int(pred),
+        "probability": adjusted_prob,
+        "base_probability": base_prob,
+        "confidence": confidence,
+        "risk_tier": risk_tier,
+        "temporal_features": temporal_features,
+        "top_features": top_features,
+        "model_version": bundle.version,
+        "scored_by": scored_by,
+        "trend_direction": temporal_features['trend_direction']
+    }
+    if data.get("explain", True):
+        explanations = explain_rows(X, bundle)
+        if explanations is not None:
+            result["feature_contributions"] = explanations[0]
+    return result
+
+
+@app.before_request
+def start_request_metrics():
+    """Remember when the request started and label its stage timings"""
+    request.metrics_start = time.perf_counter()
+    set_current_endpoint(request.endpoint or 'unmatched')
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency"""
+    endpoint = request.endpoint or 'unmatched'
+    start = getattr(request, 'metrics_start', None)
+    if start is not None:
+        observe('ovcare_request_duration_seconds', time.perf_counter() - start, endpoint=endpoint)
+    inc('ovcare_requests_total', endpoint=endpoint, status=str(response.status_code),
+        model_version=model_manager.active.version_token)
+    if response.status_code >= 400:
+        inc('ovcare_request_errors_total', endpoint=endpoint)
+    set_current_endpoint(None)
+    flush_metrics()
+    return response
+
+
+@app.before_request
+def start_request_profile():
+    """Profile this request if an admin asked for it (X-Profile: 1 or ?profile=1)"""
+    flag = request.headers.get("X-Profile") or request.args.get("profile")
+    if not flag or flag.lower() not in ("1", "true", "yes"):
+        return None
+    if not is_admin_request():
+        return jsonify({"error": "Admin token required for profiling"}), 403
+    request.profile = RequestProfile()
+    capture_stages(request.profile.stages)
+    request.profile.start()
+    return None
+
+
+@app.after_request
+def finish_request_profile(response):
+    """Store the profile and attach it to a JSON object response"""
+    profile = getattr(request, 'profile', None)
+    if profile is None:
+        return response
+    profile.stop()
+    capture_stages(None)
+    report = dict(profile.report(), path=request.path, status=response.status_code)
+    profile_store.add(report)
+    response.headers["X-Profile-Id"] = profile.id
+    if response.is_json:
+        body = response.get_json(silent=True)
+        if isinstance(body, dict):
+            body["profile"] = report
+            response.set_data(json.dumps(body))
+    return response
+
+
+@app.teardown_request
+def stop_request_profile(exc):
+    """Never leave the profiler running on this thread, even after an error"""
+    profile = getattr(request, 'profile', None)
+    if profile is not None and profile.running:
+        profile.stop()
+        capture_stages(None)
+
+
+def risk_queue_gauges():
+    """Current backlog of the background risk recompute queue, if it exists"""
+    global risk_queue
+    if risk_queue is None:
+        if not os.path.exists(RISK_QUEUE_DB_PATH):
+            return []
+        from risk_queue import RiskJobQueue
+        risk_queue = RiskJobQueue(RISK_QUEUE_DB_PATH)
+    try:
+        backlog = risk_queue.backlog()
+    except sqlite3.Error as e:
+        print(f"Risk queue backlog unavailable: {e}")
+        return []
+    gauges = [
+        ('ovcare_risk_queue_jobs', {'status': status}, backlog[status])
+        for status in ('pending', 'running', 'failed')
+    ]
+    gauges.append(('ovcare_risk_queue_oldest_pending_seconds', {}, backlog['oldest_pending_seconds']))
+    if backlog['heartbeat_age_seconds'] is not None:
+        gauges.append(('ovcare_risk_worker_heartbeat_age_seconds', {}, backlog['heartbeat_age_seconds']))
+    return gauges
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Request, stage latency and batch-size metrics in the Prometheus text format"""
+    bundle = model_manager.active
+    clear_gauge('ovcare_model_info')
+    set_gauge('ovcare_model_info', 1, version=bundle.version_token, engine=bundle.engine)
+    live_gauges = risk_queue_gauges()
+    if drift_monitor is not None:
+        live_gauges += drift_monitor.psi_gauges()
+    return Response(render_prometheus(live_gauges=live_gauges), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/", methods=["GET"])
@@ -84,13 +599,27 @@ def home():
     """API home endpoint"""
     return jsonify({
         "service": "OvCare ML API",
-        "version": metadata.get('model_version', '2.0.0'),
+        "version": model_manager.active.version,
         "status": "running",
         "endpoints": {
-            "/predict": "POST - Make risk prediction",
+            "/predict": "POST - Make risk prediction (?model= picks a hosted model)",
+            "/models": "GET - Hosted models and their input columns",
+            "/models/<name>/predict": "POST - Make risk prediction with a named model",
             "/predict-temporal": "POST - Make prediction with temporal analysis",
+            "/predict-batch": "POST - Make risk predictions for many patients at once",
+            "/predict-incremental": "POST - Add one new reading to stored patient state and predict",
+            "/temporal-state/rebuild": "POST - Rebuild stored patient state from full history",
             "/model-info": "GET - Get model information",
-            "/health": "GET - Health check"
+            "/cache-stats": "GET - Prediction cache counters",
+            "/micro-batch-stats": "GET - Micro-batching queue and batch-size statistics",
+            "/shadow-stats": "GET - Shadow model disagreement and latency statistics",
+            "/drift": "GET - Drift of scored inputs from the training feature distribution",
+            "/cascade-stats": "GET - Fast-path fraction and agreement of the cascade screener",
+            "/admin/reload-model": "POST - Load, warm up and swap in the model on disk (admin)",
+            "/admin/profiles": "GET - Stored request profiles; profile a request with X-Profile: 1 (admin)",
+            "/admin/profile/sample": "POST - Time-boxed sampling profile of in-flight requests (admin)",
+            "/health": "GET - Health check",
+            "/ready": "GET - Readiness check, 503 until every model is warmed up"
         }
     })
 
@@ -101,74 +630,219 @@ def health():
     return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
 
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness check for the load balancer: 200 only after every hosted model is warmed up"""
+    body = {
+        "ready": all(manager.ready for manager in model_managers.values()),
+        "active_version": model_manager.active.version_token,
+        "startup_ms": startup_timings
+    }
+    if len(model_managers) > 1:
+        body["models"] = {name: manager.ready for name, manager in model_managers.items()}
+    if not body["ready"]:
+        body["warmup_error"] = model_manager.last_error
+        if len(model_managers) > 1:
+            body["warmup_errors"] = {
+                name: manager.last_error for name, manager in model_managers.items() if not manager.ready
+            }
+        return jsonify(body), 503
+    return jsonify(body)
+
+
 @app.route("/model-info", methods=["GET"])
 def model_info():
-    """Get model information"""
+    """Get model information (?model= for a hosted model other than the default)"""
+    try:
+        bundle = get_model_manager(request.args.get("model")).active
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    metadata = bundle.metadata
     return jsonify({
         "model_version": metadata.get('model_version', 'Unknown'),
         "model_type": metadata.get('model_type', 'Unknown'),
+        "inference_engine": bundle.engine,
         "training_date": metadata.get('training_date', 'Unknown'),
-        "features": metadata.get('features', []),
+        "features": bundle.feature_names,
         "metrics": metadata.get('metrics', {}),
-        "top_features": extract_feature_importance(15)
+        "top_features": extract_feature_importance(15, bundle),
+        "active_version": bundle.version_token,
+        "loaded_at": bundle.loaded_at,
+        "swapped_at": bundle.swapped_at
     })
 
 
-@app.route("/predict", methods=["POST"])
-def predict():
+@app.route("/models", methods=["GET"])
+def list_models():
+    """Hosted models with their input columns and readiness"""
+    return jsonify({
+        "default": DEFAULT_MODEL_NAME,
+        "models": {
+            name: {
+                "features": manager.active.feature_names,
+                "n_features": len(manager.active.feature_names),
+                "inference_engine": manager.active.engine,
+                "source": manager.active.source,
+                "active_version": manager.active.version_token,
+                "ready": manager.ready
+            }
+            for name, manager in model_managers.items()
+        }
+    })
+
+
+@app.route("/cache-stats", methods=["GET"])
+def cache_stats():
+    """Prediction cache hit/miss/eviction counters (default model; other hosted models under "models")"""
+    body = dict(prediction_cache.stats(), attributions=attribution_cache.stats())
+    if len(prediction_caches) > 1:
+        body["models"] = {
+            name: dict(cache.stats(), attributions=attribution_caches[name].stats())
+            for name, cache in prediction_caches.items() if name != DEFAULT_MODEL_NAME
+        }
+    return jsonify(body)
+
+
+@app.route("/micro-batch-stats", methods=["GET"])
+def micro_batch_stats():
+    """Queue depth, batch-size histogram and added wait time"""
+    if micro_batcher is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(micro_batcher.stats(), enabled=True))
+
+
+@app.route("/shadow-stats", methods=["GET"])
+def shadow_stats():
+    """Disagreement and latency of the shadow model against the primary"""
+    if shadow_scorer is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(shadow_scorer.stats(), enabled=True))
+
+
+@app.route("/cascade-stats", methods=["GET"])
+def cascade_statistics():
+    """Fraction of rows the cascade screener answered and its agreement with the full model"""
+    if cascade_stats is None:
+        return jsonify({"enabled": False, "reason": "OVCARE_CASCADE=0"})
+    bundle = model_manager.active
+    if bundle.screener is None:
+        return jsonify({"enabled": False, "reason": "Active model has no cascade screener; retrain to enable it"})
+    cascade = bundle.metadata['cascade']
+    return jsonify(dict(
+        cascade_stats.stats(),
+        enabled=True,
+        screener=cascade['hyperparameters'],
+        error_bands=cascade['bands'],
+        holdout=cascade['holdout']
+    ))
+
+
+@app.route("/drift", methods=["GET"])
+def feature_drift():
+    """Per-feature drift (PSI, KS, mean shift) of scored inputs against the training profile"""
+    if drift_monitor is None:
+        return jsonify({"enabled": False, "reason": "OVCARE_DRIFT_MONITOR=0"})
+    report = drift_monitor.report()
+    if request.args.get("summary") in ("1", "true"):
+        for window in ('recent', 'lifetime'):
+            if window in report:
+                report[window].pop('features', None)
+    return jsonify(report)
+
+
+@app.route("/admin/profiles", methods=["GET"])
+def list_profiles():
+    """Request profiles stored by this worker, newest first (admin)"""
+    if not is_admin_request():
+        return jsonify({"error": "Admin token required"}), 403
+    return jsonify({"profiles": profile_store.summaries()})
+
+
+@app.route("/admin/profiles/<profile_id>", methods=["GET"])
+def get_profile(profile_id):
+    """One stored request profile (admin)"""
+    if not is_admin_request():
+        return jsonify({"error": "Admin token required"}), 403
+    report = profile_store.get(profile_id)
+    if report is None:
+        return jsonify({"error": f"No profile {profile_id} on this worker"}), 404
+    return jsonify(report)
+
+
+@app.route("/admin/profile/sample", methods=["POST"])
+def sample_requests():
     """
-    Basic prediction endpoint (backward compatible)
-    Accepts biomarker data and returns risk prediction
+    Sample the stacks of all in-flight requests for ?seconds=5 (admin)
+    ?interval_ms sets the sampling interval, ?all_threads=1 includes
+    background threads
     """
+    if not is_admin_request():
+        return jsonify({"error": "Admin token required"}), 403
     try:
-        data = request.get_json(force=True)
-        
-        # Extract base features
-        age = float(data.get("Age", 50))
-        ca125 = float(data.get("CA125_Level", 35))
-        he4 = float(data.get("HE4_Level", 100))
-        ldh = float(data.get("LDH_Level", 180))
-        hemoglobin = float(data.get("Hemoglobin", 13))
-        wbc = float(data.get("WBC", 7000))
-        platelets = float(data.get("Platelets", 250000))
-        ovary_size = float(data.get("Ovary_Size", 3.5))
-        fatigue = float(data.get("Fatigue_Level", 5))
-        pelvic_pain = float(data.get("Pelvic_Pain", 0))
-        abdominal_bloating = float(data.get("Abdominal_Bloating", 0))
-        early_satiety = float(data.get("Early_Satiety", 0))
-        menstrual_irreg = float(data.get("Menstrual_Irregularities", 0))
-        weight_change = float(data.get("Weight_Change", 0))
-        
-        # Get temporal features (with defaults if not provided)
-        temporal = get_default_temporal_features()
-        if 'temporal_features' in data:
-            temporal.update(data['temporal_features'])
-        
-        # Construct feature vector
-        X = np.array([[
-            age, ca125, he4, ldh, hemoglobin, wbc, platelets, 
-            ovary_size, fatigue, pelvic_pain, abdominal_bloating, 
-            early_satiety, menstrual_irreg, weight_change,
-            temporal['CA125_velocity'],
-            temporal['HE4_velocity'],
-            temporal['CA125_acceleration'],
-            temporal['HE4_acceleration'],
-            temporal['CA125_HE4_ratio'] if temporal['CA125_HE4_ratio'] else (ca125 / (he4 + 1e-6)),
-            temporal['CA125_ma_7d'] if temporal['CA125_ma_7d'] else ca125,
-            temporal['HE4_ma_7d'] if temporal['HE4_ma_7d'] else he4,
-            temporal['CA125_ma_30d'] if temporal['CA125_ma_30d'] else ca125,
-            temporal['HE4_ma_30d'] if temporal['HE4_ma_30d'] else he4,
-            temporal['CA125_std_30d'],
-            temporal['HE4_std_30d']
-        ]])
+        result = sample_profile(
+            float(request.args.get("seconds", 5)),
+            interval_ms=float(request.args.get("interval_ms", 5)),
+            all_threads=request.args.get("all_threads") in ("1", "true")
+        )
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+
+@app.route("/admin/reload-model", methods=["POST"])
+def reload_model():
+    """
+    Reload the model from disk without restarting the worker
+    Runs in the background unless ?wait=1 is given; ?model= reloads a
+    hosted model other than the default
+    """
+    if not is_admin_request():
+        return jsonify({"error": "Admin token required"}), 403
+    try:
+        manager = get_model_manager(request.args.get("model"))
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    
+    if request.args.get("wait") in ("1", "true"):
+        result = manager.reload()
+    else:
+        result = manager.reload_async()
+    result["model"] = manager.status()
+    return jsonify(result), 500 if result["status"] == "failed" else 202 if result["status"] == "started" else 200
+
+
+def predict_with_model(name=None):
+    """
+    Score one patient with a hosted model
+    
+    Args:
+        name: Hosted model name; defaults to ?model=, then the payload's
+              "model" field, then the default model
+        
+    Returns:
+        Flask response shared by /predict and /models/<name>/predict
+    """
+    try:
+        with time_stage('parse'):
+            data = parse_request_payload()
+        name = name or request.args.get("model") or data.get("model") or DEFAULT_MODEL_NAME
+        try:
+            manager = get_model_manager(name)
+        except KeyError as e:
+            return jsonify({"error": e.args[0]}), 404
+        bundle = manager.active
+        
+        # Base fields plus optional "temporal_features" into the model's columns
+        X = bundle.schema.row(data)
         
         # Make prediction
-        pred = model.predict(X)[0]
+        pred, proba, scored_by = predict_row(X, bundle, model_name=name)
         prob = None
         confidence = 0.5
         
-        if hasattr(model, "predict_proba"):
-            proba = model.predict_proba(X)[0]
+        if proba is not None:
             prob = float(proba[1])
             confidence = float(max(proba))
         
@@ -176,21 +850,45 @@ def predict():
         risk_tier = get_risk_tier(prob if prob else 0.5)
         
         # Get top influencing factors
-        top_features = extract_feature_importance(5)
+        top_features = extract_feature_importance(5, bundle)
         
-        return jsonify({
+        result = {
             "risk": int(pred),
             "probability": prob,
             "confidence": confidence,
             "risk_tier": risk_tier,
             "top_features": top_features,
-            "model_version": metadata.get('model_version', '2.0.0')
-        })
+            "model_version": bundle.version,
+            "scored_by": scored_by
+        }
+        if data.get("explain", True):
+            explanations = explain_rows(X, bundle, model_name=name)
+            if explanations is not None:
+                result["feature_contributions"] = explanations[0]
+        
+        with time_stage('serialize'):
+            return jsonify(result)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
+@app.route("/predict", methods=["POST"])
+def predict():
+    """
+    Basic prediction endpoint (backward compatible)
+    Accepts biomarker data and returns risk prediction; ?model= or a
+    "model" field picks a hosted model other than the default
+    """
+    return predict_with_model()
+
+
+@app.route("/models/<name>/predict", methods=["POST"])
+def predict_named(name):
+    """Prediction with a named model (same payload and response as /predict)"""
+    return predict_with_model(name)
+
+
 @app.route("/predict-temporal", methods=["POST"])
 def predict_temporal():
     """
@@ -198,76 +896,208 @@ def predict_temporal():
     Accepts biomarker data with history and returns enhanced risk prediction
     """
     try:
-        data = request.get_json(force=True)
-        
-        # Extract base features
-        age = float(data.get("Age", 50))
-        ca125 = float(data.get("CA125_Level", 35))
-        he4 = float(data.get("HE4_Level", 100))
-        ldh = float(data.get("LDH_Level", 180))
-        hemoglobin = float(data.get("Hemoglobin", 13))
-        wbc = float(data.get("WBC", 7000))
-        platelets = float(data.get("Platelets", 250000))
-        ovary_size = float(data.get("Ovary_Size", 3.5))
-        fatigue = float(data.get("Fatigue_Level", 5))
-        pelvic_pain = float(data.get("Pelvic_Pain", 0))
-        abdominal_bloating = float(data.get("Abdominal_Bloating", 0))
-        early_satiety = float(data.get("Early_Satiety", 0))
-        menstrual_irreg = float(data.get("Menstrual_Irregularities", 0))
-        weight_change = float(data.get("Weight_Change", 0))
-        
-        # Extract temporal features from history
-        biomarker_history = data.get('history', [])
-        temporal_features = extract_temporal_features(biomarker_history)
-        
-        # Construct feature vector
-        X = np.array([[
-            age, ca125, he4, ldh, hemoglobin, wbc, platelets, 
-            ovary_size, fatigue, pelvic_pain, abdominal_bloating, 
-            early_satiety, menstrual_irreg, weight_change,
-            temporal_features['ca125_velocity'],
-            temporal_features['he4_velocity'],
-            temporal_features['ca125_acceleration'],
-            temporal_features['he4_acceleration'],
-            temporal_features['ca125_he4_ratio'],
-            temporal_features['ca125_ma_7d'],
-            temporal_features['he4_ma_7d'],
-            temporal_features['ca125_ma_30d'],
-            temporal_features['he4_ma_30d'],
-            temporal_features['ca125_std_30d'],
-            temporal_features['he4_std_30d']
-        ]])
-        
-        # Make base prediction
-        pred = model.predict(X)[0]
-        base_prob = 0.5
+        with time_stage('parse'):
+            data = parse_request_payload()
+        
+        # Extract temporal features from history, sent either as a list of
+        # readings or as ca125 / he4 / recorded_at column arrays
+        with time_stage('temporal_features'):
+            if 'history_columns' in data:
+                columns = data['history_columns']
+                missing = [key for key in ('recorded_at', 'ca125', 'he4') if key not in columns]
+                if missing:
+                    raise ValueError(f"history_columns is missing {missing}")
+                temporal_features = extract_temporal_features_from_columns(
+                    columns['recorded_at'], columns['ca125'], columns['he4']
+                )
+            else:
+                temporal_features = extract_temporal_features(data.get('history', []))
+        
+        result = score_with_temporal_features(data, temporal_features, model_manager.active)
+        with time_stage('serialize'):
+            return jsonify(result)
         
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/predict-batch", methods=["POST"])
+def predict_batch():
+    """
+    Batch prediction endpoint
+    Scores many patients with a single model pass and vectorized tiering;
+    ?model= or a "model" field picks a hosted model
+    """
+    try:
+        with time_stage('parse'):
+            data = parse_request_payload()
+        name = request.args.get("model") or data.get("model") or DEFAULT_MODEL_NAME
+        try:
+            manager = get_model_manager(name)
+        except KeyError as e:
+            return jsonify({"error": e.args[0]}), 404
+        bundle = manager.active
+        model = bundle.model
+        monitor = name == DEFAULT_MODEL_NAME
+        with time_stage('features'):
+            X = build_batch_feature_matrix(data, bundle.schema)
+        observe('ovcare_batch_size', len(X), BATCH_SIZE_BUCKETS, endpoint='predict_batch')
+        
+        if len(X) == 0:
+            return jsonify({"predictions": [], "count": 0, "model_version": bundle.version})
+        
+        screener = active_screener(bundle)
+        scored_by = None
         if hasattr(model, "predict_proba"):
-            proba = model.predict_proba(X)[0]
-            base_prob = float(proba[1])
+            start = time.perf_counter()
+            if screener is not None:
+                # Full ensemble only for the rows the screener cannot settle
+                with time_stage('screener'):
+                    screen_proba, fast = screener.screen(X)
+                proba = np.column_stack([1.0 - screen_proba, screen_proba])
+                ensemble_ms = None
+                if not fast.all():
+                    ensemble_start = time.perf_counter()
+                    proba[~fast] = staged_predict_proba(model, X[~fast])
+                    ensemble_ms = (time.perf_counter() - ensemble_start) * 1000
+                scored_by = np.where(fast, 'screener', 'ensemble')
+            else:
+                proba = staged_predict_proba(model, X)
+            primary_ms = (time.perf_counter() - start) * 1000
+            if screener is not None:
+                cascade_stats.record(len(X), int(fast.sum()))
+                audited = np.flatnonzero(fast)[cascade_stats.audit_sample(int(fast.sum()))]
+                if len(audited):
+                    with time_stage('cascade_audit'):
+                        cascade_stats.record_audit(
+                            screen_proba[audited], model.predict_proba(X[audited])[:, 1], DECISION_BOUNDARIES
+                        )
+            preds = model.classes_[np.argmax(proba, axis=1)]
+            probs = proba[:, 1]
+            confidences = proba.max(axis=1)
+            if shadow_scorer is not None and monitor:
+                # Only rows the ensemble scored: screener answers would make
+                # shadow disagreement measure the screener
+                if screener is None:
+                    shadow_scorer.submit(X, probs, bundle.version_token, primary_ms)
+                elif ensemble_ms is not None:
+                    shadow_scorer.submit(X[~fast], probs[~fast], bundle.version_token, ensemble_ms)
+        else:
+            preds = model.predict(X)
+            probs = np.full(len(X), 0.5)
+            confidences = np.full(len(X), 0.5)
         
-        # Adjust risk with temporal analysis
-        adjusted_prob = adjust_risk_with_temporal_features(base_prob, temporal_features)
+        risk_tiers = get_risk_tiers(probs)
+        if drift_monitor is not None and monitor:
+            drift_monitor.update(X, bundle)
         
-        # Determine risk tier
-        risk_tier = get_risk_tier(adjusted_prob)
+        # Per-row attributions only on request; they cost more than scoring
+        explanations = explain_rows(X, bundle, model_name=name) if data.get("explain") else None
         
-        # Calculate confidence
-        confidence = float(max(proba)) if hasattr(model, "predict_proba") else 0.5
+        with time_stage('serialize'):
+            predictions = [
+                {
+                    "risk": risk,
+                    "probability": prob,
+                    "confidence": confidence,
+                    "risk_tier": tier
+                }
+                for risk, prob, confidence, tier in zip(
+                    preds.astype(int).tolist(), probs.tolist(),
+                    confidences.tolist(), risk_tiers.tolist()
+                )
+            ]
+            if scored_by is not None:
+                for prediction, path in zip(predictions, scored_by.tolist()):
+                    prediction["scored_by"] = path
+            if explanations is not None:
+                for prediction, explanation in zip(predictions, explanations):
+                    prediction["feature_contributions"] = explanation
+
+            return jsonify({
+                "predictions": predictions,
+                "count": len(predictions),
+                "top_features": extract_feature_importance(5, bundle),
+                "model_version": bundle.version
+            })
         
-        # Get top influencing factors
-        top_features = extract_feature_importance(5)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/predict-incremental", methods=["POST"])
+def predict_incremental():
+    """
+    Prediction with temporal analysis from stored per-patient state
+    Accepts only the new reading; temporal features are updated in O(1).
+    recorded_at is required, and resending the latest reading does not add
+    it again, so the call is safe to retry
+    """
+    try:
+        with time_stage('parse'):
+            data = parse_request_payload()
+        
+        patient_id = data.get('patient_id')
+        if patient_id is None:
+            raise ValueError("patient_id is required")
+        
+        reading = data.get('reading') or {
+            'ca125': data.get("CA125_Level", 35),
+            'he4': data.get("HE4_Level", 100),
+            'recorded_at': data.get('recorded_at')
+        }
+        if not reading.get('recorded_at'):
+            # A server-side timestamp would turn every retry into a new reading
+            raise ValueError("recorded_at is required")
+        
+        with time_stage('temporal_state'):
+            temporal_features, readings_seen, duplicate = get_temporal_state_store().update(
+                patient_id,
+                float(reading['ca125']),
+                float(reading['he4']),
+                reading['recorded_at']
+            )
+        
+        result = score_with_temporal_features(data, temporal_features, model_manager.active)
+        result["readings_seen"] = readings_seen
+        result["duplicate_reading"] = duplicate
+        with time_stage('serialize'):
+            return jsonify(result)
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/temporal-state/rebuild", methods=["POST"])
+def rebuild_temporal_state():
+    """
+    Replace a patient's stored temporal state by replaying their history
+    Also reports any mismatch against extract_temporal_features
+    """
+    try:
+        with time_stage('parse'):
+            data = parse_request_payload()
+        
+        patient_id = data.get('patient_id')
+        if patient_id is None:
+            raise ValueError("patient_id is required")
+        
+        from temporal_state import PatientTemporalState, compare_with_batch
+        
+        biomarker_history = data.get('history', [])
+        temporal_features, readings_seen = get_temporal_state_store().rebuild(
+            patient_id, biomarker_history
+        )
+        mismatches = compare_with_batch(
+            PatientTemporalState.from_history(biomarker_history), biomarker_history
+        )
         
         return jsonify({
-            "risk": int(pred),
-            "probability": adjusted_prob,
-            "base_probability": base_prob,
-            "confidence": confidence,
-            "risk_tier": risk_tier,
+            "patient_id": patient_id,
+            "readings_seen": readings_seen,
             "temporal_features": temporal_features,
-            "top_features": top_features,
-            "model_version": metadata.get('model_version', '2.0.0'),
-            "trend_direction": temporal_features['trend_direction']
+            "matches_batch": not mismatches,
+            "mismatches": mismatches
         })
         
     except Exception as e:
@@ -275,5 +1105,7 @@ def predict_temporal():
 
 
 if __name__ == "__main__":
+    # Development server only; run serve.py in production
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True)
+    debug = os.environ.get("OVCARE_DEBUG", "0").lower() in ("1", "true", "yes")
+    app.run(host="0.0.0.0", port=port, debug=debug, threaded=True)
@@ -0,0 +1,236 @@
+"""
+Per-Prediction Feature Attributions for OvCare
+Path-dependent TreeSHAP contributions computed directly from the flattened
+tree ensemble, vectorized over every leaf of every tree and over rows
+"""
+
+import threading
+import weakref
+
+import numpy as np
+
+from compiled_model import CompiledEnsemble, compile_pipeline
+
+# Upper bound on (rows x leaves x path slots) evaluated at once
+CHUNK_ELEMENTS = 500_000
+
+# Largest per-leaf lookup table (leaves x 2^depth x depth values) to precompute;
+# deeper ensembles evaluate the integral per request instead
+TABLE_MAX_ELEMENTS = 16_000_000
+
+
+class TreeAttributor:
+    """
+    Exact path-dependent TreeSHAP for a CompiledEnsemble
+
+    Every leaf is reduced to its root path: the distinct features split on,
+    the fraction of training cover that follows the path for each of them
+    (zero fraction z) and, per row, whether the row follows the path on that
+    feature (one fraction o). A leaf with value v then contributes
+
+        phi_i = v * (o_i - z_i) * integral_0^1 prod_{j != i} (z_j (1 - t) + o_j t) dt
+
+    to feature i, which is the Shapley weighting of TreeSHAP written as a
+    Beta integral. The integrand is a polynomial of degree < max_depth, so a
+    few Gauss-Legendre points evaluate it exactly, for all leaves and rows in
+    a handful of array operations. Paths are padded to the ensemble depth
+    with z = o = 1 slots, which change neither the product nor any phi.
+
+    A leaf's contributions depend only on which of its (at most max_depth)
+    path features the row follows, so for shallow ensembles they are
+    precomputed for every follow pattern and a request is reduced to a
+    pattern code per leaf and a table lookup.
+
+    Contributions are in log-odds (margin) units: expected_value plus the
+    row's contributions equals the model's margin for that row.
+    """
+
+    def __init__(self, ensemble):
+        if ensemble.cover is None:
+            raise ValueError("Model has no node cover; retrain to enable attributions")
+        self.ensemble = ensemble
+        self._build_paths()
+
+    def _build_paths(self):
+        """Flatten every root-to-leaf path into padded per-leaf arrays"""
+        e = self.ensemble
+        feature = np.asarray(e.feature)
+        threshold = np.asarray(e.threshold)
+        left = np.asarray(e.left)
+        missing = np.asarray(e.missing)
+        value = np.asarray(e.value)
+        cover = np.asarray(e.cover)
+
+        leaves = []
+        for root in np.asarray(e.roots).tolist():
+            stack = [(root, ())]
+            while stack:
+                node, path = stack.pop()
+                child = int(left[node])
+                if child == node:
+                    leaves.append((node, path))
+                    continue
+                stack.append((child, path + ((node, child),)))
+                stack.append((child + 1, path + ((node, child + 1),)))
+
+        n_leaves = len(leaves)
+        n_slots = max(1, max(len(path) for _, path in leaves))
+        self.leaf_value = np.array([value[leaf] for leaf, _ in leaves]) * e.scale
+        self.slot_feature = np.zeros((n_leaves, n_slots), dtype=np.intp)
+        self.slot_zero = np.ones((n_leaves, n_slots))
+        # Repeated splits on one feature along a path bound it to an interval;
+        # the row follows the path on that feature when it falls inside
+        self.slot_low = np.full((n_leaves, n_slots), -np.inf)
+        self.slot_high = np.full((n_leaves, n_slots), np.inf)
+        self.slot_missing = np.ones((n_leaves, n_slots), dtype=bool)
+
+        for i, (_, path) in enumerate(leaves):
+            slots = {}
+            for parent, child in path:
+                f = int(feature[parent])
+                slot = slots.setdefault(f, len(slots))
+                self.slot_feature[i, slot] = f
+                self.slot_zero[i, slot] *= cover[child] / cover[parent] if cover[parent] > 0 else 0.0
+                if child == left[parent]:
+                    self.slot_high[i, slot] = min(self.slot_high[i, slot], threshold[parent])
+                else:
+                    self.slot_low[i, slot] = max(self.slot_low[i, slot], threshold[parent])
+                self.slot_missing[i, slot] &= bool(missing[parent] == child)
+
+        self.expected_value = e.base_margin + float(self.leaf_value @ self.slot_zero.prod(axis=1))
+
+        # Integrand degree is at most n_slots - 1
+        nodes, weights = np.polynomial.legendre.leggauss(max(1, (n_slots + 1) // 2))
+        self._t = (nodes + 1) / 2
+        self._w = weights / 2
+        self._leaf_index = np.arange(n_leaves)
+
+        # phi of every leaf under every follow pattern (bit s set: follows slot s)
+        self._table = None
+        if n_leaves * n_slots << n_slots <= TABLE_MAX_ELEMENTS:
+            patterns = np.arange(1 << n_slots)
+            one = ((patterns[:, None] >> np.arange(n_slots)) & 1).astype(float)
+            one = np.broadcast_to(one[:, None, :], (len(patterns), n_leaves, n_slots))
+            # Flattened to (leaf, pattern) rows so a lookup is a single take()
+            self._table = np.ascontiguousarray(self._phi(one).transpose(1, 0, 2)).reshape(-1, n_slots)
+            self._table_row = self._leaf_index << n_slots
+
+    @property
+    def n_leaves(self):
+        return len(self.leaf_value)
+
+    def contributions(self, X, prepared=False):
+        """
+        Feature contributions for each row
+
+        Args:
+            X: Array of shape (n_rows, n_features) with unscaled features
+            prepared: X has already been through the ensemble's prepare()
+
+        Returns:
+            NumPy array of shape (n_rows, n_features) in log-odds units
+        """
+        if not prepared:
+            X = self.ensemble.prepare(X)
+        n_rows, n_features = X.shape
+        out = np.zeros((n_rows, n_features))
+        chunk_rows = max(1, CHUNK_ELEMENTS // self.slot_zero.size)
+        for start in range(0, n_rows, chunk_rows):
+            out[start:start + chunk_rows] = self._contributions(X[start:start + chunk_rows])
+        return out
+
+    def _phi(self, one):
+        """
+        Per-leaf, per-slot contributions for the given one fractions
+
+        Args:
+            one: Array of shape (n, n_leaves, n_slots) of 0/1 one fractions
+
+        Returns:
+            Array of the same shape
+        """
+        zero = self.slot_zero
+        integral = np.zeros(one.shape)
+        for t, w in zip(self._t, self._w):
+            factor = zero * (1.0 - t) + one * t
+            product = factor.prod(axis=2, keepdims=True)
+            integral += w * np.divide(product, factor, out=np.zeros_like(factor), where=factor > 0)
+        return self.leaf_value[:, None] * (one - zero) * integral
+
+    def _contributions(self, X):
+        """Contributions for one chunk of prepared rows"""
+        n_rows, n_features = X.shape
+        x = X.take(self.slot_feature, axis=1)
+        if self.ensemble.strict_less:
+            follows = (x >= self.slot_low) & (x < self.slot_high)
+        else:
+            follows = (x > self.slot_low) & (x <= self.slot_high)
+        is_missing = np.isnan(x)
+        if is_missing.any():
+            follows = np.where(is_missing, self.slot_missing, follows)
+
+        if self._table is not None:
+            code = follows[..., 0].astype(np.intp)
+            for slot in range(1, follows.shape[2]):
+                code |= follows[..., slot].astype(np.intp) << slot
+            phi = self._table.take(self._table_row + code, axis=0)
+        else:
+            phi = self._phi(follows.astype(float))
+
+        index = np.arange(n_rows)[:, None, None] * n_features + self.slot_feature
+        return np.bincount(index.ravel(), weights=phi.ravel(), minlength=n_rows * n_features).reshape(
+            n_rows, n_features
+        )
+
+
+_attributors = weakref.WeakKeyDictionary()
+_attributors_lock = threading.Lock()
+
+
+def attributor_for(bundle):
+    """
+    TreeAttributor for a ModelBundle, built once per bundle
+
+    Returns:
+        TreeAttributor, or None if the model cannot be explained (the reason
+        is logged once)
+    """
+    with _attributors_lock:
+        if bundle in _attributors:
+            return _attributors[bundle]
+        try:
+            ensemble = bundle.model
+            if not isinstance(ensemble, CompiledEnsemble) or ensemble.cover is None:
+                if bundle.pipeline is None:
+                    raise ValueError("Model artifact has no node cover; retrain to enable attributions")
+                ensemble = compile_pipeline(bundle.pipeline)
+            attributor = TreeAttributor(ensemble)
+        except Exception as e:
+            print(f"Feature attributions unavailable for {bundle.version_token}: {e}")
+            attributor = None
+        _attributors[bundle] = attributor
+        return attributor
+
+
+def top_contributions(contributions, values, feature_names, top_n=5):
+    """
+    Largest contributions of one row as response entries
+
+    Args:
+        contributions: Contribution vector of one row
+        values: Feature values of that row
+        feature_names: Names in model column order
+        top_n: Number of entries, by absolute contribution
+
+    Returns:
+        List of {"feature", "value", "contribution"} dictionaries
+    """
+    order = np.argsort(-np.abs(contributions), kind='stable')[:top_n]
+    return [
+        {
+            "feature": feature_names[j],
+            "value": float(values[j]),
+            "contribution": float(contributions[j])
+        }
+        for j in order.tolist()
+    ]
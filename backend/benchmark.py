@@ -0,0 +1,306 @@
+"""
+Benchmark Suite for OvCare
+Measures the ML service and temporal analysis hot paths and writes the
+results as JSON (p50/p95/p99 latency and rows/sec) for before/after comparison
+
+Usage:
+    python benchmark.py [--quick] [--only predict,temporal,load,train] [--output results.json]
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+SECTIONS = ('predict', 'temporal', 'load', 'train')
+
+
+def summarize(samples, rows_per_call=1):
+    """
+    Latency percentiles and throughput for a list of per-call durations
+
+    Args:
+        samples: Durations in seconds
+        rows_per_call: Rows (or readings) processed by each call
+
+    Returns:
+        Dictionary of summary statistics
+    """
+    samples_ms = np.asarray(samples) * 1000
+    total_seconds = float(np.sum(samples))
+    return {
+        'iterations': len(samples),
+        'rows_per_call': rows_per_call,
+        'mean_ms': float(samples_ms.mean()),
+        'p50_ms': float(np.percentile(samples_ms, 50)),
+        'p95_ms': float(np.percentile(samples_ms, 95)),
+        'p99_ms': float(np.percentile(samples_ms, 99)),
+        'max_ms': float(samples_ms.max()),
+        'rows_per_sec': rows_per_call * len(samples) / total_seconds if total_seconds else 0.0
+    }
+
+
+def measure(fn, iterations, rows_per_call=1, warmup=3):
+    """Run fn repeatedly after a warm-up and summarize the timings"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, rows_per_call)
+
+
+def make_history(n_readings, seed=0):
+    """Synthetic biomarker history in the /predict-temporal request format"""
+    rng = np.random.default_rng(seed)
+    start = datetime(2020, 1, 1)
+    days = np.cumsum(rng.integers(1, 15, n_readings))
+    ca125 = np.abs(35 + np.cumsum(rng.normal(0, 3, n_readings)))
+    he4 = np.abs(100 + np.cumsum(rng.normal(0, 5, n_readings)))
+    return [
+        {'ca125': float(c), 'he4': float(h), 'recorded_at': (start + timedelta(days=int(d))).isoformat()}
+        for c, h, d in zip(ca125, he4, days)
+    ]
+
+
+def make_patient(seed=0):
+    """Synthetic /predict payload"""
+    rng = np.random.default_rng(seed)
+    return {
+        "Age": int(rng.integers(30, 80)),
+        "CA125_Level": float(rng.uniform(5, 300)),
+        "HE4_Level": float(rng.uniform(20, 400)),
+        "LDH_Level": float(rng.uniform(120, 260)),
+        "Hemoglobin": float(rng.uniform(10, 15)),
+        "WBC": float(rng.uniform(4000, 11000)),
+        "Platelets": float(rng.uniform(150000, 400000)),
+        "Ovary_Size": float(rng.uniform(2, 6)),
+        "Fatigue_Level": int(rng.integers(0, 10)),
+        "Pelvic_Pain": int(rng.integers(0, 2)),
+        "Abdominal_Bloating": int(rng.integers(0, 2)),
+        "Early_Satiety": int(rng.integers(0, 2)),
+        "Menstrual_Irregularities": int(rng.integers(0, 2)),
+        "Weight_Change": float(rng.uniform(-3, 3))
+    }
+
+
+def post_json(client, path, payload):
+    """POST through the Flask test client and fail loudly on errors"""
+    response = client.post(path, json=payload)
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)}")
+    return response
+
+
+def post_body(client, path, body, content_type, content_encoding=None):
+    """POST a pre-encoded body through the Flask test client"""
+    headers = {'Content-Encoding': content_encoding} if content_encoding else {}
+    response = client.post(path, data=body, content_type=content_type, headers=headers)
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)}")
+    return response
+
+
+def bench_predict(quick):
+    """Single-row and batch latency of the prediction endpoints (no network)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as service
+    from request_codec import COLUMNAR_CONTENT_TYPE, encode_columnar
+    client = service.app.test_client()
+    iterations = 50 if quick else 300
+    results = {'inference_engine': service.model_manager.active.engine}
+
+    payloads = [make_patient(i) for i in range(iterations + 3)]
+    counter = iter(range(10 ** 9))
+    results['predict_single'] = measure(
+        lambda: post_json(client, '/predict', payloads[next(counter) % len(payloads)]), iterations
+    )
+    results['predict_single_no_explain'] = measure(
+        lambda: post_json(client, '/predict', dict(payloads[next(counter) % len(payloads)], explain=False)),
+        iterations
+    )
+
+    for history_length in (1, 10, 100) if quick else (1, 10, 100, 1000):
+        payload = dict(make_patient(history_length), history=make_history(history_length))
+        results[f'predict_temporal_history_{history_length}'] = measure(
+            lambda: post_json(client, '/predict-temporal', payload), iterations
+        )
+
+    for batch_size in (10, 100, 1000) if quick else (10, 100, 1000, 5000):
+        records = [make_patient(i) for i in range(batch_size)]
+        results[f'predict_batch_{batch_size}'] = measure(
+            lambda: post_json(client, '/predict-batch', {'records': records}),
+            max(5, iterations // 10), rows_per_call=batch_size
+        )
+
+        results[f'predict_batch_{batch_size}_explain'] = measure(
+            lambda: post_json(client, '/predict-batch', {'records': records, 'explain': True}),
+            max(5, iterations // 10), rows_per_call=batch_size
+        )
+
+        # Same rows as a columnar binary body, plain and gzip-compressed
+        columns = {name: [record[name] for record in records] for name in records[0]}
+        body = encode_columnar(columns)
+        results[f'predict_batch_{batch_size}_columnar'] = measure(
+            lambda: post_body(client, '/predict-batch', body, COLUMNAR_CONTENT_TYPE),
+            max(5, iterations // 10), rows_per_call=batch_size
+        )
+        compressed = gzip.compress(body)
+        results[f'predict_batch_{batch_size}_columnar_gzip'] = measure(
+            lambda: post_body(client, '/predict-batch', compressed, COLUMNAR_CONTENT_TYPE, 'gzip'),
+            max(5, iterations // 10), rows_per_call=batch_size
+        )
+
+    return results
+
+
+def bench_temporal(quick):
+    """extract_temporal_features throughput as history length grows"""
+    from temporal_analysis import extract_temporal_features, extract_temporal_features_columnar
+
+    results = {}
+    for n_readings in (1, 10, 100, 1000, 10000):
+        history = make_history(n_readings)
+        iterations = 5 if n_readings >= 10000 else (20 if quick else 100)
+        results[f'extract_temporal_features_{n_readings}'] = measure(
+            lambda: extract_temporal_features(history), iterations, rows_per_call=n_readings
+        )
+
+    n_patients, per_patient = (1000, 10) if quick else (10000, 30)
+    rng = np.random.default_rng(0)
+    patient_ids = np.repeat(np.arange(n_patients), per_patient)
+    timestamps = np.datetime64('2020-01-01') + rng.integers(0, 3650, len(patient_ids)).astype('timedelta64[D]')
+    ca125 = rng.uniform(5, 300, len(patient_ids))
+    he4 = rng.uniform(20, 400, len(patient_ids))
+    results[f'columnar_{n_patients}_patients_x_{per_patient}'] = measure(
+        lambda: extract_temporal_features_columnar(patient_ids, timestamps, ca125, he4),
+        5, rows_per_call=len(patient_ids)
+    )
+    return results
+
+
+def bench_load(quick):
+    """Model load time from model.pkl and from the memory-mapped artifact"""
+    from model_manager import load_model_bundle
+    from model_artifact import read_artifact_header
+
+    iterations = 3 if quick else 10
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        results['load_model_pickle'] = measure(
+            lambda: load_model_bundle(model_format='pickle'), iterations, warmup=1
+        )
+        if read_artifact_header() is not None:
+            results['load_model_mmap'] = measure(
+                lambda: load_model_bundle(model_format='mmap'), iterations, warmup=1
+            )
+    return results
+
+
+def scale_training_csv(source_path, destination_path, factor, seed=0):
+    """
+    Write train.csv repeated `factor` times with jittered numeric columns
+    and distinct patient ids
+    """
+    import pandas as pd
+
+    df = pd.read_csv(source_path)
+    rng = np.random.default_rng(seed)
+    numeric = df.select_dtypes(include='number').columns.drop('Probability_of_Cancer', errors='ignore')
+    copies = []
+    for i in range(factor):
+        copy = df.copy()
+        if i:
+            copy[numeric] = copy[numeric] * rng.uniform(0.97, 1.03, size=(len(copy), len(numeric)))
+            copy['Patient_ID'] = copy['Patient_ID'].astype(str) + f"-{i}"
+        copies.append(copy)
+    pd.concat(copies, ignore_index=True).to_csv(destination_path, index=False)
+
+
+def bench_train(quick):
+    """train.py end-to-end time on train.csv scaled up synthetically"""
+    import train
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="ovcare-bench-")
+    original = (train.CSV_PATH, train.MODEL_PATH, train.METADATA_PATH, train.ARTIFACT_DIR,
+                train.TRAINING_CACHE_DIR, train.SCREENER_DIR, train.TRAINING_ROWS_PATH)
+    try:
+        train.MODEL_PATH = os.path.join(workdir, "model.pkl")
+        train.METADATA_PATH = os.path.join(workdir, "model_metadata.json")
+        train.ARTIFACT_DIR = os.path.join(workdir, "model_artifact")
+        train.TRAINING_CACHE_DIR = os.path.join(workdir, "training_cache")
+        train.SCREENER_DIR = os.path.join(workdir, "screener_artifact")
+        train.TRAINING_ROWS_PATH = os.path.join(workdir, "model_training_rows.npz")
+        for factor in (1, 2) if quick else (1, 5, 10):
+            train.CSV_PATH = os.path.join(workdir, f"train_x{factor}.csv")
+            scale_training_csv(original[0], train.CSV_PATH, factor)
+            n_rows = sum(1 for _ in open(train.CSV_PATH)) - 1
+            with contextlib.redirect_stdout(io.StringIO()):
+                # First run parses the CSV and fills the feature cache, second reuses it
+                results[f'train_x{factor}'] = measure(lambda: train.main([]), 1, rows_per_call=n_rows, warmup=0)
+                results[f'train_x{factor}_cached'] = measure(
+                    lambda: train.main([]), 1, rows_per_call=n_rows, warmup=0
+                )
+    finally:
+        (train.CSV_PATH, train.MODEL_PATH, train.METADATA_PATH, train.ARTIFACT_DIR,
+         train.TRAINING_CACHE_DIR, train.SCREENER_DIR, train.TRAINING_ROWS_PATH) = original
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OvCare performance benchmarks")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and smaller sizes")
+    parser.add_argument("--only", default=",".join(SECTIONS),
+                        help=f"comma-separated sections to run ({', '.join(SECTIONS)})")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--with-cache", action="store_true",
+                        help="leave the prediction cache enabled while benchmarking endpoints")
+    args = parser.parse_args(argv)
+
+    if not args.with_cache:
+        os.environ["OVCARE_PREDICTION_CACHE_SIZE"] = "0"
+
+    sections = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+
+    runners = {'predict': bench_predict, 'temporal': bench_temporal, 'load': bench_load, 'train': bench_train}
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'quick': args.quick,
+        'results': {}
+    }
+    for name in sections:
+        print(f"Running {name} benchmarks...", file=sys.stderr)
+        report['results'][name] = runners[name](args.quick)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+        print(f"Results written to: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
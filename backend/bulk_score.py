@@ -0,0 +1,305 @@
+"""
+Offline Bulk Scoring for OvCare
+Re-scores every record of a CSV export (same columns as train.csv) with the
+current model. Temporal features are computed from each patient's own history
+as of each record, chunks are scored across a process pool with the model
+loaded once per worker, and results are written in input order. Memory stays
+bounded: the CSV is streamed, patient history is spilled to disk partitions
+and only a few chunks are in flight at a time.
+
+Usage:
+    python bulk_score.py input.csv output.csv [--model PATH] [--workers N] [--chunk-rows N]
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from feature_backfill import DATE_COLUMN, PATIENT_COLUMN, backfill_temporal_features, parse_record_dates
+from feature_schema import TEMPORAL_FEATURE_COLUMNS
+from model_manager import load_bundle_from_path, load_model_bundle
+from serve import available_cpus
+from temporal_analysis import get_risk_tiers, temporal_risk_multipliers
+from training_data import DEFAULT_CHUNK_ROWS, csv_columns, iter_column_chunks
+
+# Columns temporal features are computed from
+HISTORY_INPUTS = [PATIENT_COLUMN, DATE_COLUMN, 'CA125_Level', 'HE4_Level']
+
+# CSV bytes per history partition (about 125,000 train.csv records); a worker
+# holds one partition's readings and features while backfilling it
+PARTITION_BYTES = 32 * 1024 * 1024
+
+# Scoring chunks in flight per worker: enough to keep workers busy while the
+# main process parses and writes, few enough to bound memory
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+PROGRESS_INTERVAL_SECONDS = 5.0
+
+# One spilled reading: input row number, patient id hash, record day, CA125, HE4
+SPILL_DTYPE = np.dtype([
+    ('row', '<i8'), ('patient', '<u8'), ('day', '<i8'), ('ca125', '<f8'), ('he4', '<f8')
+])
+
+# Model inputs per worker process, set by _init_worker
+_worker = {}
+
+
+def load_scoring_bundle(model_path=None):
+    """
+    Model to score with
+
+    Args:
+        model_path: A model.pkl file or a model_artifact/ directory; defaults
+                    to the model the API serves
+
+    Returns:
+        ModelBundle (without a cascade screener: every row gets the full model)
+    """
+    if model_path is None:
+        return load_model_bundle(screener_dir=None)
+    return load_bundle_from_path(model_path)
+
+
+def _init_worker(model_path, temporal_path):
+    """Load the model once per worker process"""
+    _worker['bundle'] = load_scoring_bundle(model_path)
+    _worker['temporal_path'] = temporal_path
+
+
+def spill_history(csv_path, directory, n_partitions, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Stream the history columns into per-partition files, every patient's
+    readings in one partition and in input order
+
+    Records missing any of HISTORY_INPUTS are left out and get no temporal
+    features.
+
+    Args:
+        csv_path: Input CSV
+        directory: Directory for the partition files
+        n_partitions: Number of partitions
+        chunk_rows: Rows per CSV chunk
+
+    Returns:
+        Tuple of (partition file paths, total rows in the CSV)
+    """
+    paths = [os.path.join(directory, f"history-{i:04d}.bin") for i in range(n_partitions)]
+    files = [open(path, 'wb') for path in paths]
+    rows = 0
+    try:
+        for chunk in iter_column_chunks(csv_path, HISTORY_INPUTS, chunk_rows):
+            valid = chunk.notna().all(axis=1).to_numpy()
+            history = chunk[valid]
+            records = np.empty(len(history), dtype=SPILL_DTYPE)
+            records['row'] = rows + np.flatnonzero(valid)
+            records['patient'] = pd.util.hash_array(history[PATIENT_COLUMN].astype(str).to_numpy(dtype=object))
+            records['day'] = parse_record_dates(history[DATE_COLUMN]).astype(np.int64)
+            records['ca125'] = history['CA125_Level'].to_numpy()
+            records['he4'] = history['HE4_Level'].to_numpy()
+
+            partition = records['patient'] % np.uint64(n_partitions)
+            order = np.argsort(partition, kind='stable')
+            bounds = np.searchsorted(partition[order], np.arange(n_partitions + 1))
+            for i in range(n_partitions):
+                if bounds[i] < bounds[i + 1]:
+                    records[order[bounds[i]:bounds[i + 1]]].tofile(files[i])
+            rows += len(chunk)
+    finally:
+        for f in files:
+            f.close()
+    return paths, rows
+
+
+def _backfill_partition(path):
+    """Temporal features of one history partition, written into the shared feature file"""
+    records = np.fromfile(path, dtype=SPILL_DTYPE)
+    if len(records):
+        features = backfill_temporal_features(
+            records['patient'], records['day'].astype('datetime64[D]'),
+            records['ca125'], records['he4'], n_workers=1
+        )
+        temporal = np.load(_worker['temporal_path'], mmap_mode='r+')
+        temporal[records['row']] = np.column_stack([features[key] for key in TEMPORAL_FEATURE_COLUMNS])
+        temporal.flush()
+        del temporal
+    os.remove(path)
+    return len(records)
+
+
+def _score_chunk(task):
+    """
+    Score one chunk in a worker
+
+    Args:
+        task: Tuple of (first row number, dictionary of base feature arrays, row count)
+
+    Returns:
+        Tuple of (predicted labels, base probabilities, temporally adjusted probabilities)
+    """
+    start, columns, n_rows = task
+    bundle = _worker['bundle']
+    schema = bundle.schema
+
+    # Same defaults as the API for fields the export leaves empty
+    X = np.repeat(schema.defaults, n_rows, axis=0)
+    for name, values in columns.items():
+        j = schema.index[name]
+        X[:, j] = np.where(np.isnan(values), schema.defaults[0, j], values)
+
+    temporal = None
+    if schema.temporal_fields:
+        temporal = np.array(np.load(_worker['temporal_path'], mmap_mode='r')[start:start + n_rows])
+        for k, column in enumerate(TEMPORAL_FEATURE_COLUMNS.values()):
+            j = schema.temporal_fields.get(column)
+            if j is not None:
+                X[:, j] = temporal[:, k]
+
+    model = bundle.model
+    if hasattr(model, "predict_proba"):
+        proba = model.predict_proba(X)
+        preds = model.classes_[np.argmax(proba, axis=1)]
+        base_probs = proba[:, 1]
+    else:
+        preds = model.predict(X)
+        base_probs = np.where(preds == 1, 0.75, 0.25)
+
+    if temporal is None:
+        return preds, base_probs, base_probs
+    multipliers = temporal_risk_multipliers(
+        {key: temporal[:, k] for k, key in enumerate(TEMPORAL_FEATURE_COLUMNS)}
+    )
+    return preds, base_probs, np.minimum(base_probs * multipliers, 1.0)
+
+
+def bulk_score(csv_path, output_path, model_path=None, n_workers=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+               tmp_dir=None, progress=print):
+    """
+    Score every record of a CSV and write one output row per input row, in order
+
+    Args:
+        csv_path: Input CSV with the train.csv columns (any missing base
+                  feature takes the API default)
+        output_path: Output CSV
+        model_path: Model to score with (see load_scoring_bundle)
+        n_workers: Worker processes; defaults to every available CPU
+        chunk_rows: Rows per chunk
+        tmp_dir: Directory for the history spill and temporal feature files
+        progress: Callable receiving progress lines
+
+    Returns:
+        Dictionary with row counts and timings
+    """
+    n_workers = n_workers or available_cpus()
+    bundle = load_scoring_bundle(model_path)
+    schema = bundle.schema
+    available = set(csv_columns(csv_path))
+
+    base_columns = [name for name in schema.fields if name in available]
+    passthrough = [name for name in (PATIENT_COLUMN, DATE_COLUMN) if name in available]
+    needs_history = bool(schema.temporal_fields)
+    if needs_history and not set(HISTORY_INPUTS) <= available:
+        raise ValueError(f"The model uses temporal features, which need the columns {HISTORY_INPUTS}; "
+                         f"missing {sorted(set(HISTORY_INPUTS) - available)}")
+    progress(f"Scoring {csv_path} with {bundle.version_token} ({bundle.engine}, {len(schema)} features) "
+             f"on {n_workers} workers")
+
+    summary = {'workers': n_workers, 'model_version': bundle.version_token}
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="ovcare-bulk-", dir=tmp_dir) as directory:
+        temporal_path = os.path.join(directory, "temporal_features.npy")
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(model_path, temporal_path)) as pool:
+            if needs_history:
+                n_partitions = max(n_workers, math.ceil(os.path.getsize(csv_path) / PARTITION_BYTES))
+                paths, total_rows = spill_history(csv_path, directory, n_partitions, chunk_rows)
+                temporal = np.lib.format.open_memmap(
+                    temporal_path, mode='w+', dtype=np.float64, shape=(total_rows, len(TEMPORAL_FEATURE_COLUMNS))
+                )
+                # Records without history inputs keep missing temporal features
+                temporal[:] = np.nan
+                temporal.flush()
+                del temporal
+                summary['history_rows'] = sum(pool.map(_backfill_partition, paths))
+                summary['history_seconds'] = time.perf_counter() - start
+                progress(f"Temporal features for {summary['history_rows']:,} of {total_rows:,} records "
+                         f"in {summary['history_seconds']:.1f} s")
+
+            scoring_start = time.perf_counter()
+            rows_done = 0
+            last_report = scoring_start
+            pending = deque()
+            with open(output_path, 'w', newline='') as output:
+                header = True
+
+                def write_next():
+                    nonlocal rows_done, last_report, header
+                    first_row, ids, future = pending.popleft()
+                    preds, base_probs, probs = future.result()
+                    result = pd.DataFrame({'row': np.arange(first_row, first_row + len(probs))})
+                    for name, values in ids.items():
+                        result[name] = values
+                    result['risk'] = preds.astype(int)
+                    result['probability'] = probs
+                    result['base_probability'] = base_probs
+                    result['risk_tier'] = get_risk_tiers(probs)
+                    result.to_csv(output, header=header, index=False)
+                    header = False
+                    rows_done += len(probs)
+                    now = time.perf_counter()
+                    if now - last_report >= PROGRESS_INTERVAL_SECONDS:
+                        progress(f"{rows_done:,} rows scored, {rows_done / (now - scoring_start):,.0f} rows/s")
+                        last_report = now
+
+                first_row = 0
+                for chunk in iter_column_chunks(csv_path, base_columns + passthrough, chunk_rows):
+                    columns = {name: chunk[name].to_numpy(dtype=np.float64) for name in base_columns}
+                    ids = {name: chunk[name].to_numpy() for name in passthrough}
+                    future = pool.submit(_score_chunk, (first_row, columns, len(chunk)))
+                    pending.append((first_row, ids, future))
+                    first_row += len(chunk)
+                    if len(pending) >= n_workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                        write_next()
+                while pending:
+                    write_next()
+
+    elapsed = time.perf_counter() - scoring_start
+    summary.update({
+        'rows': rows_done,
+        'scoring_seconds': elapsed,
+        'total_seconds': time.perf_counter() - start,
+        'rows_per_second': rows_done / elapsed if elapsed > 0 else 0.0
+    })
+    progress(f"Scored {rows_done:,} rows in {summary['total_seconds']:.1f} s "
+             f"({summary['rows_per_second']:,.0f} rows/s scoring) -> {output_path}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score every record of a CSV export with the OvCare model")
+    parser.add_argument("input", help="CSV with the train.csv columns")
+    parser.add_argument("output", help="CSV to write, one row per input row in input order")
+    parser.add_argument("--model", help="model.pkl file or model_artifact/ directory (default: the served model)")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (default: one per available CPU)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="rows per chunk")
+    parser.add_argument("--tmp-dir", help="directory for the history spill files (default: system temp)")
+    args = parser.parse_args(argv)
+
+    try:
+        bulk_score(args.input, args.output, model_path=args.model, n_workers=args.workers or None,
+                   chunk_rows=args.chunk_rows, tmp_dir=args.tmp_dir)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
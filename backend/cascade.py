@@ -0,0 +1,257 @@
+"""
+Cascade Scoring for OvCare
+A small screening model distilled from the full ensemble answers requests
+whose risk is confidently far from every risk tier boundary; only rows near
+a boundary are scored by the full ensemble
+"""
+
+import os
+import random
+import threading
+
+import numpy as np
+
+from metrics import Histogram, inc
+from model_artifact import read_artifact_header, load_model_artifact
+from temporal_analysis import RISK_TIER_THRESHOLDS
+
+SCREENER_DIR = os.path.join(os.path.dirname(__file__), "screener_artifact")
+
+# Probability at which a row is labelled high risk (the "risk" field)
+LABEL_THRESHOLD = 0.5
+
+# Equal-width bins of the screener probability, each with its own error band
+BAND_BINS = 10
+
+# Fraction of held-out rows whose full-model probability must lie inside
+# the screener's band
+BAND_COVERAGE = 0.99
+
+# Bins with fewer held-out rows use the band over all rows
+MIN_BIN_ROWS = 30
+
+# Upper bounds of the audited |screener - full| probability buckets
+ABS_DIFF_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5)
+
+
+def decision_boundaries(multiplier=1.0):
+    """
+    Base-probability values at which the served answer changes
+
+    Args:
+        multiplier: Temporal risk multiplier applied before tiering (the
+                    tier of min(p * multiplier, 1) changes at t / multiplier)
+
+    Returns:
+        Sorted array of tier thresholds plus the label threshold
+    """
+    return np.unique(np.append(RISK_TIER_THRESHOLDS / multiplier, LABEL_THRESHOLD))
+
+
+# Boundaries of the plain (not temporally adjusted) risk tiers
+DECISION_BOUNDARIES = decision_boundaries()
+
+
+def _conformal_quantile(errors, coverage):
+    """Finite-sample conformal quantile: covers `coverage` of new rows"""
+    n = len(errors)
+    rank = min(int(np.ceil((n + 1) * coverage)), n)
+    return float(np.sort(errors)[rank - 1])
+
+
+def calibrate_error_bands(screen_proba, full_proba, bins=BAND_BINS, coverage=BAND_COVERAGE,
+                          min_bin_rows=MIN_BIN_ROWS):
+    """
+    Per-bin bound on how far the full model can be from the screener
+
+    Args:
+        screen_proba: Screener class-1 probabilities on held-out rows
+        full_proba: Full-model class-1 probabilities on the same rows
+        bins: Equal-width bins over the screener probability
+        coverage: Fraction of rows each band must contain
+        min_bin_rows: Smaller bins fall back to the overall band
+
+    Returns:
+        JSON-serializable dictionary with 'edges' and 'widths'
+    """
+    screen_proba = np.asarray(screen_proba, dtype=np.float64)
+    errors = np.abs(np.asarray(full_proba, dtype=np.float64) - screen_proba)
+    overall = _conformal_quantile(errors, coverage)
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    index = np.clip(np.searchsorted(edges, screen_proba, side='right') - 1, 0, bins - 1)
+    widths, rows = [], []
+    for b in range(bins):
+        in_bin = errors[index == b]
+        rows.append(int(len(in_bin)))
+        widths.append(_conformal_quantile(in_bin, coverage) if len(in_bin) >= min_bin_rows else overall)
+    return {'edges': edges.tolist(), 'widths': widths, 'rows': rows,
+            'overall_width': overall, 'coverage': coverage}
+
+
+class CascadeScreener:
+    """Screening model plus its calibrated error bands"""
+
+    def __init__(self, model, bands):
+        self.model = model
+        self.bands = bands
+        self._edges = np.asarray(bands['edges'], dtype=np.float64)
+        self._widths = np.asarray(bands['widths'], dtype=np.float64)
+
+    def band(self, proba):
+        """Error band width for each screener probability"""
+        index = np.clip(np.searchsorted(self._edges, proba, side='right') - 1, 0, len(self._widths) - 1)
+        return self._widths[index]
+
+    def screen(self, X, boundaries=None):
+        """
+        Score rows with the screener and decide which can skip the full model
+
+        Args:
+            X: Feature matrix
+            boundaries: Decision boundaries (default: DECISION_BOUNDARIES)
+
+        Returns:
+            Tuple of (screener class-1 probabilities, boolean fast-path mask)
+        """
+        if boundaries is None:
+            boundaries = DECISION_BOUNDARIES
+        proba = self.model.predict_proba(X)[:, 1]
+        distance = np.abs(proba[:, None] - boundaries[None, :]).min(axis=1)
+        return proba, distance > self.band(proba)
+
+
+def load_screener(metadata, directory=SCREENER_DIR):
+    """
+    Map the screening model trained alongside the current full model
+
+    Args:
+        metadata: Metadata of the full model (supplies the error bands)
+        directory: Screener artifact directory
+
+    Returns:
+        CascadeScreener, or None if there is no screener for this model
+    """
+    cascade = metadata.get('cascade') if metadata else None
+    if not cascade or directory is None:
+        return None
+    try:
+        header = read_artifact_header(directory)
+        if header is None:
+            return None
+        if header.get('training_date') != metadata.get('training_date'):
+            print(f"Screener at {directory} belongs to another model; cascade disabled")
+            return None
+        compiled, _ = load_model_artifact(directory)
+    except (OSError, ValueError) as e:
+        print(f"Screener unavailable ({e}); cascade disabled")
+        return None
+    return CascadeScreener(compiled, cascade['bands'])
+
+
+def evaluate_cascade(screen_proba, full_proba, band_widths, boundaries=None):
+    """
+    Fast-path fraction and agreement with the full model on held-out rows
+
+    Args:
+        screen_proba: Screener class-1 probabilities
+        full_proba: Full-model class-1 probabilities
+        band_widths: Error band width of each row
+        boundaries: Decision boundaries (default: DECISION_BOUNDARIES)
+
+    Returns:
+        JSON-serializable dictionary
+    """
+    if boundaries is None:
+        boundaries = DECISION_BOUNDARIES
+    screen_proba = np.asarray(screen_proba, dtype=np.float64)
+    full_proba = np.asarray(full_proba, dtype=np.float64)
+    distance = np.abs(screen_proba[:, None] - boundaries[None, :]).min(axis=1)
+    fast = distance > band_widths
+    served = np.where(fast, screen_proba, full_proba)
+    tiers_agree = np.searchsorted(RISK_TIER_THRESHOLDS, served, side='right') == \
+        np.searchsorted(RISK_TIER_THRESHOLDS, full_proba, side='right')
+    rows = len(full_proba)
+    fast_rows = int(fast.sum())
+    return {
+        'rows': rows,
+        'fast_path_fraction': fast_rows / rows if rows else 0.0,
+        'fast_path_tier_agreement': float(tiers_agree[fast].mean()) if fast_rows else 1.0,
+        'tier_agreement': float(tiers_agree.mean()) if rows else 1.0,
+        'label_agreement': float(((served >= LABEL_THRESHOLD) == (full_proba >= LABEL_THRESHOLD)).mean())
+        if rows else 1.0,
+        'max_abs_diff': float(np.abs(screen_proba - full_proba).max()) if rows else 0.0
+    }
+
+
+class CascadeStats:
+    """
+    Fast-path counters plus a sampled audit of fast-path answers
+
+    A fraction audit_rate of fast-path rows is also scored by the full
+    model to measure live agreement; without it, agreement would only be
+    known for the held-out set at training time.
+    """
+
+    def __init__(self, audit_rate=0.01):
+        self.audit_rate = min(max(float(audit_rate), 0.0), 1.0)
+        self._lock = threading.Lock()
+        self._abs_diff = Histogram(ABS_DIFF_BUCKETS)
+        self.rows = 0
+        self.fast_rows = 0
+        self.audited_rows = 0
+        self.disagreements = 0
+        self.label_disagreements = 0
+        self.max_abs_diff = 0.0
+
+    def audit_sample(self, n_rows):
+        """Indices of fast-path rows to double-check with the full model"""
+        if self.audit_rate <= 0.0:
+            return []
+        if n_rows == 1:
+            return [0] if random.random() < self.audit_rate else []
+        return np.flatnonzero(np.random.random(n_rows) < self.audit_rate)
+
+    def record(self, rows, fast_rows):
+        with self._lock:
+            self.rows += rows
+            self.fast_rows += fast_rows
+        if fast_rows:
+            inc('ovcare_cascade_rows_total', fast_rows, path='screener')
+        if rows - fast_rows:
+            inc('ovcare_cascade_rows_total', rows - fast_rows, path='ensemble')
+
+    def record_audit(self, screen_proba, full_proba, boundaries):
+        """Compare audited screener answers with the full model"""
+        screen_proba = np.asarray(screen_proba, dtype=np.float64)
+        full_proba = np.asarray(full_proba, dtype=np.float64)
+        abs_diff = np.abs(screen_proba - full_proba)
+        # Disagreement: the two probabilities fall between different boundaries
+        disagreements = int(np.count_nonzero(
+            np.searchsorted(boundaries, screen_proba, side='right') !=
+            np.searchsorted(boundaries, full_proba, side='right')
+        ))
+        label_disagreements = int(np.count_nonzero(
+            (screen_proba >= LABEL_THRESHOLD) != (full_proba >= LABEL_THRESHOLD)
+        ))
+        with self._lock:
+            self.audited_rows += len(full_proba)
+            self.disagreements += disagreements
+            self.label_disagreements += label_disagreements
+            self.max_abs_diff = max(self.max_abs_diff, float(abs_diff.max()))
+            for value in abs_diff.tolist():
+                self._abs_diff.observe(value)
+
+    def stats(self):
+        with self._lock:
+            audited = self.audited_rows
+            return {
+                'rows': self.rows,
+                'fast_path_rows': self.fast_rows,
+                'fast_path_fraction': self.fast_rows / self.rows if self.rows else 0.0,
+                'audit_rate': self.audit_rate,
+                'audited_rows': audited,
+                'audited_agreement': 1.0 - self.disagreements / audited if audited else None,
+                'audited_label_agreement': 1.0 - self.label_disagreements / audited if audited else None,
+                'audited_max_abs_diff': self.max_abs_diff,
+                'audited_abs_diff_histogram': self._abs_diff.to_dict()
+            }
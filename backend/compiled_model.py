@@ -0,0 +1,423 @@
+"""
+Compiled Tree-Ensemble Inference for OvCare
+Flattens a fitted Pipeline(StandardScaler, GradientBoostingClassifier|XGBClassifier)
+into contiguous NumPy arrays and evaluates it without sklearn/XGBoost overhead
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ENGINE_ENV_VAR = "OVCARE_INFERENCE_ENGINE"
+
+# Rows evaluated together; keeps the per-level node arrays cache-resident
+BATCH_CHUNK_ROWS = 128
+
+
+class CompiledEnsemble:
+    """
+    Flattened binary gradient-boosted tree ensemble
+
+    All trees share one set of node arrays, numbered breadth-first so the
+    right child of every split sits right after its left child. Leaves
+    point to themselves with an infinite threshold, so every row walks
+    max_depth steps and a whole batch is evaluated with a few vectorized
+    gathers per level.
+
+    For sklearn models the scaler is folded into the thresholds, so raw
+    features are compared directly. XGBoost compares float32 scaled values
+    against cut points taken from the training data, so folding would move
+    rows that sit exactly on a cut; for it the scaler is applied to the
+    input and the result cast to float32 instead.
+    """
+
+    def __init__(self, feature, threshold, left, missing, value, roots, max_depth,
+                 base_margin, scale, strict_less, classes, model_type,
+                 input_mean=None, input_scale=None, float32_inputs=False, cover=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.missing = np.ascontiguousarray(missing, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.base_margin = float(base_margin)
+        self.scale = float(scale)
+        self.strict_less = bool(strict_less)
+        self.classes_ = np.asarray(classes)
+        self.model_type = model_type
+        self.input_mean = None if input_mean is None else np.asarray(input_mean, dtype=np.float64)
+        self.input_scale = None if input_scale is None else np.asarray(input_scale, dtype=np.float64)
+        self.float32_inputs = bool(float32_inputs)
+        # Training weight reaching each node; only needed for attributions
+        self.cover = None if cover is None else np.ascontiguousarray(cover, dtype=np.float64)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def prepare(self, X):
+        """Apply the unfolded scaler / float32 cast, if any"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if self.input_mean is not None:
+            X = (X - self.input_mean) / self.input_scale
+        if self.float32_inputs:
+            X = X.astype(np.float32).astype(np.float64)
+        return np.ascontiguousarray(X)
+
+    def decision_function(self, X, prepared=False):
+        """
+        Raw margin (log-odds) for each row
+
+        Args:
+            X: Array of shape (n_rows, n_features) with unscaled features
+            prepared: X has already been through prepare()
+
+        Returns:
+            NumPy array of shape (n_rows,)
+        """
+        if not prepared:
+            X = self.prepare(X)
+        if len(X) > BATCH_CHUNK_ROWS:
+            return np.concatenate([
+                self._margin(X[start:start + BATCH_CHUNK_ROWS])
+                for start in range(0, len(X), BATCH_CHUNK_ROWS)
+            ])
+        return self._margin(X)
+
+    def _margin(self, X):
+        """Walk every tree for a chunk of prepared rows"""
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offset = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        has_missing = np.isnan(flat).any()
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees))
+        for _ in range(self.max_depth):
+            x = flat.take(row_offset + self.feature.take(nodes))
+            threshold = self.threshold.take(nodes)
+            go_right = x >= threshold if self.strict_less else x > threshold
+            next_nodes = self.left.take(nodes) + go_right
+            if has_missing:
+                next_nodes = np.where(np.isnan(x), self.missing.take(nodes), next_nodes)
+            nodes = next_nodes
+        return self.base_margin + self.scale * self.value.take(nodes).sum(axis=1)
+
+    def predict_all(self, X):
+        """
+        Probability, label and confidence in a single pass
+
+        Returns:
+            Tuple of (positive-class probability, predicted class, confidence) arrays
+        """
+        probability = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        labels = self.classes_[(probability > 0.5).astype(int)]
+        confidence = np.maximum(probability, 1.0 - probability)
+        return probability, labels, confidence
+
+    def predict_proba(self, X, prepared=False):
+        """sklearn-compatible class probabilities"""
+        probability = 1.0 / (1.0 + np.exp(-self.decision_function(X, prepared)))
+        return np.column_stack([1.0 - probability, probability])
+
+    def predict(self, X):
+        """sklearn-compatible class labels"""
+        return self.predict_all(X)[1]
+
+
+def _scaler_params(scaler, n_features):
+    """Mean and scale vectors of a fitted StandardScaler"""
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+class _FlatTrees:
+    """Accumulates trees into shared breadth-first node arrays"""
+
+    def __init__(self):
+        self.parts = {key: [] for key in ('feature', 'threshold', 'left', 'missing', 'value', 'cover')}
+        self.roots = []
+        self.offset = 0
+        self.max_depth = 0
+
+    def add(self, left, right, feature, threshold, value, cover, default_left=None):
+        """
+        Add one tree given its child arrays (-1 marks a leaf) and the
+        training weight (cover) of every node
+
+        Nodes are renumbered breadth-first so each right child is stored
+        immediately after its left child.
+        """
+        order = [0]
+        depth = {0: 0}
+        for node in order:
+            if left[node] != -1:
+                order.extend((left[node], right[node]))
+                depth[left[node]] = depth[right[node]] = depth[node] + 1
+        new_index = {node: i + self.offset for i, node in enumerate(order)}
+
+        n = len(order)
+        out = {
+            'feature': np.zeros(n, dtype=np.intp),
+            'threshold': np.full(n, np.inf),
+            'left': np.arange(n, dtype=np.intp) + self.offset,
+            'missing': np.arange(n, dtype=np.intp) + self.offset,
+            'value': np.zeros(n),
+            'cover': np.asarray(cover, dtype=np.float64)[order]
+        }
+        for i, node in enumerate(order):
+            if left[node] == -1:
+                out['value'][i] = value[node]
+                continue
+            out['feature'][i] = feature[node]
+            out['threshold'][i] = threshold[node]
+            out['left'][i] = new_index[left[node]]
+            goes_left = default_left is not None and default_left[node]
+            out['missing'][i] = new_index[left[node]] if goes_left else new_index[right[node]]
+
+        for key, values in out.items():
+            self.parts[key].append(values)
+        self.roots.append(self.offset)
+        self.offset += n
+        self.max_depth = max(self.max_depth, max(depth.values()))
+
+    def arrays(self):
+        """Concatenated node arrays plus roots and depth"""
+        arrays = {key: np.concatenate(values) for key, values in self.parts.items()}
+        arrays['roots'] = np.asarray(self.roots, dtype=np.intp)
+        arrays['max_depth'] = self.max_depth
+        return arrays
+
+
+def _compile_sklearn_gbc(clf, scaler):
+    """Flatten a binary GradientBoostingClassifier, folding the scaler into thresholds"""
+    if clf.init_ == 'zero':
+        base_margin = 0.0
+    else:
+        prior = float(clf.init_.class_prior_[1])
+        base_margin = float(np.log(prior / (1.0 - prior)))
+
+    if scaler is not None:
+        mean, scale = _scaler_params(scaler, clf.n_features_in_)
+    else:
+        mean, scale = np.zeros(clf.n_features_in_), np.ones(clf.n_features_in_)
+
+    flat = _FlatTrees()
+    for estimator in clf.estimators_[:clf.n_estimators_]:
+        tree = estimator[0].tree_
+        feature = np.maximum(tree.feature, 0)
+        # (x - mean) / scale <= t  <=>  x <= t * scale + mean  (scale > 0)
+        threshold = tree.threshold * scale[feature] + mean[feature]
+        flat.add(tree.children_left, tree.children_right, feature, threshold,
+                 tree.value[:, 0, 0], tree.weighted_n_node_samples)
+
+    return dict(
+        flat.arrays(),
+        base_margin=base_margin,
+        scale=clf.learning_rate,
+        strict_less=False,
+        model_type='GradientBoosting'
+    )
+
+
+def _compile_xgboost(clf, scaler):
+    """Flatten a binary:logistic XGBClassifier from its JSON model dump"""
+    booster = clf.get_booster()
+    learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+    objective = learner['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Unsupported XGBoost objective: {objective}")
+
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+    base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+    trees = learner['gradient_booster']['model']['trees']
+    best_iteration = getattr(clf, 'best_iteration', None)
+    if best_iteration is not None:
+        trees = trees[:best_iteration + 1]
+
+    flat = _FlatTrees()
+    for tree in trees:
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32).astype(np.float64)
+        flat.add(tree['left_children'], tree['right_children'], tree['split_indices'],
+                 conditions, conditions, tree['sum_hessian'], default_left=tree['default_left'])
+
+    input_mean = input_scale = None
+    if scaler is not None:
+        input_mean, input_scale = _scaler_params(scaler, clf.n_features_in_)
+
+    return dict(
+        flat.arrays(),
+        base_margin=base_margin,
+        scale=1.0,
+        strict_less=True,
+        model_type='XGBoost',
+        input_mean=input_mean,
+        input_scale=input_scale,
+        float32_inputs=True
+    )
+
+
+def compile_pipeline(pipe):
+    """
+    Compile a fitted scaler + boosted-tree pipeline into a CompiledEnsemble
+
+    Args:
+        pipe: sklearn Pipeline with an optional 'scaler' StandardScaler step
+              and a final GradientBoostingClassifier or XGBClassifier
+
+    Returns:
+        CompiledEnsemble
+
+    Raises:
+        ValueError: If the classifier type is not supported
+    """
+    steps = dict(pipe.named_steps) if hasattr(pipe, 'named_steps') else {'clf': pipe}
+    clf = list(steps.values())[-1]
+    scaler = steps.get('scaler')
+
+    if len(getattr(clf, 'classes_', [])) != 2:
+        raise ValueError("Only binary classifiers can be compiled")
+
+    clf_type = type(clf).__name__
+    if clf_type == 'GradientBoostingClassifier':
+        params = _compile_sklearn_gbc(clf, scaler)
+    elif clf_type == 'XGBClassifier':
+        params = _compile_xgboost(clf, scaler)
+    else:
+        raise ValueError(f"Unsupported classifier for compilation: {clf_type}")
+
+    return CompiledEnsemble(classes=clf.classes_, **params)
+
+
+def select_inference_model(pipe, engine=None):
+    """
+    Pick the inference engine at startup
+
+    Args:
+        pipe: Fitted sklearn pipeline loaded from model.pkl
+        engine: 'sklearn' or 'compiled'; defaults to $OVCARE_INFERENCE_ENGINE
+
+    Returns:
+        Tuple of (model object with predict/predict_proba, engine name)
+    """
+    engine = (engine or os.environ.get(ENGINE_ENV_VAR, 'sklearn')).lower()
+    if engine == 'compiled':
+        try:
+            return compile_pipeline(pipe), 'compiled'
+        except Exception as e:
+            print(f"Could not compile model ({e}), falling back to sklearn pipeline")
+    return pipe, 'sklearn'
+
+
+def check_parity(pipe, compiled, X, tolerance=1e-5):
+    """
+    Compare compiled and original pipeline outputs
+
+    Args:
+        pipe: Original fitted pipeline
+        compiled: CompiledEnsemble built from it
+        X: Feature matrix to score (array or DataFrame)
+        tolerance: Maximum allowed absolute probability difference
+
+    Returns:
+        Dictionary with max difference, label agreement and pass flag
+    """
+    # Score in float64 like the API: a float32 matrix would make the scaler
+    # round differently and flip splits that sit on a threshold
+    X = X.astype(np.float64)
+    expected = pipe.predict_proba(X)[:, 1]
+    expected_labels = pipe.predict(X)
+    probability, labels, _ = compiled.predict_all(np.asarray(X))
+    max_diff = float(np.max(np.abs(expected - probability))) if len(X) else 0.0
+    agreement = float(np.mean(expected_labels == labels)) if len(X) else 1.0
+    return {
+        'rows': int(len(X)),
+        'max_abs_probability_diff': max_diff,
+        'label_agreement': agreement,
+        'passed': max_diff <= tolerance and agreement == 1.0
+    }
+
+
+def verify_compiled_pipeline(pipe, X, tolerance=1e-5):
+    """
+    Compile a pipeline and check it against the original
+
+    train.py runs this over the full held-out set and only writes the
+    memory-mapped artifact when it passes.
+
+    Args:
+        pipe: Fitted pipeline
+        X: Feature matrix to score (DataFrame or array, model feature order)
+        tolerance: Maximum allowed absolute probability difference
+
+    Returns:
+        Tuple of (CompiledEnsemble, check_parity report)
+
+    Raises:
+        ValueError: If the classifier type is not supported
+    """
+    compiled = compile_pipeline(pipe)
+    return compiled, check_parity(pipe, compiled, X, tolerance)
+
+
+def main():
+    """
+    Compare compiled-model parity and speed against model.pkl on every
+    train.csv record, with the features train.py builds
+
+    A quick manual check; the parity that gates the artifact is computed by
+    train.py on the held-out set (verify_compiled_pipeline).
+    """
+    import pickle
+    import warnings
+    import pandas as pd
+    from train import (
+        BASE_FEATURES, CSV_PATH, HISTORY_COLUMNS, MODEL_PATH, TARGET_COLUMN, TEMPORAL_FEATURES,
+        prepare_training_data
+    )
+    from training_data import csv_columns, read_columns
+
+    with open(MODEL_PATH, "rb") as f:
+        pipe = pickle.load(f)
+    with open(os.path.join(os.path.dirname(MODEL_PATH), "model_metadata.json")) as f:
+        features = json.load(f)['features']
+    if features != BASE_FEATURES + TEMPORAL_FEATURES:
+        print("model_metadata.json features differ from train.py's; retrain before checking parity")
+        return 1
+
+    # Same rows and temporal features (backfilled from patient history) as train.py
+    available = set(csv_columns(CSV_PATH))
+    columns = BASE_FEATURES + [TARGET_COLUMN] + [col for col in HISTORY_COLUMNS if col in available]
+    X, _ = prepare_training_data(read_columns(CSV_PATH, columns))
+    X = pd.DataFrame(X, columns=features)
+
+    compiled, report = verify_compiled_pipeline(pipe, X)
+
+    print("=" * 80)
+    print("Compiled Model Parity Check")
+    print("=" * 80)
+    print(f"Model type: {compiled.model_type} ({compiled.n_trees} trees, depth {compiled.max_depth})")
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+    # Time NumPy rows as the API scores them
+    warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+    row = X.to_numpy(dtype=np.float64)[:1]
+    for name, fn in (('sklearn', lambda: pipe.predict_proba(row)),
+                     ('compiled', lambda: compiled.predict_proba(row))):
+        start = time.perf_counter()
+        for _ in range(200):
+            fn()
+        print(f"Single-row latency ({name}): {(time.perf_counter() - start) / 200 * 1e6:.1f} us")
+
+    return 0 if report['passed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
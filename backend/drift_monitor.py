@@ -0,0 +1,326 @@
+"""
+Feature Drift Monitoring for OvCare
+Compares the distribution of live feature vectors with the training
+distribution using fixed-size streaming sketches: running moments plus a
+histogram over the training quantile bins for every feature
+"""
+
+import math
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Quantile bins of the reference profile (PSI and quantile resolution)
+PROFILE_BINS = 20
+
+# Quantiles reported for the reference and the live traffic
+REPORT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Population stability index bands: below MODERATE is stable, above MAJOR
+# the feature has clearly drifted
+PSI_MODERATE = 0.1
+PSI_MAJOR = 0.25
+
+# Rows needed before a sketch is scored at all
+MIN_ROWS = 100
+
+# Proportion substituted for empty bins in the PSI
+PSI_EPSILON = 1e-4
+
+# Above this many rows, bins are found per feature with searchsorted
+# instead of one broadcast comparison
+BROADCAST_MAX_ROWS = 64
+
+# Single rows are copied into a fixed buffer and added to the sketch in
+# batches of this size, which keeps the per-request cost to a row copy
+BUFFER_ROWS = 64
+
+
+def build_feature_profile(X, feature_names, bins=PROFILE_BINS):
+    """
+    Reference profile of a training feature matrix for the drift monitor
+
+    Args:
+        X: Array of shape (n_rows, n_features)
+        feature_names: Names in column order
+        bins: Number of quantile bins per feature (fewer for discrete features)
+
+    Returns:
+        JSON-serializable dictionary, stored as metadata['feature_profile']
+    """
+    X = np.asarray(X, dtype=np.float64)
+    features = {}
+    for j, name in enumerate(feature_names):
+        column = X[:, j]
+        column = column[~np.isnan(column)]
+        edges = np.unique(np.quantile(column, np.linspace(0, 1, bins + 1)))
+        counts = np.bincount(np.searchsorted(edges, column, side='right'), minlength=len(edges) + 1)
+        features[name] = {
+            'edges': edges.tolist(),
+            'proportions': (counts / len(column)).tolist(),
+            'mean': float(column.mean()),
+            'std': float(column.std()),
+            'min': float(column.min()),
+            'max': float(column.max()),
+            'quantiles': {str(q): float(v) for q, v in zip(REPORT_QUANTILES, np.quantile(column, REPORT_QUANTILES))}
+        }
+    return {'rows': int(len(X)), 'bins': bins, 'features': features}
+
+
+def population_stability_index(expected, actual):
+    """PSI between two binned distributions given as proportions"""
+    used = (expected > 0) | (actual > 0)
+    expected = np.maximum(expected[used], PSI_EPSILON)
+    actual = np.maximum(actual[used], PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class FeatureSketch:
+    """
+    Constant-size summary of a stream of feature vectors
+
+    Per feature: row count, running mean and sum of squared deviations
+    (Welford / Chan et al. merging), min, max and counts over fixed bins.
+    """
+
+    def __init__(self, edges):
+        self.edges = edges
+        n_features, n_edges = edges.shape
+        self.counts = np.zeros(n_features * (n_edges + 1), dtype=np.int64)
+        self._offsets = np.arange(n_features) * (n_edges + 1)
+        self.rows = 0
+        self.skipped_rows = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.min = np.full(n_features, np.inf)
+        self.max = np.full(n_features, -np.inf)
+        self.started_at = datetime.now().isoformat()
+
+    def update(self, X):
+        """Add the rows of X (rows with a missing value are only counted)"""
+        valid = ~np.isnan(X).any(axis=1)
+        if not valid.all():
+            self.skipped_rows += int(len(X) - valid.sum())
+            X = X[valid]
+        n = len(X)
+        if n == 0:
+            return
+        if n <= BROADCAST_MAX_ROWS:
+            bins = (X[:, :, None] >= self.edges).sum(axis=2)
+        else:
+            bins = np.column_stack([
+                np.searchsorted(self.edges[j], X[:, j], side='right') for j in range(X.shape[1])
+            ])
+        self.counts += np.bincount((bins + self._offsets).ravel(), minlength=len(self.counts))
+
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        total = self.rows + n
+        delta = batch_mean - self.mean
+        self.mean += delta * (n / total)
+        self.m2 += batch_m2 + delta ** 2 * (self.rows * n / total)
+        self.rows = total
+        np.minimum(self.min, X.min(axis=0), out=self.min)
+        np.maximum(self.max, X.max(axis=0), out=self.max)
+
+    def merge(self, other):
+        """Combined sketch of self and another sketch over the same edges"""
+        merged = FeatureSketch(self.edges)
+        merged.started_at = min(self.started_at, other.started_at)
+        merged.counts = self.counts + other.counts
+        merged.skipped_rows = self.skipped_rows + other.skipped_rows
+        merged.rows = self.rows + other.rows
+        if merged.rows:
+            delta = other.mean - self.mean
+            merged.mean = self.mean + delta * (other.rows / merged.rows)
+            merged.m2 = self.m2 + other.m2 + delta ** 2 * (self.rows * other.rows / merged.rows)
+        merged.min = np.minimum(self.min, other.min)
+        merged.max = np.maximum(self.max, other.max)
+        return merged
+
+    def bin_counts(self):
+        return self.counts.reshape(len(self.mean), -1)
+
+
+def _quantile(counts, edges, low, high, q):
+    """Estimate a quantile from bin counts, interpolating linearly in the bin"""
+    cumulative = np.cumsum(counts)
+    target = q * cumulative[-1]
+    b = int(np.searchsorted(cumulative, target, side='left'))
+    # Bin b spans [edges[b-1], edges[b]); the outer bins end at the live min/max
+    lower = max(edges[b - 1], low) if b > 0 else low
+    upper = min(edges[b], high) if b < len(edges) else high
+    before = cumulative[b - 1] if b > 0 else 0
+    fraction = (target - before) / counts[b] if counts[b] else 0.0
+    return float(lower + (upper - lower) * fraction)
+
+
+class DriftMonitor:
+    """
+    Streaming comparison of scored feature vectors with the training profile
+
+    Keeps tumbling-window sketches (current window, previous window and
+    everything before), so memory is fixed however much traffic is scored.
+    The reference comes from the serving bundle's metadata; when a model
+    with a different profile is swapped in, the sketches restart.
+    """
+
+    def __init__(self, feature_names, window_seconds=3600):
+        self.feature_names = list(feature_names)
+        self.window_seconds = float(window_seconds)
+        self._lock = threading.Lock()
+        self._bundle = None
+        self._reference = None
+        self._reference_profile = None
+        self.reference_version = None
+        self.disabled_reason = "No rows scored yet"
+
+    def _switch(self, bundle):
+        """Load the reference profile of a newly seen bundle (lock held)"""
+        self._bundle = bundle
+        profile = bundle.metadata.get('feature_profile')
+        if profile is None:
+            self._reference = None
+            self.disabled_reason = "Model metadata has no feature_profile; retrain to enable drift monitoring"
+            return
+        if self._reference is not None and profile == self._reference_profile:
+            return
+        try:
+            features = [profile['features'][name] for name in self.feature_names]
+        except KeyError as e:
+            self._reference = None
+            self.disabled_reason = f"Reference profile has no feature {e}"
+            return
+
+        n_edges = max(len(feature['edges']) for feature in features)
+        edges = np.full((len(features), n_edges), np.inf)
+        proportions = np.zeros((len(features), n_edges + 1))
+        for j, feature in enumerate(features):
+            k = len(feature['edges'])
+            edges[j, :k] = feature['edges']
+            proportions[j, :k + 1] = feature['proportions']
+        self._reference_profile = profile
+        self._reference = {'features': features, 'edges': edges, 'proportions': proportions,
+                           'rows': profile.get('rows')}
+        self.reference_version = bundle.version_token
+        self.disabled_reason = None
+        self._buffer = np.empty((BUFFER_ROWS, len(features)))
+        self._buffered = 0
+        self._older = FeatureSketch(edges)
+        self._previous = FeatureSketch(edges)
+        self._current = FeatureSketch(edges)
+        self._window_ends = time.monotonic() + self.window_seconds
+
+    def _flush(self):
+        """Add buffered rows to the current window, rotating windows when due (lock held)"""
+        if self._buffered:
+            self._current.update(self._buffer[:self._buffered])
+            self._buffered = 0
+        if time.monotonic() >= self._window_ends:
+            self._older = self._older.merge(self._previous)
+            self._previous = self._current
+            self._current = FeatureSketch(self._reference['edges'])
+            self._window_ends = time.monotonic() + self.window_seconds
+
+    def update(self, X, bundle):
+        """
+        Add scored feature rows
+
+        Args:
+            X: Feature matrix of shape (n_rows, n_features)
+            bundle: ModelBundle the rows were scored with
+        """
+        with self._lock:
+            if bundle is not self._bundle:
+                self._switch(bundle)
+            if self._reference is None:
+                return
+            if len(X) == 1:
+                self._buffer[self._buffered] = X[0]
+                self._buffered += 1
+                if self._buffered == BUFFER_ROWS:
+                    self._flush()
+                return
+            self._flush()
+            self._current.update(X)
+
+    def _score(self, sketch):
+        """Drift of one sketch against the reference"""
+        reference = self._reference
+        counts = sketch.bin_counts()
+        result = {'rows': sketch.rows, 'skipped_rows': sketch.skipped_rows, 'since': sketch.started_at}
+        if sketch.rows < MIN_ROWS:
+            result['status'] = 'insufficient_data'
+            return result
+
+        live = counts / sketch.rows
+        std = np.sqrt(sketch.m2 / sketch.rows)
+        features = {}
+        for j, name in enumerate(self.feature_names):
+            ref = reference['features'][j]
+            k = len(ref['edges'])
+            ref_p, live_p = reference['proportions'][j, :k + 1], live[j, :k + 1]
+            psi = population_stability_index(ref_p, live_p)
+            ks = float(np.max(np.abs(np.cumsum(ref_p) - np.cumsum(live_p))))
+            mean_shift = (sketch.mean[j] - ref['mean']) / ref['std'] if ref['std'] > 0 else \
+                (0.0 if sketch.mean[j] == ref['mean'] else math.inf)
+            features[name] = {
+                'psi': psi,
+                'ks': ks,
+                'status': 'major' if psi >= PSI_MAJOR else 'moderate' if psi >= PSI_MODERATE else 'stable',
+                'mean': float(sketch.mean[j]),
+                'reference_mean': ref['mean'],
+                'mean_shift_std': float(mean_shift),
+                'std': float(std[j]),
+                'reference_std': ref['std'],
+                'min': float(sketch.min[j]),
+                'max': float(sketch.max[j]),
+                'quantiles': {
+                    str(q): _quantile(counts[j, :k + 1], reference['edges'][j, :k], sketch.min[j], sketch.max[j], q)
+                    for q in REPORT_QUANTILES
+                },
+                'reference_quantiles': ref['quantiles']
+            }
+        ranked = sorted(features, key=lambda name: -features[name]['psi'])
+        result.update({
+            'status': features[ranked[0]]['status'],
+            'max_psi': features[ranked[0]]['psi'],
+            'drifted_features': [name for name in ranked if features[name]['status'] != 'stable'],
+            'features': features
+        })
+        return result
+
+    def report(self):
+        """
+        Drift of the recent window (previous plus current) and of all traffic
+
+        Returns:
+            Dictionary ready for JSON
+        """
+        with self._lock:
+            if self._reference is None:
+                return {'enabled': False, 'reason': self.disabled_reason}
+            self._flush()
+            recent = self._previous.merge(self._current)
+            lifetime = self._older.merge(recent)
+            reference_rows = self._reference['rows']
+        return {
+            'enabled': True,
+            'reference_version': self.reference_version,
+            'reference_rows': reference_rows,
+            'window_seconds': self.window_seconds,
+            'psi_thresholds': {'moderate': PSI_MODERATE, 'major': PSI_MAJOR},
+            'recent': self._score(recent),
+            'lifetime': self._score(lifetime)
+        }
+
+    def psi_gauges(self):
+        """(name, labels, value) PSI of every feature over the recent window"""
+        report = self.report()
+        recent = report.get('recent', {})
+        return [
+            ('ovcare_feature_drift_psi', {'feature': name}, feature['psi'])
+            for name, feature in recent.get('features', {}).items()
+        ]
@@ -0,0 +1,194 @@
+"""
+Temporal Feature Backfill for OvCare
+Computes the serving-time temporal features for every training record from
+the patient's own history (Patient_ID, date_of_record), sharding patients
+across a process pool
+
+Usage:
+    python feature_backfill.py [path/to/train.csv]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from feature_schema import TEMPORAL_FEATURE_COLUMNS
+from temporal_analysis import (
+    TEMPORAL_FEATURE_KEYS,
+    extract_temporal_features,
+    extract_temporal_features_columnar
+)
+
+PATIENT_COLUMN = 'Patient_ID'
+DATE_COLUMN = 'date_of_record'
+DATE_FORMAT = '%d-%m-%Y'
+
+# Serving feature keys and the training column each one fills
+TRAINING_COLUMN_NAMES = TEMPORAL_FEATURE_COLUMNS
+
+# Below this many rows a single process is faster than starting a pool
+PARALLEL_MIN_ROWS = 200_000
+
+
+def parse_record_dates(values):
+    """Parse dd-mm-yyyy date_of_record strings into datetime64[D]"""
+    return pd.to_datetime(pd.Series(values), format=DATE_FORMAT).to_numpy().astype('datetime64[D]')
+
+
+def _backfill_shard(args):
+    """Features as of every record for one shard of whole patients"""
+    patient_codes, days, ca125, he4 = args
+    return extract_temporal_features_columnar(patient_codes, days, ca125, he4, each_record=True)
+
+
+def backfill_temporal_features(patient_ids, dates, ca125, he4, n_workers=None):
+    """
+    Temporal features as of each record, using only that patient's records
+    up to and including it (same-date records keep their input order)
+
+    Args:
+        patient_ids: Array-like of patient identifiers, one per record
+        dates: Array-like of datetime64 record dates
+        ca125: Array-like of CA125 values
+        he4: Array-like of HE4 values
+        n_workers: Worker processes; defaults to every core, and inputs
+                   smaller than PARALLEL_MIN_ROWS run in-process
+
+    Returns:
+        Dictionary of one array per key in TEMPORAL_FEATURE_KEYS, in input order
+    """
+    patient_codes = pd.factorize(np.asarray(patient_ids))[0]
+    days = np.asarray(dates).astype('datetime64[D]')
+    ca125 = np.asarray(ca125, dtype=float)
+    he4 = np.asarray(he4, dtype=float)
+    n_workers = n_workers or os.cpu_count() or 1
+
+    if n_workers == 1 or len(patient_codes) < PARALLEL_MIN_ROWS:
+        features = _backfill_shard((patient_codes, days, ca125, he4))
+        return {key: features[key] for key in TEMPORAL_FEATURE_KEYS}
+
+    # Every patient lands wholly in one shard, so no history crosses shards
+    shard_of_row = patient_codes % n_workers
+    shards = [np.flatnonzero(shard_of_row == shard) for shard in range(n_workers)]
+    shards = [rows for rows in shards if len(rows)]
+
+    features = {
+        key: np.empty(len(patient_codes), dtype=int if key == 'trend_direction' else float)
+        for key in TEMPORAL_FEATURE_KEYS
+    }
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        shard_args = ((patient_codes[rows], days[rows], ca125[rows], he4[rows]) for rows in shards)
+        for rows, shard_features in zip(shards, pool.map(_backfill_shard, shard_args)):
+            for key in TEMPORAL_FEATURE_KEYS:
+                features[key][rows] = shard_features[key]
+    return features
+
+
+def backfill_training_frame(df, n_workers=None):
+    """
+    Add the temporal training columns to a DataFrame of patient records
+
+    Args:
+        df: DataFrame with Patient_ID, date_of_record, CA125_Level and HE4_Level
+        n_workers: Worker processes (see backfill_temporal_features)
+
+    Returns:
+        The DataFrame with one column per TRAINING_COLUMN_NAMES value
+    """
+    features = backfill_temporal_features(
+        df[PATIENT_COLUMN].to_numpy(),
+        parse_record_dates(df[DATE_COLUMN]),
+        df['CA125_Level'].to_numpy(),
+        df['HE4_Level'].to_numpy(),
+        n_workers
+    )
+    for key, column in TRAINING_COLUMN_NAMES.items():
+        df[column] = features[key]
+    return df
+
+
+def check_parity(patient_ids, dates, ca125, he4, features, sample_patients=50, seed=42,
+                 tolerance=1e-9):
+    """
+    Compare backfilled features with extract_temporal_features on sampled patients
+
+    For every record of each sampled patient, the serving implementation is
+    given that patient's readings up to and including the record.
+
+    Args:
+        patient_ids, dates, ca125, he4: The backfill inputs
+        features: Output of backfill_temporal_features (a subset of keys is fine)
+        sample_patients: Patients to check
+        seed: Sampling seed
+        tolerance: Largest allowed relative difference
+
+    Returns:
+        Dictionary with records checked, largest difference and mismatches
+    """
+    keys = [key for key in TEMPORAL_FEATURE_KEYS if key in features]
+    patient_ids = np.asarray(patient_ids)
+    days = np.asarray(dates).astype('datetime64[D]')
+    unique_ids = pd.unique(patient_ids)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(unique_ids, size=min(sample_patients, len(unique_ids)), replace=False)
+
+    checked = 0
+    max_diff = 0.0
+    mismatches = []
+    for patient_id in sample:
+        rows = np.flatnonzero(patient_ids == patient_id)
+        rows = rows[np.argsort(days[rows], kind='stable')]
+        history = [
+            {'ca125': float(ca125[row]), 'he4': float(he4[row]), 'recorded_at': str(days[row])}
+            for row in rows
+        ]
+        for position, row in enumerate(rows):
+            expected = extract_temporal_features(history[:position + 1])
+            for key in keys:
+                diff = abs(float(features[key][row]) - float(expected[key]))
+                relative = diff / max(1.0, abs(float(expected[key])))
+                max_diff = max(max_diff, relative)
+                if relative > tolerance and len(mismatches) < 10:
+                    mismatches.append({
+                        'patient_id': str(patient_id), 'record': int(row), 'feature': key,
+                        'backfill': float(features[key][row]), 'serving': float(expected[key])
+                    })
+            checked += 1
+
+    return {
+        'patients_checked': len(sample),
+        'records_checked': checked,
+        'max_relative_diff': max_diff,
+        'mismatches': mismatches,
+        'passed': not mismatches
+    }
+
+
+def main():
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "train.csv")
+    df = pd.read_csv(csv_path, usecols=[PATIENT_COLUMN, DATE_COLUMN, 'CA125_Level', 'HE4_Level'])
+    print(f"Loaded {len(df)} records for {df[PATIENT_COLUMN].nunique()} patients from {csv_path}")
+
+    patient_ids = df[PATIENT_COLUMN].to_numpy()
+    dates = parse_record_dates(df[DATE_COLUMN])
+    ca125 = df['CA125_Level'].to_numpy()
+    he4 = df['HE4_Level'].to_numpy()
+
+    start = time.perf_counter()
+    features = backfill_temporal_features(patient_ids, dates, ca125, he4)
+    elapsed = time.perf_counter() - start
+    print(f"Backfilled {len(df)} records in {elapsed * 1000:.1f} ms "
+          f"({len(df) / elapsed:,.0f} records/sec)")
+
+    parity = check_parity(patient_ids, dates, ca125, he4, features)
+    for key, value in parity.items():
+        print(f"{key}: {value}")
+    return 0 if parity['passed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Feature Schema for OvCare
+Model input columns in order, shared by the API, the background worker and
+the training feature backfill
+"""
+
+import numpy as np
+
+# Base features in model column order with the defaults used for missing fields
+BASE_FEATURE_DEFAULTS = [
+    ("Age", 50),
+    ("CA125_Level", 35),
+    ("HE4_Level", 100),
+    ("LDH_Level", 180),
+    ("Hemoglobin", 13),
+    ("WBC", 7000),
+    ("Platelets", 250000),
+    ("Ovary_Size", 3.5),
+    ("Fatigue_Level", 5),
+    ("Pelvic_Pain", 0),
+    ("Abdominal_Bloating", 0),
+    ("Early_Satiety", 0),
+    ("Menstrual_Irregularities", 0),
+    ("Weight_Change", 0)
+]
+
+# Temporal features in model column order (appended after the base features)
+TEMPORAL_FEATURES = [
+    'CA125_velocity', 'HE4_velocity', 'CA125_acceleration', 'HE4_acceleration',
+    'CA125_HE4_ratio', 'CA125_ma_7d', 'HE4_ma_7d', 'CA125_ma_30d', 'HE4_ma_30d',
+    'CA125_std_30d', 'HE4_std_30d'
+]
+
+# Every model input column in order
+FEATURE_NAMES = [name for name, _ in BASE_FEATURE_DEFAULTS] + TEMPORAL_FEATURES
+
+# extract_temporal_features keys and the model column each one fills
+TEMPORAL_FEATURE_COLUMNS = {
+    'ca125_velocity': 'CA125_velocity',
+    'he4_velocity': 'HE4_velocity',
+    'ca125_acceleration': 'CA125_acceleration',
+    'he4_acceleration': 'HE4_acceleration',
+    'ca125_he4_ratio': 'CA125_HE4_ratio',
+    'ca125_ma_7d': 'CA125_ma_7d',
+    'he4_ma_7d': 'HE4_ma_7d',
+    'ca125_ma_30d': 'CA125_ma_30d',
+    'he4_ma_30d': 'HE4_ma_30d',
+    'ca125_std_30d': 'CA125_std_30d',
+    'he4_std_30d': 'HE4_std_30d'
+}
+
+# Columns that take another value when sent as 0 or not sent: the current
+# level for moving averages, CA125 / HE4 for the ratio
+FALLBACK_COLUMNS = {
+    'CA125_ma_7d': 'CA125_Level',
+    'HE4_ma_7d': 'HE4_Level',
+    'CA125_ma_30d': 'CA125_Level',
+    'HE4_ma_30d': 'HE4_Level'
+}
+RATIO_COLUMNS = {'CA125_HE4_ratio': ('CA125_Level', 'HE4_Level')}
+
+# Default of every known column
+FEATURE_DEFAULTS = dict(BASE_FEATURE_DEFAULTS, **{name: 0.0 for name in TEMPORAL_FEATURES})
+
+
+class FeatureSchema:
+    """
+    Request-to-matrix mapping for one model's input columns, compiled once
+    when the model loads
+
+    Base features are read from top-level request fields and temporal
+    features from the request's "temporal_features" object, so building a
+    row is a copy of the defaults plus one assignment per field sent.
+    """
+
+    def __init__(self, feature_names):
+        self.names = list(feature_names)
+        unknown = [name for name in self.names if name not in FEATURE_DEFAULTS]
+        if unknown:
+            raise ValueError(f"No request field or default for model features {unknown}")
+        self.index = {name: j for j, name in enumerate(self.names)}
+        self.defaults = np.array([[FEATURE_DEFAULTS[name] for name in self.names]], dtype=float)
+        self.fields = {name: j for name, j in self.index.items() if name not in TEMPORAL_FEATURES}
+        self.temporal_fields = {name: j for name, j in self.index.items() if name in TEMPORAL_FEATURES}
+
+        fallbacks = [(self.index[target], self.index[source]) for target, source in FALLBACK_COLUMNS.items()
+                     if target in self.index and source in self.index]
+        self._fallback_targets = np.array([target for target, _ in fallbacks], dtype=np.intp)
+        self._fallback_sources = np.array([source for _, source in fallbacks], dtype=np.intp)
+        self._ratios = [(self.index[target], self.index[numerator], self.index[denominator])
+                        for target, (numerator, denominator) in RATIO_COLUMNS.items()
+                        if all(name in self.index for name in (target, numerator, denominator))]
+
+    def __len__(self):
+        return len(self.names)
+
+    def apply_fallbacks(self, X):
+        """Fill zero moving averages and ratios from the current levels, in place"""
+        for target, numerator, denominator in self._ratios:
+            X[:, target] = np.where(X[:, target] == 0, X[:, numerator] / (X[:, denominator] + 1e-6), X[:, target])
+        if len(self._fallback_targets):
+            targets = X[:, self._fallback_targets]
+            X[:, self._fallback_targets] = np.where(targets == 0, X[:, self._fallback_sources], targets)
+        return X
+
+    def row(self, data, temporal=None, fallbacks=True):
+        """
+        Single-row feature matrix from a request payload
+
+        Args:
+            data: Payload with base features as top-level fields
+            temporal: Temporal features by model column name (default: the
+                      payload's "temporal_features" object)
+            fallbacks: Derive zero ratio / moving averages from current levels
+
+        Returns:
+            NumPy array of shape (1, n_features)
+        """
+        X = self.defaults.copy()
+        for name, value in data.items():
+            j = self.fields.get(name)
+            if j is not None:
+                X[0, j] = float(value)
+        if temporal is None:
+            temporal = data.get('temporal_features') or {}
+        for name, value in temporal.items():
+            j = self.temporal_fields.get(name)
+            if j is not None:
+                X[0, j] = float(value)
+        return self.apply_fallbacks(X) if fallbacks else X
+
+    def matrix(self, data):
+        """
+        Feature matrix for a batch payload
+
+        Args:
+            data: Either {"records": [...]} with one /predict payload per row, or
+                  {"columns": {...}} with one array per feature name
+
+        Returns:
+            NumPy array of shape (n_rows, n_features)
+        """
+        if 'columns' in data:
+            columns = data['columns']
+            lengths = {len(v) for v in columns.values()}
+            if len(lengths) > 1:
+                raise ValueError("All columns must have the same length")
+            n_rows = lengths.pop() if lengths else 0
+            X = np.repeat(self.defaults, n_rows, axis=0)
+            for name, j in self.index.items():
+                if name in columns:
+                    X[:, j] = np.asarray(columns[name], dtype=float)
+        elif 'records' in data:
+            records = data['records']
+            base = [(name, FEATURE_DEFAULTS[name]) for name in self.fields]
+            temporal = [(name, FEATURE_DEFAULTS[name]) for name in self.temporal_fields]
+            X = np.empty((len(records), len(self.names)), dtype=float)
+            X[:, list(self.fields.values())] = np.array(
+                [[record.get(name, default) for name, default in base] for record in records], dtype=float
+            ).reshape(len(records), len(base))
+            if temporal:
+                X[:, list(self.temporal_fields.values())] = np.array(
+                    [[(record.get('temporal_features') or {}).get(name, default) for name, default in temporal]
+                     for record in records], dtype=float
+                ).reshape(len(records), len(temporal))
+        else:
+            raise ValueError("Request must contain 'records' or 'columns'")
+        return self.apply_fallbacks(X)
@@ -0,0 +1,307 @@
+"""
+Metrics for OvCare
+Low-overhead in-process counters and histograms rendered in the Prometheus
+text format. With OVCARE_METRICS_DIR set, every worker process snapshots its
+metrics to that directory and /metrics merges all workers' files.
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+METRICS_DIR = os.environ.get("OVCARE_METRICS_DIR")
+FLUSH_INTERVAL_SECONDS = 1.0
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+METRIC_HELP = {
+    'ovcare_requests_total': ('counter', 'Requests by endpoint, HTTP status and model version'),
+    'ovcare_request_errors_total': ('counter', 'Requests that returned an error status'),
+    'ovcare_request_duration_seconds': ('histogram', 'End-to-end request latency by endpoint'),
+    'ovcare_stage_duration_seconds': ('histogram', 'Latency of each processing stage by endpoint'),
+    'ovcare_batch_size': ('histogram', 'Rows per batch request'),
+    'ovcare_model_info': ('gauge', 'Active model version and inference engine'),
+    'ovcare_shadow_requests_total': ('counter', 'Requests copied to the shadow model, by outcome'),
+    'ovcare_cascade_rows_total': ('counter', 'Scored rows by cascade path (screener fast path or full ensemble)'),
+    'ovcare_feature_drift_psi': ('gauge', 'Population stability index of each input feature over the recent drift window'),
+    'ovcare_worker_memory_bytes': ('gauge', 'Memory of the serve.py master and workers by kind (rss, pss, shared, private)'),
+    'ovcare_startup_phase_seconds': ('gauge', 'Time spent in each boot phase of this worker'),
+    'ovcare_risk_jobs_total': ('counter', 'Risk recompute jobs processed by the background worker, by outcome'),
+    'ovcare_risk_queue_jobs': ('gauge', 'Risk recompute jobs in the queue by status'),
+    'ovcare_risk_queue_oldest_pending_seconds': ('gauge', 'Age of the oldest pending risk recompute job'),
+    'ovcare_risk_worker_heartbeat_age_seconds': ('gauge', 'Seconds since a risk worker process last wrote a heartbeat'),
+}
+
+_local = threading.local()
+
+
+class Histogram:
+    """
+    Standalone per-bucket histogram with count and sum, for stats
+    endpoints that report their own distribution (batch sizes, score diffs)
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def to_dict(self):
+        labels = [str(upper) for upper in self.buckets] + ['+Inf']
+        return {
+            'buckets': dict(zip(labels, self.counts)),
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0
+        }
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pid = os.getpid()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._last_flush = 0.0
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, labels, value):
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def clear_gauge(self, name):
+        with self._lock:
+            for key in [key for key in self.gauges if key[0] == name]:
+                del self.gauges[key]
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, labels)
+        index = bisect_left(buckets, value)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': list(buckets), 'counts': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0
+                }
+            histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        """JSON-serializable copy of every metric"""
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'gauges': [[name, list(labels), value] for (name, labels), value in self.gauges.items()],
+                'histograms': [
+                    [name, list(labels), dict(h, counts=list(h['counts']))]
+                    for (name, labels), h in self.histograms.items()
+                ]
+            }
+
+
+_registry = MetricsRegistry()
+
+
+def registry():
+    """This process's registry, reset after a fork so workers start from zero"""
+    global _registry
+    if _registry.pid != os.getpid():
+        _registry = MetricsRegistry()
+    return _registry
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Increment a counter"""
+    registry().inc(name, _labels(**labels), amount)
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge value"""
+    registry().set_gauge(name, _labels(**labels), value)
+
+
+def clear_gauge(name):
+    """Drop every label set of a gauge (e.g. before re-publishing model info)"""
+    registry().clear_gauge(name)
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """Record a histogram observation"""
+    registry().observe(name, _labels(**labels), value, buckets)
+
+
+def set_current_endpoint(endpoint):
+    """Label subsequent stage timings on this thread with the endpoint"""
+    _local.endpoint = endpoint
+
+
+def current_endpoint():
+    return getattr(_local, 'endpoint', None) or 'none'
+
+
+def capture_stages(stages):
+    """
+    Also append (stage, seconds) for each stage timed on this thread to
+    `stages`, e.g. for a profiled request; None stops capturing
+    """
+    _local.stages = stages
+
+
+class time_stage:
+    """
+    Context manager timing one processing stage of the current request
+
+    Usage:
+        with time_stage('ensemble'):
+            proba = model.predict_proba(X)
+    """
+
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        observe('ovcare_stage_duration_seconds', elapsed, endpoint=current_endpoint(), stage=self.stage)
+        stages = getattr(_local, 'stages', None)
+        if stages is not None:
+            stages.append((self.stage, elapsed))
+        return False
+
+
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+
+def flush(force=False):
+    """
+    Write this worker's snapshot to OVCARE_METRICS_DIR, at most once per
+    FLUSH_INTERVAL_SECONDS unless forced
+    """
+    if not METRICS_DIR:
+        return
+    current = registry()
+    now = time.monotonic()
+    if not force and now - current._last_flush < FLUSH_INTERVAL_SECONDS:
+        return
+    current._last_flush = now
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _snapshot_path(current.pid)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(current.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _collect_snapshots():
+    """This process's snapshot plus every other worker's last written one"""
+    snapshots = [registry().snapshot()]
+    if METRICS_DIR:
+        flush(force=True)
+        own = _snapshot_path(registry().pid)
+        for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return snapshots
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def render_prometheus(live_gauges=None):
+    """
+    Merge all workers' metrics and render them in the Prometheus text format
+
+    Counters and histograms are summed across workers; gauges report the
+    maximum value seen for each label set.
+
+    Args:
+        live_gauges: Optional list of (name, labels dict, value) read at scrape
+                     time; they replace every worker's value for those metrics
+    """
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot in _collect_snapshots():
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, value in snapshot['gauges']:
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = max(gauges.get(key, value), value)
+        for name, labels, h in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(
+                key, {'buckets': h['buckets'], 'counts': [0] * len(h['counts']), 'sum': 0.0, 'count': 0}
+            )
+            merged['counts'] = [a + b for a, b in zip(merged['counts'], h['counts'])]
+            merged['sum'] += h['sum']
+            merged['count'] += h['count']
+
+    if live_gauges:
+        live_names = {name for name, _, _ in live_gauges}
+        gauges = {key: value for key, value in gauges.items() if key[0] not in live_names}
+        for name, labels, value in live_gauges:
+            gauges[(name, _labels(**labels))] = value
+
+    lines = []
+    for metric_name, (metric_type, help_text) in METRIC_HELP.items():
+        if metric_type == 'counter':
+            series = [(key, value) for key, value in counters.items() if key[0] == metric_name]
+        elif metric_type == 'gauge':
+            series = [(key, value) for key, value in gauges.items() if key[0] == metric_name]
+        else:
+            series = [(key, value) for key, value in histograms.items() if key[0] == metric_name]
+        if not series:
+            continue
+        lines.append(f"# HELP {metric_name} {help_text}")
+        lines.append(f"# TYPE {metric_name} {metric_type}")
+        for (_, labels), value in sorted(series, key=lambda item: item[0][1]):
+            if metric_type != 'histogram':
+                lines.append(f"{metric_name}{_format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for upper, count in zip(list(value['buckets']) + ['+Inf'], value['counts']):
+                cumulative += count
+                bucket_labels = labels + (('le', str(upper)),)
+                lines.append(f"{metric_name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{metric_name}_sum{_format_labels(labels)} {value['sum']}")
+            lines.append(f"{metric_name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
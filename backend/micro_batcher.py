@@ -0,0 +1,138 @@
+"""
+Adaptive Micro-Batching for OvCare
+Collects concurrent single-row prediction requests for a few milliseconds
+and scores them with one batched predict_proba call
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import Histogram
+
+# Upper bounds of the batch-size and wait-time histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+WAIT_MS_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+class MicroBatcher:
+    """
+    Queue plus dispatcher thread that batches single-row predictions
+
+    A batch is dispatched when it reaches max_batch_size or when the oldest
+    queued row has waited max_wait_ms, whichever comes first. Rows queued
+    against different model bundles (e.g. across a hot swap) are scored
+    separately, each with its own model.
+    """
+
+    def __init__(self, max_batch_size=32, max_wait_ms=2.0):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_seconds = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self._wait_ms = Histogram(WAIT_MS_BUCKETS)
+        self.max_queue_depth = 0
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self._start()
+        if hasattr(os, "register_at_fork"):
+            # Workers forked from a preloaded master inherit no dispatcher thread
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._start()
+
+    def submit(self, row, bundle):
+        """
+        Queue one feature row for scoring
+
+        Args:
+            row: 1-D feature vector
+            bundle: ModelBundle whose model should score it
+
+        Returns:
+            Future resolving to the row's predict_proba output
+        """
+        future = Future()
+        self._queue.put((np.asarray(row, dtype=np.float64), bundle, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            with self._lock:
+                self.max_queue_depth = max(self.max_queue_depth, depth)
+        return future
+
+    def predict_proba_row(self, row, bundle):
+        """Submit a row and wait for its probabilities"""
+        return self.submit(row, bundle).result()
+
+    def _collect(self):
+        """Block for the first item, then gather more until full or timed out"""
+        items = [self._queue.get()]
+        deadline = items[0][3] + self.max_wait_seconds
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    items.append(self._queue.get_nowait())
+                else:
+                    items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            dispatched_at = time.perf_counter()
+
+            groups = {}
+            for item in items:
+                groups.setdefault(id(item[1]), []).append(item)
+
+            for group in groups.values():
+                bundle = group[0][1]
+                try:
+                    proba = bundle.model.predict_proba(np.vstack([item[0] for item in group]))
+                except Exception as e:
+                    with self._lock:
+                        self.errors += 1
+                    for item in group:
+                        item[2].set_exception(e)
+                    continue
+                for item, row_proba in zip(group, proba):
+                    item[2].set_result(row_proba)
+
+            with self._lock:
+                self.batches += 1
+                self.rows += len(items)
+                self._batch_sizes.observe(len(items))
+                for item in items:
+                    self._wait_ms.observe((dispatched_at - item[3]) * 1000)
+
+    def stats(self):
+        """Queue depth, batch-size histogram and added wait time"""
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_seconds * 1000,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'batches': self.batches,
+                'rows': self.rows,
+                'errors': self.errors,
+                'mean_batch_size': self.rows / self.batches if self.batches else 0.0,
+                'batch_size_histogram': self._batch_sizes.to_dict(),
+                'added_wait_ms_histogram': self._wait_ms.to_dict()
+            }
@@ -0,0 +1,158 @@
+"""
+Memory-Mapped Model Artifact for OvCare
+Pickle-free on-disk format for a compiled tree ensemble: one flat
+little-endian array file per node array plus a JSON header. Loading maps
+the arrays with np.memmap, so startup is near instant and every worker
+process shares the same physical pages.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from compiled_model import CompiledEnsemble
+
+ARTIFACT_DIR = os.path.join(os.path.dirname(__file__), "model_artifact")
+HEADER_FILE = "header.json"
+ARTIFACT_FORMAT = "ovcare-tree-ensemble"
+ARTIFACT_FORMAT_VERSION = 1
+
+# Node arrays stored as flat files, with their on-disk dtypes
+ARRAY_DTYPES = {
+    'feature': '<i8',
+    'threshold': '<f8',
+    'left': '<i8',
+    'missing': '<i8',
+    'value': '<f8',
+    'roots': '<i8',
+    'cover': '<f8'
+}
+# Arrays that older artifacts may lack
+OPTIONAL_ARRAYS = ('cover',)
+
+
+def save_model_artifact(compiled, metadata, scaler=None, directory=ARTIFACT_DIR):
+    """
+    Write a compiled ensemble as flat array files plus a JSON header
+
+    The artifact is written to a temporary directory and moved into place,
+    so readers never see a half-written model.
+
+    Args:
+        compiled: CompiledEnsemble from compile_pipeline
+        metadata: Model metadata dict (as written to model_metadata.json)
+        scaler: Fitted StandardScaler, recorded in the header for reference
+        directory: Destination directory
+
+    Returns:
+        Path of the artifact directory
+    """
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    arrays = {}
+    for name, dtype in ARRAY_DTYPES.items():
+        if name in OPTIONAL_ARRAYS and getattr(compiled, name) is None:
+            continue
+        values = np.ascontiguousarray(getattr(compiled, name), dtype=dtype)
+        filename = f"{name}.bin"
+        values.tofile(os.path.join(tmp_dir, filename))
+        arrays[name] = {'file': filename, 'dtype': dtype, 'shape': list(values.shape)}
+
+    header = {
+        'format': ARTIFACT_FORMAT,
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_version': metadata.get('model_version'),
+        'training_date': metadata.get('training_date'),
+        'model_type': compiled.model_type,
+        'features': metadata.get('features', []),
+        'scaler': {
+            'mean': scaler.mean_.tolist(),
+            'scale': scaler.scale_.tolist()
+        } if scaler is not None else None,
+        'ensemble': {
+            'max_depth': compiled.max_depth,
+            'base_margin': compiled.base_margin,
+            'scale': compiled.scale,
+            'strict_less': compiled.strict_less,
+            'classes': compiled.classes_.tolist(),
+            'input_mean': None if compiled.input_mean is None else compiled.input_mean.tolist(),
+            'input_scale': None if compiled.input_scale is None else compiled.input_scale.tolist(),
+            'float32_inputs': compiled.float32_inputs
+        },
+        'arrays': arrays
+    }
+    with open(os.path.join(tmp_dir, HEADER_FILE), 'w') as f:
+        json.dump(header, f, indent=2)
+
+    old_dir = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return directory
+
+
+def read_artifact_header(directory=ARTIFACT_DIR):
+    """
+    Read and validate an artifact header
+
+    Returns:
+        Header dict, or None if no artifact exists
+
+    Raises:
+        ValueError: If the artifact has an unknown format or version
+    """
+    path = os.path.join(directory, HEADER_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        header = json.load(f)
+    if header.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"Unknown model artifact format: {header.get('format')}")
+    if header.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version: {header.get('format_version')}")
+    return header
+
+
+def load_model_artifact(directory=ARTIFACT_DIR):
+    """
+    Map a saved artifact into memory without copying the node arrays
+
+    Args:
+        directory: Artifact directory written by save_model_artifact
+
+    Returns:
+        Tuple of (CompiledEnsemble backed by read-only memmaps, header dict)
+    """
+    header = read_artifact_header(directory)
+    if header is None:
+        raise FileNotFoundError(f"No model artifact at {directory}")
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        shape = tuple(spec['shape'])
+        if shape[0] == 0:
+            arrays[name] = np.zeros(shape, dtype=spec['dtype'])
+            continue
+        arrays[name] = np.memmap(
+            os.path.join(directory, spec['file']), dtype=spec['dtype'], mode='r', shape=shape
+        )
+
+    ensemble = header['ensemble']
+    compiled = CompiledEnsemble(
+        classes=ensemble['classes'],
+        model_type=header['model_type'],
+        max_depth=ensemble['max_depth'],
+        base_margin=ensemble['base_margin'],
+        scale=ensemble['scale'],
+        strict_less=ensemble['strict_less'],
+        input_mean=ensemble['input_mean'],
+        input_scale=ensemble['input_scale'],
+        float32_inputs=ensemble['float32_inputs'],
+        **arrays
+    )
+    return compiled, header
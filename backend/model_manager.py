@@ -0,0 +1,410 @@
+"""
+Model Manager for OvCare
+Loads the model and its metadata as one immutable bundle and swaps in new
+bundles at runtime: load in the background, warm up, then switch atomically
+"""
+
+import json
+import os
+import threading
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+from attributions import attributor_for
+from cascade import SCREENER_DIR, load_screener
+from feature_schema import BASE_FEATURE_DEFAULTS, FEATURE_NAMES, FeatureSchema
+from model_artifact import ARTIFACT_DIR, HEADER_FILE, read_artifact_header, load_model_artifact
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "model.pkl")
+METADATA_PATH = os.path.join(os.path.dirname(__file__), "model_metadata.json")
+
+# OVCARE_MODEL_FORMAT: 'auto' maps model_artifact/ when it matches the current
+# metadata and falls back to model.pkl, 'mmap' requires the artifact, 'pickle'
+# always unpickles model.pkl
+MODEL_FORMAT = os.environ.get("OVCARE_MODEL_FORMAT", "auto").lower()
+
+
+def _model_feature_names(pipeline, model, metadata):
+    """Input columns of a model: from its metadata, else from the fitted pipeline"""
+    if metadata.get('features'):
+        return list(metadata['features'])
+    names = getattr(pipeline, 'feature_names_in_', None)
+    if names is not None:
+        return [str(name) for name in names]
+    if getattr(model, 'n_features_in_', None) == len(BASE_FEATURE_DEFAULTS):
+        return [name for name, _ in BASE_FEATURE_DEFAULTS]
+    return list(FEATURE_NAMES)
+
+
+def _sorted_feature_importance(pipeline, feature_names, metadata):
+    """(feature, importance) pairs, most important first"""
+    importance = metadata.get('feature_importance')
+    if not importance and pipeline is not None and hasattr(pipeline[-1], 'feature_importances_'):
+        importance = dict(zip(feature_names, pipeline[-1].feature_importances_.tolist()))
+    return sorted((importance or {}).items(), key=lambda item: item[1], reverse=True)
+
+
+class ModelBundle:
+    """Everything a request needs from one model version, never mutated after load"""
+
+    def __init__(self, pipeline, model, engine, source, metadata):
+        self.pipeline = pipeline
+        self.model = model
+        self.engine = engine
+        self.source = source
+        self.metadata = metadata
+        # CascadeScreener trained with this model, or None
+        self.screener = None
+        # Request parsing and response data derived once per model
+        self.feature_names = _model_feature_names(pipeline, model, metadata)
+        self.schema = FeatureSchema(self.feature_names)
+        self.feature_importance = _sorted_feature_importance(pipeline, self.feature_names, metadata)
+        self.loaded_at = datetime.now().isoformat()
+        self.swapped_at = None
+        # Milliseconds spent reading metadata and loading the model
+        self.load_timings = {}
+
+    @property
+    def version(self):
+        return self.metadata.get('model_version', '2.0.0')
+
+    @property
+    def version_token(self):
+        """Changes whenever the model is retrained, even if model_version does not"""
+        if not self.metadata.get('training_date'):
+            # No metadata to tell versions apart: every load is a new version
+            return f"{self.source}:{self.loaded_at}"
+        return f"{self.metadata.get('model_version', 'Unknown')}:{self.metadata.get('training_date', '')}"
+
+
+def load_model_bundle(model_path=MODEL_PATH, metadata_path=METADATA_PATH,
+                      artifact_dir=ARTIFACT_DIR, model_format=None, screener_dir=SCREENER_DIR):
+    """
+    Load the model from the memory-mapped artifact or from model.pkl
+
+    Args:
+        model_path: Path of the pickled pipeline
+        metadata_path: Path of model_metadata.json
+        artifact_dir: Directory of the memory-mapped artifact
+        model_format: 'auto', 'mmap' or 'pickle'; defaults to $OVCARE_MODEL_FORMAT
+        screener_dir: Directory of the cascade screening model (None: no screener)
+
+    Returns:
+        ModelBundle
+    """
+    model_format = (model_format or MODEL_FORMAT).lower()
+
+    # Load metadata if available
+    start = time.perf_counter()
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+    timings = {'metadata_ms': (time.perf_counter() - start) * 1000}
+    start = time.perf_counter()
+
+    if model_format in ("auto", "mmap"):
+        try:
+            header = read_artifact_header(artifact_dir)
+            if header is None:
+                raise FileNotFoundError(f"No model artifact at {artifact_dir}")
+            if metadata and header.get('training_date') != metadata.get('training_date'):
+                raise ValueError("Model artifact does not match model_metadata.json")
+            compiled, _ = load_model_artifact(artifact_dir)
+            bundle = ModelBundle(None, compiled, 'compiled-mmap', artifact_dir, metadata)
+            bundle.screener = load_screener(metadata, screener_dir)
+            bundle.load_timings = dict(timings, model_ms=(time.perf_counter() - start) * 1000)
+            return bundle
+        except (OSError, ValueError) as e:
+            if model_format == "mmap":
+                raise RuntimeError(f"Cannot load memory-mapped model: {e}")
+            print(f"Memory-mapped model unavailable ({e}), loading {model_path}")
+
+    if not os.path.exists(model_path):
+        raise RuntimeError(f"model.pkl not found at {model_path}. Run train.py first.")
+
+    # Only the pickle fallback pays for unpickling (and importing scikit-learn
+    # and XGBoost); the memory-mapped path never touches them
+    import pickle
+    from compiled_model import select_inference_model
+
+    with open(model_path, "rb") as f:
+        pipeline = pickle.load(f)
+
+    # OVCARE_INFERENCE_ENGINE=compiled swaps in the flattened tree evaluator
+    model, engine = select_inference_model(pipeline)
+    bundle = ModelBundle(pipeline, model, engine, model_path, metadata)
+    bundle.screener = load_screener(metadata, screener_dir)
+    bundle.load_timings = dict(timings, model_ms=(time.perf_counter() - start) * 1000)
+    return bundle
+
+
+def load_bundle_from_path(path, metadata_path=None):
+    """
+    Load a model given a model.pkl file or a model_artifact/ directory
+
+    Args:
+        path: A model.pkl file or a model_artifact/ directory
+        metadata_path: Its model_metadata.json; defaults to the one next to it
+
+    Returns:
+        ModelBundle (without a cascade screener)
+    """
+    path = os.path.abspath(path)
+    if metadata_path is None:
+        metadata_path = os.path.join(os.path.dirname(path), "model_metadata.json")
+    if os.path.isdir(path):
+        return load_model_bundle(metadata_path=metadata_path, artifact_dir=path, model_format="mmap",
+                                 screener_dir=None)
+    return load_model_bundle(model_path=path, metadata_path=metadata_path, model_format="pickle",
+                             screener_dir=None)
+
+
+def warm_up(bundle, X):
+    """
+    Run a warm-up batch and single rows through a freshly loaded model
+
+    Args:
+        bundle: ModelBundle to exercise
+        X: Synthetic feature matrix
+
+    Returns:
+        Dictionary of warm-up timings in milliseconds
+
+    Raises:
+        ValueError: If the model produces invalid probabilities
+    """
+    model = bundle.model
+    with warnings.catch_warnings():
+        # Pipelines fitted on a DataFrame warn about NumPy input; the API
+        # always scores NumPy rows in model column order
+        warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+        start = time.perf_counter()
+        if hasattr(model, "predict_proba"):
+            proba = model.predict_proba(X)
+            if proba.shape != (len(X), 2) or not np.all(np.isfinite(proba)) \
+                    or proba.min() < 0.0 or proba.max() > 1.0:
+                raise ValueError("Warm-up produced invalid probabilities")
+        else:
+            model.predict(X)
+        batch_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for row in X[:8]:
+            if hasattr(model, "predict_proba"):
+                model.predict_proba(row[None, :])
+            else:
+                model.predict(row[None, :])
+        single_ms = (time.perf_counter() - start) * 1000
+
+    screener_ms = None
+    if bundle.screener is not None:
+        start = time.perf_counter()
+        bundle.screener.screen(X)
+        bundle.screener.screen(X[:1])
+        screener_ms = (time.perf_counter() - start) * 1000
+
+    # Attribution tables are built before the swap, not on the first request
+    start = time.perf_counter()
+    attributor_for(bundle)
+    attributions_ms = (time.perf_counter() - start) * 1000
+
+    return {'rows': int(len(X)), 'batch_ms': batch_ms, 'single_rows_ms': single_ms,
+            'screener_ms': screener_ms, 'attributions_ms': attributions_ms}
+
+
+class ModelManager:
+    """
+    Holds the active ModelBundle and replaces it without restarting
+
+    Requests read `active` once and keep using that bundle, so in-flight
+    requests finish on the old model while new ones see the new one.
+    """
+
+    def __init__(self, bundle, warmup_rows, loader=load_model_bundle,
+                 watch_paths=(METADATA_PATH, MODEL_PATH, os.path.join(ARTIFACT_DIR, HEADER_FILE),
+                              os.path.join(SCREENER_DIR, HEADER_FILE))):
+        bundle.swapped_at = bundle.loaded_at
+        self._active = bundle
+        # Callable mapping a bundle to a synthetic feature matrix for warm-up
+        self._warmup_rows = warmup_rows
+        self._loader = loader
+        self._reload_lock = threading.Lock()
+        self._watch_paths = watch_paths
+        self._watcher = None
+        self._watch_interval = None
+        self._warm_up_thread = None
+        self._ready = threading.Event()
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+        self.last_warmup = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        """
+        Restart background threads in a worker forked from a preloaded master
+        (serve.py, gunicorn --preload), which inherits none of them
+        """
+        self._reload_lock = threading.Lock()
+        if self._warm_up_thread is not None and not self.ready:
+            self._start_warm_up_thread()
+        if self._watcher is not None:
+            self._start_watcher_thread()
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def reloading(self):
+        return self._reload_lock.locked()
+
+    @property
+    def ready(self):
+        """True once the startup model has been warmed up"""
+        return self._ready.is_set()
+
+    def warm_up_active(self):
+        """
+        Warm up the startup model and mark the manager ready
+
+        Returns:
+            Dictionary of warm-up timings, or None if warm-up failed (the
+            manager then stays not ready until a reload succeeds)
+        """
+        try:
+            warmup = warm_up(self._active, self._warmup_rows(self._active))
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Model warm-up failed for {self._active.version_token}: {e}")
+            return None
+        self.last_warmup = warmup
+        self._ready.set()
+        return warmup
+
+    def start_warm_up(self, on_ready=None):
+        """
+        Warm up the startup model in a background thread
+
+        Args:
+            on_ready: Optional callable given the warm-up timings once ready
+        """
+        self._on_ready = on_ready
+        self._start_warm_up_thread()
+
+    def _start_warm_up_thread(self):
+        def run():
+            warmup = self.warm_up_active()
+            if warmup is not None and self._on_ready is not None:
+                self._on_ready(warmup)
+
+        self._warm_up_thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        self._warm_up_thread.start()
+
+    def reload(self):
+        """
+        Load, warm up and swap in the model currently on disk
+
+        Returns:
+            Dictionary describing the outcome
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {"status": "in_progress"}
+        try:
+            bundle = self._loader()
+            warmup = warm_up(bundle, self._warmup_rows(bundle))
+            previous = self._active
+            bundle.swapped_at = datetime.now().isoformat()
+            self._active = bundle
+            self.reloads += 1
+            self.last_warmup = warmup
+            self.last_error = None
+            self._ready.set()
+            print(f"Model swapped: {previous.version_token} -> {bundle.version_token}")
+            return {
+                "status": "swapped",
+                "previous_version": previous.version_token,
+                "active_version": bundle.version_token,
+                "warmup": warmup
+            }
+        except Exception as e:
+            self.failed_reloads += 1
+            self.last_error = str(e)
+            print(f"Model reload failed, keeping {self._active.version_token}: {e}")
+            return {"status": "failed", "error": str(e)}
+        finally:
+            self._reload_lock.release()
+
+    def reload_async(self):
+        """Start a reload in a background thread"""
+        if self.reloading:
+            return {"status": "in_progress"}
+        threading.Thread(target=self.reload, name="model-reload", daemon=True).start()
+        return {"status": "started"}
+
+    def _signature(self):
+        """Modification time and size of every watched file"""
+        signature = []
+        for path in self._watch_paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def start_watcher(self, interval_seconds):
+        """
+        Poll the model files and reload once a change has settled
+
+        A reload starts only after two consecutive polls see the same new
+        signature, so a half-written retrain is not picked up.
+        """
+        if self._watcher is not None or interval_seconds <= 0:
+            return
+        self._watch_interval = interval_seconds
+        self._start_watcher_thread()
+
+    def _start_watcher_thread(self):
+        def watch():
+            loaded = self._signature()
+            pending = None
+            while True:
+                time.sleep(self._watch_interval)
+                current = self._signature()
+                if current == loaded:
+                    pending = None
+                elif current != pending:
+                    pending = current
+                else:
+                    result = self.reload()
+                    if result["status"] != "in_progress":
+                        loaded = current
+                    pending = None
+
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        """Active version and reload counters"""
+        bundle = self._active
+        return {
+            "active_version": bundle.version_token,
+            "engine": bundle.engine,
+            "source": bundle.source,
+            "screener": bundle.screener is not None,
+            "loaded_at": bundle.loaded_at,
+            "swapped_at": bundle.swapped_at,
+            "ready": self.ready,
+            "reloading": self.reloading,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "last_warmup": self.last_warmup,
+            "watching": self._watcher is not None
+        }
@@ -0,0 +1,170 @@
+"""
+Prediction Cache for OvCare
+In-process LRU + TTL cache of model outputs keyed by feature vector and
+model version, with coalescing of concurrent identical requests
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def feature_vector_key(X, model_version, variant=None):
+    """
+    Canonical cache key for a feature vector under a model version
+
+    Args:
+        X: Feature vector or single-row matrix
+        model_version: Version string of the model that will score it
+        variant: Optional string for other inputs the result depends on
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256(str(model_version).encode())
+    if variant is not None:
+        digest.update(b'|' + str(variant).encode())
+    digest.update(np.ascontiguousarray(X, dtype='<f8').tobytes())
+    return digest.hexdigest()
+
+
+class _InFlight:
+    """Result slot shared by requests waiting on the same computation"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with per-entry TTL
+
+    Entries are tagged with the model version they were computed under and
+    the whole cache is flushed the first time a different version is seen.
+    """
+
+    def __init__(self, max_size=4096, ttl_seconds=300.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.flushes = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def _check_version(self, model_version):
+        """Flush everything if the model changed (caller holds the lock)"""
+        if model_version != self.model_version:
+            if self._entries:
+                self.flushes += 1
+            self._entries.clear()
+            self.model_version = model_version
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+            self.flushes += 1
+
+    def get_or_compute(self, X, model_version, compute, variant=None):
+        """
+        Return the cached result for X, computing it at most once
+
+        Concurrent callers with the same key wait for the first caller's
+        computation instead of running their own.
+
+        Args:
+            X: Feature vector used as the key
+            model_version: Version of the model that compute() uses
+            compute: Zero-argument callable producing the result
+            variant: Optional string for other inputs the result depends
+                     on; part of the key, unlike model_version it never
+                     flushes the cache
+
+        Returns:
+            The cached or freshly computed result
+        """
+        if not self.enabled:
+            return compute()
+
+        key = feature_vector_key(X, model_version, variant)
+        now = time.monotonic()
+
+        with self._lock:
+            self._check_version(model_version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+            waiter = self._in_flight.get(key)
+            if waiter is None:
+                waiter = self._in_flight[key] = _InFlight()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.coalesced += 1
+
+        if not owner:
+            waiter.event.wait()
+            if waiter.error is not None:
+                raise waiter.error
+            return waiter.value
+
+        try:
+            waiter.value = compute()
+        except Exception as e:
+            waiter.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if waiter.error is None and model_version == self.model_version:
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, waiter.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+            waiter.event.set()
+
+        return waiter.value
+
+    def stats(self):
+        """Counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "model_version": self.model_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "flushes": self.flushes,
+                "in_flight": len(self._in_flight),
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,198 @@
+"""
+Request Body Decoding for OvCare
+Decodes JSON, MessagePack and columnar binary request bodies, optionally
+gzip-compressed, into the payload dictionaries the API endpoints read
+
+Columnar binary format (Content-Type: application/x-ovcare-columns):
+
+    4 bytes   magic b"OVCB"
+    4 bytes   header length, uint32 little-endian
+    n bytes   UTF-8 JSON header:
+                {"columns": [names...], "rows": n_rows,
+                 "dtype": "<f8" | "<f4",             (default "<f8")
+                 "target": "columns" | "history_columns",  (default "columns")
+                 "fields": {...}}                    (optional scalar fields)
+    rest      column-major values: each column's n_rows values in turn
+
+The decoded payload is the header's "fields" plus {target: {name: array}},
+so a body built for /predict-batch looks like a JSON {"columns": {...}}
+request and one built for /predict-temporal carries its history as
+"history_columns". Arrays are views over the body, not per-value copies.
+"""
+
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+# Try to import msgpack; MessagePack bodies are rejected without it
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+COLUMNAR_CONTENT_TYPE = "application/x-ovcare-columns"
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack")
+COLUMNAR_MAGIC = b"OVCB"
+COLUMNAR_DTYPES = ("<f8", "<f4")
+COLUMNAR_TARGETS = ("columns", "history_columns")
+
+# Largest body accepted after decompression (guards against gzip bombs)
+MAX_DECODED_BYTES = int(os.environ.get("OVCARE_MAX_DECODED_BYTES", 64 * 1024 * 1024))
+
+
+def decompress_body(body, content_encoding):
+    """
+    Undo the Content-Encoding of a request body
+
+    Args:
+        body: Raw request bytes
+        content_encoding: Content-Encoding header value (may be None)
+
+    Returns:
+        Decoded bytes
+    """
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return body
+    if encoding not in ("gzip", "x-gzip", "deflate"):
+        raise ValueError(f"Unsupported Content-Encoding: {content_encoding}")
+
+    # wbits 47 auto-detects a gzip or zlib header
+    decompressor = zlib.decompressobj(47 if encoding != "deflate" else 15)
+    try:
+        decoded = decompressor.decompress(body, MAX_DECODED_BYTES + 1)
+    except zlib.error as e:
+        raise ValueError(f"Invalid {encoding} body: {e}")
+    if len(decoded) > MAX_DECODED_BYTES or decompressor.unconsumed_tail:
+        raise ValueError(f"Decompressed body exceeds {MAX_DECODED_BYTES} bytes")
+    return decoded
+
+
+def encode_columnar(columns, target="columns", fields=None, dtype="<f8"):
+    """
+    Build a columnar binary request body
+
+    Args:
+        columns: Dictionary of column name -> array-like, all the same length
+        target: Payload key the columns decode into
+        fields: Optional dictionary of scalar payload fields
+        dtype: "<f8" or "<f4"
+
+    Returns:
+        Bytes to send with Content-Type application/x-ovcare-columns
+    """
+    names = list(columns)
+    arrays = [np.ascontiguousarray(columns[name], dtype=dtype) for name in names]
+    rows = len(arrays[0]) if arrays else 0
+    header = {"columns": names, "rows": rows, "dtype": dtype, "target": target}
+    if fields:
+        header["fields"] = fields
+    header_bytes = json.dumps(header).encode("utf-8")
+    return b"".join(
+        [COLUMNAR_MAGIC, struct.pack("<I", len(header_bytes)), header_bytes] +
+        [array.tobytes() for array in arrays]
+    )
+
+
+def decode_columnar(body):
+    """
+    Decode a columnar binary body (see module docstring)
+
+    Returns:
+        Payload dictionary
+    """
+    if len(body) < 8 or body[:4] != COLUMNAR_MAGIC:
+        raise ValueError("Columnar body must start with the OVCB magic")
+    (header_length,) = struct.unpack_from("<I", body, 4)
+    data_offset = 8 + header_length
+    if data_offset > len(body):
+        raise ValueError("Columnar header length exceeds the body")
+    try:
+        header = json.loads(body[8:data_offset])
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid columnar header: {e}")
+
+    names = header.get("columns") or []
+    rows = int(header.get("rows", 0))
+    dtype = header.get("dtype", "<f8")
+    target = header.get("target", "columns")
+    if dtype not in COLUMNAR_DTYPES:
+        raise ValueError(f"Unsupported columnar dtype {dtype}; expected one of {COLUMNAR_DTYPES}")
+    if target not in COLUMNAR_TARGETS:
+        raise ValueError(f"Unsupported columnar target {target}; expected one of {COLUMNAR_TARGETS}")
+    if rows < 0 or len(set(names)) != len(names):
+        raise ValueError("Columnar header has a negative row count or duplicate columns")
+
+    expected = len(names) * rows * np.dtype(dtype).itemsize
+    if len(body) - data_offset != expected:
+        raise ValueError(
+            f"Columnar body holds {len(body) - data_offset} data bytes, expected {expected} "
+            f"for {len(names)} columns x {rows} rows of {dtype}"
+        )
+
+    values = np.frombuffer(body, dtype=dtype, count=len(names) * rows, offset=data_offset)
+    values = values.reshape(len(names), rows)
+    payload = dict(header.get("fields") or {})
+    payload[target] = {name: values[i] for i, name in enumerate(names)}
+    return payload
+
+
+def _binary_columns(columns):
+    """Read MessagePack bin values as little-endian float64 arrays"""
+    return {
+        name: np.frombuffer(value, dtype="<f8") if isinstance(value, (bytes, bytearray)) else value
+        for name, value in columns.items()
+    }
+
+
+def decode_msgpack(body):
+    """
+    Decode a MessagePack body with the same structure as the JSON payload
+
+    Columns in "columns" or "history_columns" may be sent either as arrays or
+    as bin values holding little-endian float64s.
+    """
+    if msgpack is None:
+        raise ValueError("MessagePack bodies require the msgpack package (pip install msgpack)")
+    try:
+        payload = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise ValueError(f"Invalid MessagePack body: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("MessagePack body must be a map")
+    for key in COLUMNAR_TARGETS:
+        if isinstance(payload.get(key), dict):
+            payload[key] = _binary_columns(payload[key])
+    return payload
+
+
+def decode_request_body(body, content_type, content_encoding=None):
+    """
+    Decode a request body into a payload dictionary
+
+    Args:
+        body: Raw request bytes
+        content_type: Request mimetype (without parameters)
+        content_encoding: Content-Encoding header value
+
+    Returns:
+        Payload dictionary; JSON bodies decode exactly as before
+    """
+    body = decompress_body(body, content_encoding)
+    content_type = (content_type or "").lower()
+
+    if content_type == COLUMNAR_CONTENT_TYPE:
+        return decode_columnar(body)
+    if content_type in MSGPACK_CONTENT_TYPES:
+        return decode_msgpack(body)
+
+    try:
+        payload = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid JSON body: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("JSON body must be an object")
+    return payload
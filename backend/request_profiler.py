@@ -0,0 +1,185 @@
+"""
+On-Demand Request Profiling for OvCare
+Runs single admin-flagged requests under cProfile and takes time-boxed
+sampling profiles of every in-flight request. Nothing here runs unless an
+admin asks for it.
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+# Profiles kept in memory per worker for /admin/profiles/<id>
+PROFILE_STORE_SIZE = int(os.environ.get("OVCARE_PROFILE_STORE_SIZE", 20))
+
+# Functions reported per profile
+PROFILE_TOP_N = int(os.environ.get("OVCARE_PROFILE_TOP_N", 25))
+
+# Bounds of a sampling profile
+MAX_SAMPLE_SECONDS = 60.0
+MIN_SAMPLE_INTERVAL_MS = 1.0
+
+# A thread is serving a request while this Flask frame is on its stack
+REQUEST_FRAME = "full_dispatch_request"
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _location(filename, lineno, function):
+    """Short file:line(function) label; backend modules relative, others by package/module"""
+    if filename.startswith(BACKEND_DIR):
+        filename = os.path.relpath(filename, BACKEND_DIR)
+    elif filename.startswith(("<", "~")):
+        return function
+    else:
+        filename = "/".join(filename.replace(os.sep, "/").split("/")[-2:])
+    return f"{filename}:{lineno}({function})"
+
+
+class RequestProfile:
+    """cProfile plus per-stage timings of one request"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.stages = []
+        self._profiler = cProfile.Profile()
+        self._start = None
+        self.wall_ms = None
+
+    @property
+    def running(self):
+        return self._start is not None and self.wall_ms is None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._profiler.enable()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._profiler.disable()
+        self.wall_ms = (time.perf_counter() - self._start) * 1000
+
+    def report(self, top_n=PROFILE_TOP_N):
+        """
+        Top functions by cumulative time and the per-stage timings
+
+        Returns:
+            Dictionary ready for JSON
+        """
+        stats = pstats.Stats(self._profiler).stats
+        ranked = sorted(stats.items(), key=lambda item: -item[1][3])[:top_n]
+        stage_ms = {}
+        for stage, seconds in self.stages:
+            stage_ms[stage] = stage_ms.get(stage, 0.0) + seconds * 1000
+        return {
+            "id": self.id,
+            "wall_ms": self.wall_ms,
+            "stages_ms": stage_ms,
+            "functions": [
+                {
+                    "function": _location(*key),
+                    "calls": calls,
+                    "own_ms": own * 1000,
+                    "cumulative_ms": cumulative * 1000
+                }
+                for key, (_, calls, own, cumulative, _) in ranked
+            ]
+        }
+
+
+class ProfileStore:
+    """Most recent request profile reports, by id"""
+
+    def __init__(self, max_size=PROFILE_STORE_SIZE):
+        self.max_size = max(1, int(max_size))
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, report):
+        with self._lock:
+            self._reports[report["id"]] = report
+            while len(self._reports) > self.max_size:
+                self._reports.popitem(last=False)
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._reports.get(profile_id)
+
+    def summaries(self):
+        """Id, path and wall time of every stored profile, newest first"""
+        with self._lock:
+            return [
+                {"id": report["id"], "path": report.get("path"), "wall_ms": report["wall_ms"]}
+                for report in reversed(self._reports.values())
+            ]
+
+
+_sampling_lock = threading.Lock()
+
+
+def sample_profile(seconds, interval_ms=5.0, all_threads=False, top_n=PROFILE_TOP_N):
+    """
+    Sample the Python stacks of in-flight requests for a fixed time
+
+    Args:
+        seconds: How long to sample (at most MAX_SAMPLE_SECONDS)
+        interval_ms: Time between samples
+        all_threads: Also sample background threads (micro-batcher, shadow
+                     scorer, warm-up), not only threads serving a request
+        top_n: Functions and stacks reported
+
+    Returns:
+        Dictionary with sample counts, the hottest functions (inclusive and
+        self) and the hottest stacks in folded "a;b;c" form
+    """
+    seconds = min(max(float(seconds), 0.0), MAX_SAMPLE_SECONDS)
+    interval = max(float(interval_ms), MIN_SAMPLE_INTERVAL_MS) / 1000
+    if not _sampling_lock.acquire(blocking=False):
+        raise RuntimeError("A sampling profile is already running")
+    try:
+        me = threading.get_ident()
+        inclusive, own, stacks = Counter(), Counter(), Counter()
+        samples = ticks = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            ticks += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(_location(code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                if not all_threads and not any(label.endswith(f"({REQUEST_FRAME})") for label in stack):
+                    continue
+                stack.reverse()
+                samples += 1
+                own[stack[-1]] += 1
+                inclusive.update(set(stack))
+                stacks[";".join(stack)] += 1
+            time.sleep(interval)
+    finally:
+        _sampling_lock.release()
+
+    return {
+        "seconds": seconds,
+        "interval_ms": interval * 1000,
+        "ticks": ticks,
+        "samples": samples,
+        "functions": [
+            {"function": function, "samples": count, "fraction": count / samples, "self_samples": own[function]}
+            for function, count in inclusive.most_common(top_n)
+        ],
+        "self": [
+            {"function": function, "samples": count, "fraction": count / samples}
+            for function, count in own.most_common(top_n)
+        ],
+        "stacks": [{"stack": stack, "samples": count} for stack, count in stacks.most_common(top_n)]
+    }
@@ -0,0 +1,196 @@
+"""
+Risk Recompute Queue for OvCare
+Durable SQLite queue of "patient X has new data" jobs, written by the PHP
+pages and drained by risk_worker.py
+"""
+
+import os
+import threading
+import time
+
+from sqlite_util import Transaction, connect
+
+RISK_QUEUE_DB_PATH = os.environ.get(
+    "OVCARE_RISK_QUEUE_DB",
+    os.path.join(os.path.dirname(__file__), "risk_queue.db")
+)
+
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 5.0
+RETRY_MAX_SECONDS = 600.0
+# A running job whose worker has not finished it within the lease is retried
+LEASE_SECONDS = 300.0
+# Seconds between heartbeats of a running worker process
+HEARTBEAT_INTERVAL_SECONDS = 10.0
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS risk_jobs ("
+    "job_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "patient_id INTEGER NOT NULL, "
+    "status TEXT NOT NULL DEFAULT 'pending', "  # pending | running | failed
+    "attempts INTEGER NOT NULL DEFAULT 0, "
+    "enqueued_at REAL NOT NULL, "
+    "available_at REAL NOT NULL, "
+    "claimed_at REAL, "
+    "last_error TEXT)",
+    # At most one pending job per patient: repeated saves collapse into one recompute
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_risk_jobs_pending "
+    "ON risk_jobs (patient_id) WHERE status = 'pending'",
+    "CREATE INDEX IF NOT EXISTS idx_risk_jobs_status ON risk_jobs (status, available_at)",
+    # Last sign of life of each worker process; the PHP pages score inline
+    # when no worker has beaten recently
+    "CREATE TABLE IF NOT EXISTS worker_heartbeats ("
+    "worker TEXT PRIMARY KEY, "
+    "beat_at REAL NOT NULL)"
+)
+
+
+class RiskJobQueue:
+    """
+    SQLite-backed job queue shared by several worker threads and processes
+
+    Claiming, completing and failing jobs each run in one BEGIN IMMEDIATE
+    transaction, so no job is handed to two workers at once.
+    """
+
+    def __init__(self, path=RISK_QUEUE_DB_PATH, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        with self._connect() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self):
+        """Per-thread connection wrapped in a write transaction"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return Transaction(conn)
+
+    def enqueue(self, patient_ids):
+        """
+        Queue a recompute for each patient (no-op if one is already pending)
+
+        Returns:
+            Number of new jobs
+        """
+        now = time.time()
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO risk_jobs (patient_id, status, attempts, enqueued_at, available_at) "
+                "VALUES (?, 'pending', 0, ?, ?)",
+                [(int(patient_id), now, now) for patient_id in patient_ids]
+            )
+            return conn.total_changes - before
+
+    def _release(self, conn, job_ids, available_at, error):
+        """
+        Return running jobs to pending, dropping any whose patient already
+        has a newer pending job
+        """
+        marks = ",".join("?" * len(job_ids))
+        conn.execute(
+            f"UPDATE OR IGNORE risk_jobs SET status = 'pending', available_at = ?, last_error = ? "
+            f"WHERE job_id IN ({marks}) AND status = 'running'",
+            [available_at, error, *job_ids]
+        )
+        conn.execute(f"DELETE FROM risk_jobs WHERE job_id IN ({marks}) AND status = 'running'", job_ids)
+
+    def claim(self, batch_size):
+        """
+        Take up to batch_size due jobs, oldest first
+
+        Returns:
+            List of (job_id, patient_id, attempts) tuples
+        """
+        now = time.time()
+        with self._connect() as conn:
+            stale = [row[0] for row in conn.execute(
+                "SELECT job_id FROM risk_jobs WHERE status = 'running' AND claimed_at < ?",
+                (now - LEASE_SECONDS,)
+            )]
+            if stale:
+                self._release(conn, stale, now, "lease expired")
+
+            jobs = conn.execute(
+                "SELECT job_id, patient_id, attempts FROM risk_jobs "
+                "WHERE status = 'pending' AND available_at <= ? ORDER BY job_id LIMIT ?",
+                (now, int(batch_size))
+            ).fetchall()
+            if jobs:
+                marks = ",".join("?" * len(jobs))
+                conn.execute(
+                    f"UPDATE risk_jobs SET status = 'running', claimed_at = ?, attempts = attempts + 1 "
+                    f"WHERE job_id IN ({marks})",
+                    [now, *(job[0] for job in jobs)]
+                )
+        return [(job_id, patient_id, attempts + 1) for job_id, patient_id, attempts in jobs]
+
+    def complete(self, job_ids):
+        """Remove finished jobs"""
+        if not job_ids:
+            return
+        marks = ",".join("?" * len(job_ids))
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM risk_jobs WHERE job_id IN ({marks})", list(job_ids))
+
+    def fail(self, jobs, error):
+        """
+        Schedule failed jobs for a retry with exponential backoff, or park them
+        as 'failed' once they have used max_attempts
+
+        Args:
+            jobs: (job_id, patient_id, attempts) tuples from claim()
+            error: Error message to record
+        """
+        now = time.time()
+        error = str(error)[:1000]
+        with self._connect() as conn:
+            for job_id, _, attempts in jobs:
+                if attempts >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE risk_jobs SET status = 'failed', last_error = ? WHERE job_id = ?",
+                        (error, job_id)
+                    )
+                else:
+                    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+                    self._release(conn, [job_id], now + delay, error)
+
+    def retry_failed(self):
+        """Move parked jobs back to pending; returns how many were requeued"""
+        with self._connect() as conn:
+            failed = [row[0] for row in conn.execute("SELECT job_id FROM risk_jobs WHERE status = 'failed'")]
+            if not failed:
+                return 0
+            marks = ",".join("?" * len(failed))
+            conn.execute(f"UPDATE risk_jobs SET status = 'running' WHERE job_id IN ({marks})", failed)
+            conn.execute(f"UPDATE risk_jobs SET attempts = 0 WHERE job_id IN ({marks})", failed)
+            self._release(conn, failed, time.time(), None)
+        return len(failed)
+
+    def heartbeat(self, worker):
+        """Record that a worker process is alive and draining the queue"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO worker_heartbeats (worker, beat_at) VALUES (?, ?)",
+                (str(worker), time.time())
+            )
+
+    def backlog(self):
+        """Job counts by status, the age of the oldest pending job and of the latest worker heartbeat"""
+        now = time.time()
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM risk_jobs GROUP BY status").fetchall())
+            oldest = conn.execute(
+                "SELECT MIN(enqueued_at) FROM risk_jobs WHERE status = 'pending'"
+            ).fetchone()[0]
+            beat_at = conn.execute("SELECT MAX(beat_at) FROM worker_heartbeats").fetchone()[0]
+        return {
+            'pending': counts.get('pending', 0),
+            'running': counts.get('running', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_pending_seconds': now - oldest if oldest else 0.0,
+            'heartbeat_age_seconds': now - beat_at if beat_at else None
+        }
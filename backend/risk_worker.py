@@ -0,0 +1,334 @@
+"""
+Background Risk Recompute Worker for OvCare
+Drains the risk recompute queue in batches: loads the queued patients'
+biomarker history from MySQL, computes temporal features and model scores in
+bulk and bulk-inserts the results into risk_history, so page loads only read
+precomputed scores
+
+Usage:
+    python risk_worker.py [--concurrency 2] [--batch-size 200] [--once]
+    python risk_worker.py --stats
+    python risk_worker.py --retry-failed
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+from feature_schema import TEMPORAL_FEATURE_COLUMNS
+from metrics import inc, set_current_endpoint, time_stage, flush as flush_metrics
+from model_manager import load_model_bundle
+from risk_queue import RiskJobQueue, DEFAULT_MAX_ATTEMPTS, HEARTBEAT_INTERVAL_SECONDS
+from temporal_analysis import extract_temporal_features_columnar, get_risk_tiers, temporal_risk_multipliers
+
+# Try to import PyMySQL; the worker cannot run without it
+try:
+    import pymysql
+except ImportError:
+    pymysql = None
+
+# Same database the PHP pages use (see db.php)
+DB_CONFIG = {
+    'host': os.environ.get("OVCARE_DB_HOST", "localhost"),
+    'user': os.environ.get("OVCARE_DB_USER", "root"),
+    'password': os.environ.get("OVCARE_DB_PASSWORD", ""),
+    'database': os.environ.get("OVCARE_DB_NAME", "ovarian_cancer_db"),
+    'charset': 'utf8mb4'
+}
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_CONCURRENCY = 2
+POLL_INTERVAL_SECONDS = 1.0
+BACKLOG_LOG_INTERVAL_SECONDS = 60.0
+
+
+class MySQLRiskStore:
+    """Reads patient history from and writes scores to the application database"""
+
+    def __init__(self, config=None):
+        if pymysql is None:
+            raise RuntimeError("PyMySQL is required for the risk worker (pip install PyMySQL)")
+        self.config = dict(DB_CONFIG, **(config or {}))
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None or not self._conn.open:
+            self._conn = pymysql.connect(autocommit=False, **self.config)
+        else:
+            self._conn.ping(reconnect=True)
+        return self._conn
+
+    def load_patients(self, patient_ids):
+        """
+        Ages, full biomarker history and latest scored reading of each patient
+
+        Returns:
+            Tuple of (ages dict, history dict of column arrays, last scored dict)
+        """
+        marks = ",".join(["%s"] * len(patient_ids))
+        conn = self._connection()
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT id, age FROM patients WHERE id IN ({marks})", patient_ids)
+            ages = {patient_id: age for patient_id, age in cursor.fetchall()}
+
+            cursor.execute(
+                f"SELECT patient_id, CA125, HE4, heart_rate, recorded_at FROM biomarker_data "
+                f"WHERE patient_id IN ({marks}) ORDER BY patient_id, recorded_at, id",
+                patient_ids
+            )
+            rows = cursor.fetchall()
+
+            cursor.execute(
+                f"SELECT patient_id, MAX(calculated_at) FROM risk_history "
+                f"WHERE patient_id IN ({marks}) GROUP BY patient_id",
+                patient_ids
+            )
+            last_scored = dict(cursor.fetchall())
+        conn.commit()
+
+        history = {
+            'patient_id': np.array([row[0] for row in rows], dtype=np.int64),
+            'ca125': np.array([row[1] for row in rows], dtype=float),
+            'he4': np.array([row[2] for row in rows], dtype=float),
+            'heart_rate': np.array([row[3] if row[3] is not None else np.nan for row in rows], dtype=float),
+            'recorded_at': np.array([row[4] for row in rows], dtype='datetime64[us]')
+        }
+        return ages, history, last_scored
+
+    def insert_risk_history(self, rows):
+        """Insert all score rows in one multi-row statement and commit"""
+        if not rows:
+            return
+        conn = self._connection()
+        with conn.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO risk_history (patient_id, risk_score, risk_tier, probability, ca125, he4, "
+                "ca125_velocity, he4_velocity, calculated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                rows
+            )
+        conn.commit()
+
+
+def score_patients(bundle, ages, history, last_scored=None):
+    """
+    Score every patient at their latest reading in one model pass
+
+    Args:
+        bundle: ModelBundle to score with
+        ages: Dictionary of patient id to age
+        history: Column arrays from MySQLRiskStore.load_patients
+        last_scored: Optional dictionary of patient id to the latest
+                     calculated_at already in risk_history; patients whose
+                     latest reading is already scored are skipped
+
+    Returns:
+        List of risk_history row tuples
+    """
+    if len(history['patient_id']) == 0:
+        return []
+
+    with time_stage('temporal_features'):
+        features = extract_temporal_features_columnar(
+            history['patient_id'], history['recorded_at'], history['ca125'], history['he4']
+        )
+
+    # Latest reading of each patient (rows arrive ordered by patient, then time)
+    patient_ids = features['patient_id']
+    latest = np.searchsorted(history['patient_id'], patient_ids, side='right') - 1
+    recorded_at = history['recorded_at'][latest].astype('datetime64[s]').astype(object)
+
+    keep = np.ones(len(patient_ids), dtype=bool)
+    if last_scored:
+        for i, patient_id in enumerate(patient_ids.tolist()):
+            scored_at = last_scored.get(patient_id)
+            keep[i] = scored_at is None or scored_at < recorded_at[i]
+    if not keep.any():
+        return []
+    patient_ids, latest, recorded_at = patient_ids[keep], latest[keep], recorded_at[keep]
+    features = {key: np.asarray(values)[keep] for key, values in features.items() if key != 'patient_id'}
+
+    # Same field mapping as the dashboards' /predict payloads, laid out by the
+    # model's own schema with the API defaults and fallbacks
+    schema = bundle.schema
+    heart_rate = history['heart_rate'][latest]
+    columns = {
+        'Age': [ages.get(patient_id, 50) for patient_id in patient_ids.tolist()],
+        'CA125_Level': history['ca125'][latest],
+        'HE4_Level': history['he4'][latest],
+        'WBC': np.where(np.isnan(heart_rate), 7000.0, heart_rate * 100.0)
+    }
+    X = np.repeat(schema.defaults, len(patient_ids), axis=0)
+    for name, values in columns.items():
+        j = schema.fields.get(name)
+        if j is not None:
+            X[:, j] = values
+    for key, column in TEMPORAL_FEATURE_COLUMNS.items():
+        j = schema.temporal_fields.get(column)
+        if j is not None:
+            X[:, j] = features[key]
+    schema.apply_fallbacks(X)
+
+    model = bundle.model
+    with time_stage('ensemble'):
+        if hasattr(model, "predict_proba"):
+            base_probs = model.predict_proba(X)[:, 1]
+        else:
+            base_probs = np.where(model.predict(X) == 1, 0.75, 0.25)
+
+    with time_stage('adjust_risk'):
+        probabilities = np.minimum(base_probs * temporal_risk_multipliers(features), 1.0)
+        tiers = get_risk_tiers(probabilities)
+
+    return [
+        (int(patient_id), float(probability), str(tier), float(probability), float(ca125), float(he4),
+         float(ca125_velocity), float(he4_velocity), scored_at)
+        for patient_id, probability, tier, ca125, he4, ca125_velocity, he4_velocity, scored_at in zip(
+            patient_ids.tolist(), probabilities, tiers, history['ca125'][latest], history['he4'][latest],
+            features['ca125_velocity'], features['he4_velocity'], recorded_at
+        )
+    ]
+
+
+class RiskWorker:
+    """
+    Worker threads that claim batches from the queue and score them
+
+    Each thread has its own database connection. Several worker processes
+    may share one queue file. While the threads are polling, the process
+    writes a heartbeat to the queue so the PHP pages know it is alive.
+    """
+
+    def __init__(self, queue, bundle, store_factory=MySQLRiskStore, batch_size=DEFAULT_BATCH_SIZE,
+                 concurrency=DEFAULT_CONCURRENCY, poll_interval=POLL_INTERVAL_SECONDS):
+        self.queue = queue
+        self.bundle = bundle
+        self.store_factory = store_factory
+        self.batch_size = batch_size
+        self.concurrency = max(1, int(concurrency))
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads = []
+        self._beat_lock = threading.Lock()
+        self._last_beat = None
+
+    def beat(self):
+        """Write a heartbeat unless this process wrote one in the last interval"""
+        with self._beat_lock:
+            now = time.monotonic()
+            if self._last_beat is not None and now - self._last_beat < HEARTBEAT_INTERVAL_SECONDS:
+                return
+            self._last_beat = now
+        self.queue.heartbeat(self.name)
+
+    def process_batch(self, store):
+        """
+        Claim, score and write one batch
+
+        Returns:
+            Number of jobs claimed (0 when the queue has nothing due)
+        """
+        jobs = self.queue.claim(self.batch_size)
+        if not jobs:
+            return 0
+
+        patient_ids = sorted({patient_id for _, patient_id, _ in jobs})
+        try:
+            with time_stage('load'):
+                ages, history, last_scored = store.load_patients(patient_ids)
+            rows = score_patients(self.bundle, ages, history, last_scored)
+            with time_stage('insert'):
+                store.insert_risk_history(rows)
+        except Exception as e:
+            self.queue.fail(jobs, e)
+            inc('ovcare_risk_jobs_total', len(jobs), outcome='failed')
+            print(f"Risk batch of {len(jobs)} jobs failed: {e}", file=sys.stderr)
+            return len(jobs)
+
+        self.queue.complete([job_id for job_id, _, _ in jobs])
+        inc('ovcare_risk_jobs_total', len(jobs), outcome='completed')
+        return len(jobs)
+
+    def _run(self):
+        set_current_endpoint('risk_worker')
+        store = self.store_factory()
+        while not self._stop.is_set():
+            self.beat()
+            if self.process_batch(store) == 0:
+                self._stop.wait(self.poll_interval)
+            flush_metrics()
+
+    def run_until_empty(self):
+        """Drain everything that is currently due, in this thread"""
+        set_current_endpoint('risk_worker')
+        store = self.store_factory()
+        total = 0
+        while True:
+            self.beat()
+            claimed = self.process_batch(store)
+            if claimed == 0:
+                break
+            total += claimed
+        flush_metrics(force=True)
+        return total
+
+    def start(self):
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._run, name=f"risk-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OvCare background risk recompute worker")
+    parser.add_argument("--concurrency", type=int,
+                        default=int(os.environ.get("OVCARE_RISK_WORKER_CONCURRENCY", DEFAULT_CONCURRENCY)),
+                        help="worker threads")
+    parser.add_argument("--batch-size", type=int,
+                        default=int(os.environ.get("OVCARE_RISK_WORKER_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+                        help="patients claimed per batch")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help="attempts before a job is parked as failed")
+    parser.add_argument("--once", action="store_true", help="drain the due jobs and exit (for cron)")
+    parser.add_argument("--stats", action="store_true", help="print the queue backlog and exit")
+    parser.add_argument("--retry-failed", action="store_true", help="requeue parked jobs and exit")
+    args = parser.parse_args(argv)
+
+    queue = RiskJobQueue(max_attempts=args.max_attempts)
+    if args.stats:
+        print(json.dumps(queue.backlog(), indent=2))
+        return
+    if args.retry_failed:
+        print(f"Requeued {queue.retry_failed()} failed jobs")
+        return
+
+    bundle = load_model_bundle()
+    print(f"Risk worker using model {bundle.version_token} ({bundle.engine}), queue {queue.path}")
+    worker = RiskWorker(queue, bundle, batch_size=args.batch_size, concurrency=args.concurrency)
+
+    if args.once:
+        print(f"Processed {worker.run_until_empty()} jobs")
+        return
+
+    worker.start()
+    try:
+        while True:
+            time.sleep(BACKLOG_LOG_INTERVAL_SECONDS)
+            print(f"Risk queue backlog: {queue.backlog()}")
+    except KeyboardInterrupt:
+        worker.stop(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
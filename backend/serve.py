@@ -0,0 +1,287 @@
+"""
+Production Server for OvCare
+Runs the ML API under gunicorn. The model is loaded and warmed up once in the
+master, which then freezes its objects out of the garbage collector and forks
+the workers, so every worker shares the model pages copy-on-write
+
+Usage:
+    python serve.py [--bind 127.0.0.1:5000] [--workers N] [--threads N]
+                    [--timeout 30] [--graceful-timeout 30]
+    python serve.py --print-config
+"""
+
+import argparse
+import gc
+import glob
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+# Try to import gunicorn; serve.py cannot run without it
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = object
+
+DEFAULT_THREADS = 4
+DEFAULT_TIMEOUT = 30
+DEFAULT_GRACEFUL_TIMEOUT = 30
+DEFAULT_KEEPALIVE = 5
+
+# Seconds between per-worker memory reports in the master log (0 disables)
+MEMORY_REPORT_INTERVAL = float(os.environ.get("OVCARE_MEMORY_REPORT_INTERVAL", 300))
+
+
+def available_cpus():
+    """
+    CPUs this process may actually use: the scheduler affinity mask, further
+    limited by a cgroup CPU quota (containers)
+
+    Returns:
+        Integer number of CPUs, at least 1
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def default_workers(cpus):
+    """
+    One worker per CPU: scoring is CPU-bound and holds the GIL, so extra
+    processes beyond the cores only add memory
+    """
+    return max(1, cpus)
+
+
+def memory_usage(pid):
+    """
+    Resident, proportional, shared and private memory of a process
+
+    Shared pages (the preloaded model, frozen objects, mapped artifact) are
+    counted once per worker in rss; pss splits them across the sharers.
+
+    Returns:
+        Dictionary of byte counts, or None if the process is gone
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+        return {
+            "rss": fields.get("Rss", 0),
+            "pss": fields.get("Pss", 0),
+            "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+            "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+        }
+    except FileNotFoundError:
+        if not os.path.exists(f"/proc/{pid}"):
+            return None
+    except OSError:
+        return None
+
+    # Kernels without smaps_rollup: statm has resident and shared pages
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            _, resident, shared = (int(value) for value in f.read().split()[:3])
+    except (OSError, ValueError):
+        return None
+    page = os.sysconf("SC_PAGE_SIZE")
+    return {"rss": resident * page, "pss": None, "shared": shared * page, "private": (resident - shared) * page}
+
+
+def _megabytes(value):
+    return "-" if value is None else f"{value / (1024 * 1024):.1f}"
+
+
+def report_worker_memory(server):
+    """Log and publish the memory of the master and every live worker"""
+    from metrics import clear_gauge, set_gauge, flush
+
+    processes = [("master", os.getpid())] + [("worker", pid) for pid in sorted(server.WORKERS)]
+    clear_gauge('ovcare_worker_memory_bytes')
+    lines = []
+    for role, pid in processes:
+        usage = memory_usage(pid)
+        if usage is None:
+            continue
+        for kind, value in usage.items():
+            if value is not None:
+                set_gauge('ovcare_worker_memory_bytes', value, pid=str(pid), role=role, kind=kind)
+        lines.append(
+            f"{role} {pid}: rss={_megabytes(usage['rss'])}MB shared={_megabytes(usage['shared'])}MB "
+            f"private={_megabytes(usage['private'])}MB pss={_megabytes(usage['pss'])}MB"
+        )
+    flush(force=True)
+    server.log.info("Memory per process:\n  " + "\n  ".join(lines))
+
+
+def clear_metrics_dir():
+    """Remove metrics snapshots left by a previous run's worker pids"""
+    metrics_dir = os.environ.get("OVCARE_METRICS_DIR")
+    if not metrics_dir:
+        return
+    for path in glob.glob(os.path.join(metrics_dir, "metrics-*.json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# gunicorn server hooks
+
+def on_starting(server):
+    clear_metrics_dir()
+
+
+def pre_fork(server, worker):
+    # Move everything the master has allocated (model, attribution tables,
+    # caches) to the permanent generation: collections in the worker then
+    # never touch those objects, so their pages stay shared
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def post_worker_init(worker):
+    usage = memory_usage(os.getpid())
+    if usage is not None:
+        worker.log.info(
+            f"Worker {os.getpid()} ready: rss={_megabytes(usage['rss'])}MB "
+            f"shared={_megabytes(usage['shared'])}MB private={_megabytes(usage['private'])}MB"
+        )
+
+
+def when_ready(server):
+    if MEMORY_REPORT_INTERVAL <= 0:
+        return
+
+    def report():
+        # First report once the workers have booted, then periodically
+        time.sleep(min(MEMORY_REPORT_INTERVAL, 10))
+        while True:
+            try:
+                report_worker_memory(server)
+            except Exception as e:
+                server.log.warning(f"Memory report failed: {e}")
+            time.sleep(MEMORY_REPORT_INTERVAL)
+
+    threading.Thread(target=report, name="memory-report", daemon=True).start()
+
+
+class OvCareApplication(BaseApplication):
+    """gunicorn application that preloads app.py in the master"""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # No collections while the model and its tables are built; the
+        # survivors are frozen before each fork (pre_fork)
+        gc.disable()
+        # Warm up before forking so workers inherit a ready model instead of
+        # each warming up its own copy
+        os.environ.setdefault("OVCARE_BLOCKING_WARMUP", "1")
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import app
+        return app.app
+
+
+def build_options(args):
+    """
+    gunicorn settings for the parsed command line
+
+    Returns:
+        Dictionary of gunicorn setting names to values
+    """
+    workers = args.workers or default_workers(available_cpus())
+    return {
+        "bind": args.bind,
+        "workers": workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "preload_app": True,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "keepalive": args.keepalive,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests // 10,
+        "accesslog": args.access_log,
+        "on_starting": on_starting,
+        "pre_fork": pre_fork,
+        "post_fork": post_fork,
+        "post_worker_init": post_worker_init,
+        "when_ready": when_ready
+    }
+
+
+def main(argv=None):
+    default_bind = f"127.0.0.1:{os.environ.get('PORT', 5000)}"
+    parser = argparse.ArgumentParser(description="Serve the OvCare ML API in production")
+    parser.add_argument("--bind", default=os.environ.get("OVCARE_BIND", default_bind))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("OVCARE_WORKERS", 0)),
+                        help="worker processes (default: one per available CPU)")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("OVCARE_THREADS", DEFAULT_THREADS)),
+                        help="request threads per worker")
+    parser.add_argument("--timeout", type=int, default=int(os.environ.get("OVCARE_TIMEOUT", DEFAULT_TIMEOUT)),
+                        help="seconds a request may run before its worker is restarted")
+    parser.add_argument("--graceful-timeout", type=int,
+                        default=int(os.environ.get("OVCARE_GRACEFUL_TIMEOUT", DEFAULT_GRACEFUL_TIMEOUT)),
+                        help="seconds workers get to finish in-flight requests on restart or shutdown")
+    parser.add_argument("--keepalive", type=int, default=int(os.environ.get("OVCARE_KEEPALIVE", DEFAULT_KEEPALIVE)))
+    parser.add_argument("--max-requests", type=int, default=int(os.environ.get("OVCARE_MAX_REQUESTS", 0)),
+                        help="recycle a worker after this many requests (0: never)")
+    parser.add_argument("--access-log", default=os.environ.get("OVCARE_ACCESS_LOG"),
+                        help="access log file, or - for stdout")
+    parser.add_argument("--print-config", action="store_true", help="print the derived settings and exit")
+    args = parser.parse_args(argv)
+
+    options = build_options(args)
+    if args.print_config:
+        print(json.dumps(dict({key: value for key, value in options.items() if not callable(value)},
+                              available_cpus=available_cpus()), indent=2))
+        return
+    if BaseApplication is object:
+        raise SystemExit("serve.py requires gunicorn (pip install gunicorn)")
+
+    OvCareApplication(options).run()
+
+
+if __name__ == "__main__":
+    main()
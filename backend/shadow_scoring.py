@@ -0,0 +1,203 @@
+"""
+Shadow Model Scoring for OvCare
+Scores a copy of live feature vectors with a candidate model on a bounded
+background pool and aggregates how it disagrees with the primary model,
+without adding latency to the responses
+"""
+
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from metrics import Histogram, inc
+from model_manager import load_bundle_from_path, warm_up
+from temporal_analysis import RISK_TIER_THRESHOLDS
+
+# Upper bounds of the absolute probability difference and latency buckets
+ABS_DIFF_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5)
+LATENCY_MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250)
+
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_WORKERS = 1
+
+
+def load_shadow_bundle(path, metadata_path=None):
+    """
+    Load a candidate model for shadow scoring
+
+    Args:
+        path: A model.pkl file or a model_artifact/ directory
+        metadata_path: Its model_metadata.json; defaults to the one next to it
+
+    Returns:
+        ModelBundle
+    """
+    return load_bundle_from_path(path, metadata_path)
+
+
+class ShadowScorer:
+    """
+    Bounded queue plus worker threads scoring requests with a shadow model
+
+    submit() never blocks: when the queue is full the work is dropped and
+    counted. The shadow model is loaded and warmed up on a background thread;
+    requests submitted before it is ready are skipped.
+    """
+
+    def __init__(self, loader, warmup_rows, max_queue_size=DEFAULT_QUEUE_SIZE, workers=DEFAULT_WORKERS):
+        self.max_queue_size = max(1, int(max_queue_size))
+        self.workers = max(1, int(workers))
+        self.bundle = None
+        self.load_error = None
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._abs_diff = Histogram(ABS_DIFF_BUCKETS)
+        self._primary_ms = Histogram(LATENCY_MS_BUCKETS)
+        self._shadow_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.submitted = 0
+        self.dropped = 0
+        self.not_ready = 0
+        self.errors = 0
+        self.rows = 0
+        self.label_disagreements = 0
+        self.tier_disagreements = 0
+        self.max_abs_diff = 0.0
+        self.total_diff = 0.0
+        self.primary_row_ms = 0.0
+        self.primary_timed_rows = 0
+        self.shadow_row_ms = 0.0
+        self.primary_version = None
+        self._loader = loader
+        self._warmup_rows = warmup_rows
+        threading.Thread(target=self._load, name="shadow-load", daemon=True).start()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _load(self):
+        try:
+            bundle = self._loader()
+            warm_up(bundle, self._warmup_rows(bundle))
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"Shadow model unavailable: {e}")
+            return
+        self.bundle = bundle
+        print(f"Shadow model {bundle.version_token} ({bundle.engine}) loaded from {bundle.source}")
+        self._start_workers()
+
+    def _start_workers(self):
+        for i in range(self.workers):
+            threading.Thread(target=self._run, name=f"shadow-scorer-{i}", daemon=True).start()
+
+    def _after_fork(self):
+        """Workers forked from a preloaded master inherit no threads; restart them"""
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        if self.bundle is not None:
+            self._start_workers()
+        elif self.load_error is None:
+            threading.Thread(target=self._load, name="shadow-load", daemon=True).start()
+
+    def submit(self, X, primary_proba, primary_version, primary_ms=None):
+        """
+        Queue a copy of scored rows for the shadow model
+
+        Args:
+            X: Feature matrix the primary model scored
+            primary_proba: Primary class-1 probabilities for the rows
+            primary_version: version_token of the primary bundle
+            primary_ms: Primary model time for the rows, if it was computed
+                        (None for prediction cache hits)
+
+        Returns:
+            True if queued, False if dropped or the shadow is not loaded
+        """
+        if self.bundle is None:
+            with self._lock:
+                self.not_ready += 1
+            return False
+        item = (np.array(X, dtype=np.float64), np.array(primary_proba, dtype=np.float64).reshape(-1),
+                primary_version, primary_ms)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            inc('ovcare_shadow_requests_total', outcome='dropped')
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _run(self):
+        model = self.bundle.model
+        while True:
+            X, primary, primary_version, primary_ms = self._queue.get()
+            start = time.perf_counter()
+            try:
+                shadow = model.predict_proba(X)[:, 1]
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                inc('ovcare_shadow_requests_total', outcome='failed')
+                continue
+            shadow_ms = (time.perf_counter() - start) * 1000
+            self._record(primary, shadow, primary_version, primary_ms, shadow_ms)
+            inc('ovcare_shadow_requests_total', outcome='scored')
+
+    def _record(self, primary, shadow, primary_version, primary_ms, shadow_ms):
+        diff = shadow - primary
+        abs_diff = np.abs(diff)
+        label_disagreements = int(np.count_nonzero((primary >= 0.5) != (shadow >= 0.5)))
+        tier_disagreements = int(np.count_nonzero(
+            np.searchsorted(RISK_TIER_THRESHOLDS, primary, side='right') !=
+            np.searchsorted(RISK_TIER_THRESHOLDS, shadow, side='right')
+        ))
+        with self._lock:
+            self.rows += len(primary)
+            self.label_disagreements += label_disagreements
+            self.tier_disagreements += tier_disagreements
+            self.total_diff += float(diff.sum())
+            self.max_abs_diff = max(self.max_abs_diff, float(abs_diff.max()))
+            for value in abs_diff.tolist():
+                self._abs_diff.observe(value)
+            self._shadow_ms.observe(shadow_ms)
+            self.shadow_row_ms += shadow_ms
+            if primary_ms is not None:
+                self._primary_ms.observe(primary_ms)
+                self.primary_row_ms += primary_ms
+                self.primary_timed_rows += len(primary)
+            self.primary_version = primary_version
+
+    def stats(self):
+        """Disagreement, latency and queue counters"""
+        with self._lock:
+            rows = self.rows
+            return {
+                'loaded': self.bundle is not None,
+                'load_error': self.load_error,
+                'shadow_version': self.bundle.version_token if self.bundle is not None else None,
+                'shadow_engine': self.bundle.engine if self.bundle is not None else None,
+                'primary_version': self.primary_version,
+                'workers': self.workers,
+                'max_queue_size': self.max_queue_size,
+                'queue_depth': self._queue.qsize(),
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'not_ready': self.not_ready,
+                'errors': self.errors,
+                'rows_compared': rows,
+                'label_disagreement_rate': self.label_disagreements / rows if rows else 0.0,
+                'tier_disagreement_rate': self.tier_disagreements / rows if rows else 0.0,
+                'mean_probability_shift': self.total_diff / rows if rows else 0.0,
+                'max_abs_diff': self.max_abs_diff,
+                'abs_diff_histogram': self._abs_diff.to_dict(),
+                'primary_ms_per_row': (self.primary_row_ms / self.primary_timed_rows
+                                       if self.primary_timed_rows else 0.0),
+                'shadow_ms_per_row': self.shadow_row_ms / rows if rows else 0.0,
+                'primary_latency_ms_histogram': self._primary_ms.to_dict(),
+                'shadow_latency_ms_histogram': self._shadow_ms.to_dict()
+            }
@@ -0,0 +1,37 @@
+"""
+SQLite Helpers for OvCare
+Connection setup and write transactions shared by the SQLite-backed stores
+(temporal state, risk job queue)
+"""
+
+import sqlite3
+
+
+def connect(path):
+    """
+    Autocommit connection in WAL mode, so readers never block the writer
+
+    Args:
+        path: Database file
+
+    Returns:
+        sqlite3.Connection; wrap writes in Transaction
+    """
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class Transaction:
+    """Context manager running a block inside BEGIN IMMEDIATE / COMMIT"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
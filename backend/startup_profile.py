@@ -0,0 +1,97 @@
+"""
+Startup Profiling for OvCare
+Boots the API in a fresh interpreter and reports where cold-start time goes:
+the slowest imports (from python -X importtime) and the per-phase breakdown
+the app records up to readiness
+
+Usage:
+    python startup_profile.py [--top 15] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# Imports app, waits for warm-up and prints the boot breakdown as JSON
+BOOT_SCRIPT = """
+import json, time
+import app
+deadline = time.time() + 120
+while not app.model_manager.ready and time.time() < deadline:
+    time.sleep(0.01)
+print("STARTUP " + json.dumps(app.startup_timings))
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Imports made directly by app.py or lazily during warm-up, from
+    -X importtime output
+
+    Returns:
+        List of (module, cumulative ms) sorted slowest first
+    """
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # Depth 1: imported by app.py itself or by code running after it
+        if match and len(match.group(3)) == 3:
+            rows.append((match.group(4), int(match.group(2)) / 1000))
+    return sorted(rows, key=lambda row: -row[1])
+
+
+def profile_startup(top=15):
+    """
+    Boot app.py once in a child interpreter
+
+    Args:
+        top: Number of slowest imports to report
+
+    Returns:
+        Dictionary with the startup phases and the slowest imports
+    """
+    env = dict(os.environ, OVCARE_BLOCKING_WARMUP="0")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    phases = None
+    for line in result.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            phases = json.loads(line[len("STARTUP "):])
+    if result.returncode != 0 or phases is None:
+        raise RuntimeError(f"App failed to start:\n{result.stderr[-2000:]}")
+    return {
+        "phases_ms": phases,
+        "slowest_imports_ms": parse_importtime(result.stderr)[:top]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile OvCare API cold start")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = profile_startup(args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("Startup phases (ms)")
+    for phase, ms in report["phases_ms"].items():
+        print(f"  {phase[:-3]:<20} {ms:>9.1f}")
+    print("Slowest imports until ready (cumulative ms)")
+    for module, ms in report["slowest_imports_ms"]:
+        print(f"  {module:<20} {ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
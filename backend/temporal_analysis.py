@@ -4,8 +4,9 @@ Provides functions for calculating temporal features and trends
 """
 
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+from metrics import time_stage
 
 
 def calculate_velocity(current_value, previous_value, time_diff_days):
@@ -78,117 +79,301 @@ def calculate_std_dev(values, window=30):
     return np.std(values_to_use)
 
 
-def extract_temporal_features(biomarker_history):
+# Temporal feature keys produced for every patient (snake case, serving names)
+TEMPORAL_FEATURE_KEYS = [
+    'ca125_velocity', 'he4_velocity', 'ca125_acceleration', 'he4_acceleration',
+    'ca125_ma_7d', 'he4_ma_7d', 'ca125_ma_30d', 'he4_ma_30d',
+    'ca125_std_30d', 'he4_std_30d', 'ca125_he4_ratio', 'trend_direction'
+]
+
+MICROSECONDS_PER_DAY = 86400 * 1000000
+
+
+def _to_epoch_microseconds(timestamps):
     """
-    Extract temporal features from biomarker history
+    Convert timestamps to int64 epoch microseconds
     
     Args:
-        biomarker_history: List of dicts with keys: ca125, he4, recorded_at
+        timestamps: Array-like of numpy datetime64 values or epoch seconds
         
     Returns:
-        Dictionary of temporal features
+        NumPy int64 array of microseconds since the epoch
     """
-    features = {
-        'ca125_velocity': 0.0,
-        'he4_velocity': 0.0,
-        'ca125_acceleration': 0.0,
-        'he4_acceleration': 0.0,
-        'ca125_ma_7d': 0.0,
-        'he4_ma_7d': 0.0,
-        'ca125_ma_30d': 0.0,
-        'he4_ma_30d': 0.0,
-        'ca125_std_30d': 0.0,
-        'he4_std_30d': 0.0,
-        'ca125_he4_ratio': 0.0,
-        'trend_direction': 0  # -1: decreasing, 0: stable, 1: increasing
-    }
+    timestamps = np.asarray(timestamps)
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        return timestamps.astype('datetime64[us]').astype(np.int64)
+    return np.round(timestamps.astype(float) * 1e6).astype(np.int64)
+
+
+def _window_stats(values, positions, starts, window):
+    """
+    Mean and population standard deviation of the last `window` values
+    ending at each position, never reaching back past the patient's start
     
-    if not biomarker_history or len(biomarker_history) == 0:
-        return features
+    Args:
+        values: Sorted values for all patients
+        positions: Index of the reading each feature row is computed at
+        starts: Index of the first reading of that row's patient
+        window: Window size in readings
+        
+    Returns:
+        Tuple of (mean, std) arrays
+    """
+    idx = positions[:, None] - (window - 1) + np.arange(window)
+    valid = idx >= starts[:, None]
+    windowed = np.where(valid, values[np.maximum(idx, 0)], 0.0)
+    size = valid.sum(axis=1)
+    mean = windowed.sum(axis=1) / size
+    deviation = np.where(valid, windowed - mean[:, None], 0.0)
+    std = np.sqrt((deviation ** 2).sum(axis=1) / size)
+    return mean, std
+
+
+def _velocity(values, current, previous, days):
+    """Vectorized calculate_velocity between two reading indices"""
+    return (values[current] - values[previous]) / days
+
+
+def _temporal_features_at(positions, starts, times, ca125, he4):
+    """
+    Compute every temporal feature at the given sorted reading positions
     
-    # Sort by date
-    history = sorted(biomarker_history, key=lambda x: x['recorded_at'])
+    Args:
+        positions: Index of the reading each feature row is computed at
+        starts: Index of the first reading of that row's patient
+        times: Sorted epoch microseconds
+        ca125: Sorted CA125 values
+        he4: Sorted HE4 values
+        
+    Returns:
+        Dictionary of feature name -> NumPy array
+    """
+    features = {}
+    n_seen = positions - starts + 1
+    previous = np.maximum(positions - 1, 0)
+    previous2 = np.maximum(positions - 2, 0)
     
-    # Extract values
-    ca125_values = [h['ca125'] for h in history]
-    he4_values = [h['he4'] for h in history]
+    # Whole days between readings, minimum 1 day to avoid division by zero
+    days = (times[positions] - times[previous]) // MICROSECONDS_PER_DAY
+    days = np.where(days == 0, 1, days)
+    days_prev = (times[previous] - times[previous2]) // MICROSECONDS_PER_DAY
+    days_prev = np.where(days_prev == 0, 1, days_prev)
     
-    # Current and previous values
-    current_ca125 = ca125_values[-1]
-    current_he4 = he4_values[-1]
+    has_velocity = n_seen >= 2
+    has_acceleration = n_seen >= 3
     
-    # Calculate CA125/HE4 ratio
-    if current_he4 > 0:
-        features['ca125_he4_ratio'] = current_ca125 / current_he4
+    for name, values in (('ca125', ca125), ('he4', he4)):
+        velocity = np.where(has_velocity, _velocity(values, positions, previous, days), 0.0)
+        prev_velocity = _velocity(values, previous, previous2, days_prev)
+        features[f'{name}_velocity'] = velocity
+        features[f'{name}_acceleration'] = np.where(
+            has_acceleration, (velocity - prev_velocity) / days, 0.0
+        )
+        features[f'{name}_ma_7d'], _ = _window_stats(values, positions, starts, 7)
+        ma_30d, std_30d = _window_stats(values, positions, starts, 30)
+        features[f'{name}_ma_30d'] = ma_30d
+        features[f'{name}_std_30d'] = np.where(n_seen >= 2, std_30d, 0.0)
     
-    # Calculate moving averages
-    features['ca125_ma_7d'] = calculate_moving_average(ca125_values, 7)
-    features['he4_ma_7d'] = calculate_moving_average(he4_values, 7)
-    features['ca125_ma_30d'] = calculate_moving_average(ca125_values, 30)
-    features['he4_ma_30d'] = calculate_moving_average(he4_values, 30)
+    current_he4 = he4[positions]
+    features['ca125_he4_ratio'] = np.where(
+        current_he4 > 0, ca125[positions] / np.where(current_he4 > 0, current_he4, 1.0), 0.0
+    )
     
-    # Calculate standard deviations
-    features['ca125_std_30d'] = calculate_std_dev(ca125_values, 30)
-    features['he4_std_30d'] = calculate_std_dev(he4_values, 30)
+    # -1: decreasing, 0: stable, 1: increasing
+    ca125_velocity = features['ca125_velocity']
+    he4_velocity = features['he4_velocity']
+    features['trend_direction'] = np.where(
+        (ca125_velocity > 0.5) | (he4_velocity > 0.5), 1,
+        np.where((ca125_velocity < -0.5) | (he4_velocity < -0.5), -1, 0)
+    )
     
-    # Calculate velocity if we have at least 2 data points
-    if len(history) >= 2:
-        prev_record = history[-2]
-        current_record = history[-1]
-        
-        # Calculate time difference in days
-        time_diff = (datetime.fromisoformat(str(current_record['recorded_at'])) - 
-                    datetime.fromisoformat(str(prev_record['recorded_at']))).days
-        
-        if time_diff == 0:
-            time_diff = 1  # Minimum 1 day to avoid division by zero
-        
-        prev_ca125 = prev_record['ca125']
-        prev_he4 = prev_record['he4']
-        
-        features['ca125_velocity'] = calculate_velocity(current_ca125, prev_ca125, time_diff)
-        features['he4_velocity'] = calculate_velocity(current_he4, prev_he4, time_diff)
-    
-    # Calculate acceleration if we have at least 3 data points
-    if len(history) >= 3:
-        prev2_record = history[-3]
-        prev_record = history[-2]
-        current_record = history[-1]
-        
-        # Calculate time differences
-        time_diff_1 = (datetime.fromisoformat(str(prev_record['recorded_at'])) - 
-                      datetime.fromisoformat(str(prev2_record['recorded_at']))).days
-        time_diff_2 = (datetime.fromisoformat(str(current_record['recorded_at'])) - 
-                      datetime.fromisoformat(str(prev_record['recorded_at']))).days
-        
-        if time_diff_1 == 0:
-            time_diff_1 = 1
-        if time_diff_2 == 0:
-            time_diff_2 = 1
+    return features
+
+
+def extract_temporal_features_columnar(patient_ids, timestamps, ca125, he4, each_record=False):
+    """
+    Extract temporal features for many patients in one vectorized pass
+    
+    Readings are grouped by patient and ordered by time (ties keep input
+    order), then every feature is computed with array operations instead of
+    per-patient Python loops.
+    
+    Args:
+        patient_ids: Array-like of patient identifiers, one per reading
+        timestamps: Array-like of datetime64 values or epoch seconds
+        ca125: Array-like of CA125 values
+        he4: Array-like of HE4 values
+        each_record: If True, compute features as of every reading (using only
+                     that patient's readings up to it) and return them in input
+                     order; otherwise compute them once per patient at the
+                     latest reading
         
-        # Calculate previous velocity
-        prev_ca125_velocity = calculate_velocity(prev_record['ca125'], prev2_record['ca125'], time_diff_1)
-        prev_he4_velocity = calculate_velocity(prev_record['he4'], prev2_record['he4'], time_diff_1)
+    Returns:
+        Dictionary with 'patient_id' plus one NumPy array per key in
+        TEMPORAL_FEATURE_KEYS
+    """
+    patient_ids = np.asarray(patient_ids)
+    times = _to_epoch_microseconds(timestamps)
+    ca125 = np.asarray(ca125, dtype=float)
+    he4 = np.asarray(he4, dtype=float)
+    
+    if len(times) == 0:
+        features = {key: np.zeros(0) for key in TEMPORAL_FEATURE_KEYS}
+        features['trend_direction'] = np.zeros(0, dtype=int)
+        features['patient_id'] = patient_ids
+        return features
+    
+    unique_ids, group = np.unique(patient_ids, return_inverse=True)
+    group = group.ravel()
+    order = np.lexsort((times, group))
+    counts = np.bincount(group, minlength=len(unique_ids))
+    group_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    
+    if each_record:
+        positions = np.arange(len(times))
+    else:
+        positions = group_starts + counts - 1
+    starts = group_starts[group[order][positions]]
+    
+    features = _temporal_features_at(positions, starts, times[order], ca125[order], he4[order])
+    
+    if each_record:
+        inverse = np.empty(len(order), dtype=np.intp)
+        inverse[order] = np.arange(len(order))
+        features = {key: values[inverse] for key, values in features.items()}
+        features['patient_id'] = patient_ids
+    else:
+        features['patient_id'] = unique_ids
+    
+    return features
+
+
+def parse_recorded_at(value):
+    """Parse a recorded_at value into a naive UTC datetime"""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def extract_temporal_features(biomarker_history):
+    """
+    Extract temporal features from biomarker history
+    
+    Thin wrapper over extract_temporal_features_columnar for a single patient.
+    
+    Args:
+        biomarker_history: List of dicts with keys: ca125, he4, recorded_at
         
-        # Calculate acceleration
-        features['ca125_acceleration'] = calculate_acceleration(
-            features['ca125_velocity'], prev_ca125_velocity, time_diff_2
+    Returns:
+        Dictionary of temporal features
+    """
+    if not biomarker_history or len(biomarker_history) == 0:
+        return extract_temporal_features_from_columns([], [], [])
+    
+    with time_stage('temporal_parse'):
+        timestamps = np.array(
+            [parse_recorded_at(h['recorded_at']) for h in biomarker_history],
+            dtype='datetime64[us]'
         )
-        features['he4_acceleration'] = calculate_acceleration(
-            features['he4_velocity'], prev_he4_velocity, time_diff_2
+        ca125 = [h['ca125'] for h in biomarker_history]
+        he4 = [h['he4'] for h in biomarker_history]
+    return extract_temporal_features_from_columns(timestamps, ca125, he4)
+
+
+def extract_temporal_features_from_columns(recorded_at, ca125, he4):
+    """
+    Extract temporal features for one patient from column arrays
+    
+    Args:
+        recorded_at: Array-like of datetime64 values, epoch seconds or
+                     ISO 8601 strings
+        ca125: Array-like of CA125 values
+        he4: Array-like of HE4 values
+        
+    Returns:
+        Dictionary of temporal features (same keys as extract_temporal_features)
+    """
+    features = {key: 0.0 for key in TEMPORAL_FEATURE_KEYS}
+    features['trend_direction'] = 0  # -1: decreasing, 0: stable, 1: increasing
+    
+    recorded_at = np.asarray(recorded_at)
+    if len(recorded_at) == 0:
+        return features
+    if not (len(recorded_at) == len(ca125) == len(he4)):
+        raise ValueError("History columns must have the same length")
+    
+    if recorded_at.dtype.kind in 'UO':
+        with time_stage('temporal_parse'):
+            recorded_at = np.array([parse_recorded_at(v) for v in recorded_at], dtype='datetime64[us]')
+    with time_stage('temporal_kernel'):
+        columns = extract_temporal_features_columnar(
+            np.zeros(len(recorded_at), dtype=int), recorded_at, ca125, he4
         )
     
-    # Determine trend direction
-    if features['ca125_velocity'] > 0.5 or features['he4_velocity'] > 0.5:
-        features['trend_direction'] = 1  # Increasing
-    elif features['ca125_velocity'] < -0.5 or features['he4_velocity'] < -0.5:
-        features['trend_direction'] = -1  # Decreasing
-    else:
-        features['trend_direction'] = 0  # Stable
+    for key in TEMPORAL_FEATURE_KEYS:
+        features[key] = float(columns[key][0])
+    features['trend_direction'] = int(columns['trend_direction'][0])
     
     return features
 
 
+def _multiplier_rules(velocity_threshold, accel_threshold):
+    """(feature, threshold, factor) of every temporal risk adjustment, in order"""
+    return (
+        # Increase risk if rapid increase in biomarkers (high velocity)
+        ('ca125_velocity', velocity_threshold, 1.15),
+        ('he4_velocity', velocity_threshold, 1.15),
+        # Increase risk if accelerating increase (high acceleration)
+        ('ca125_acceleration', accel_threshold, 1.20),
+        ('he4_acceleration', accel_threshold, 1.20),
+        # Increase risk if high standard deviation (unstable)
+        ('ca125_std_30d', 10.0, 1.10),
+        ('he4_std_30d', 20.0, 1.10)
+    )
+
+
+def temporal_risk_multiplier(temporal_features, velocity_threshold=1.0, accel_threshold=0.5):
+    """
+    Factor the temporal adjustment scales the base risk by (before the cap)
+    
+    Args:
+        temporal_features: Dictionary of temporal features
+        velocity_threshold: Threshold for velocity adjustment
+        accel_threshold: Threshold for acceleration adjustment
+        
+    Returns:
+        Multiplier >= 1.0
+    """
+    multiplier = 1.0
+    for key, threshold, factor in _multiplier_rules(velocity_threshold, accel_threshold):
+        if temporal_features[key] > threshold:
+            multiplier *= factor
+    return multiplier
+
+
+def temporal_risk_multipliers(temporal_features, velocity_threshold=1.0, accel_threshold=0.5):
+    """
+    Temporal risk multipliers for many records in one vectorized pass
+    
+    Args:
+        temporal_features: Dictionary of temporal feature arrays, one value per record
+        velocity_threshold: Threshold for velocity adjustment
+        accel_threshold: Threshold for acceleration adjustment
+        
+    Returns:
+        NumPy array of multipliers, same semantics as temporal_risk_multiplier
+    """
+    multipliers = None
+    for key, threshold, factor in _multiplier_rules(velocity_threshold, accel_threshold):
+        values = np.asarray(temporal_features[key], dtype=float)
+        if multipliers is None:
+            multipliers = np.ones(len(values))
+        multipliers = np.where(values > threshold, multipliers * factor, multipliers)
+    return multipliers
+
+
 def adjust_risk_with_temporal_features(base_risk, temporal_features, velocity_threshold=1.0, accel_threshold=0.5):
     """
     Adjust risk score based on temporal features
@@ -202,30 +387,16 @@ def adjust_risk_with_temporal_features(base_risk, temporal_features, velocity_th
     Returns:
         Adjusted risk probability
     """
-    adjusted_risk = base_risk
-    
-    # Increase risk if rapid increase in biomarkers (high velocity)
-    if temporal_features['ca125_velocity'] > velocity_threshold:
-        adjusted_risk *= 1.15
-    if temporal_features['he4_velocity'] > velocity_threshold:
-        adjusted_risk *= 1.15
-    
-    # Increase risk if accelerating increase (high acceleration)
-    if temporal_features['ca125_acceleration'] > accel_threshold:
-        adjusted_risk *= 1.20
-    if temporal_features['he4_acceleration'] > accel_threshold:
-        adjusted_risk *= 1.20
-    
-    # Increase risk if high standard deviation (unstable)
-    if temporal_features['ca125_std_30d'] > 10.0:
-        adjusted_risk *= 1.10
-    if temporal_features['he4_std_30d'] > 20.0:
-        adjusted_risk *= 1.10
+    adjusted_risk = base_risk * temporal_risk_multiplier(temporal_features, velocity_threshold, accel_threshold)
     
     # Cap at 100%
     return min(adjusted_risk, 1.0)
 
 
+RISK_TIER_THRESHOLDS = np.array([0.25, 0.50, 0.75])
+RISK_TIER_LABELS = np.array(['Low', 'Moderate', 'High', 'Critical'])
+
+
 def get_risk_tier(probability):
     """
     Get risk tier from probability
@@ -244,3 +415,17 @@ def get_risk_tier(probability):
         return 'High'
     else:
         return 'Critical'
+
+
+def get_risk_tiers(probabilities):
+    """
+    Get risk tiers for an array of probabilities in one vectorized pass
+    
+    Args:
+        probabilities: Array-like of risk probabilities (0-1)
+        
+    Returns:
+        NumPy array of risk tier strings, same semantics as get_risk_tier
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    return RISK_TIER_LABELS[np.searchsorted(RISK_TIER_THRESHOLDS, probabilities, side='right')]
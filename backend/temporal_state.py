@@ -0,0 +1,347 @@
+"""
+Incremental Temporal State for OvCare
+Keeps a per-patient streaming state so a new biomarker reading updates the
+temporal features in constant time instead of rescanning the full history
+"""
+
+import json
+import math
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlite_util import Transaction, connect
+from temporal_analysis import (
+    TEMPORAL_FEATURE_KEYS,
+    MICROSECONDS_PER_DAY,
+    extract_temporal_features,
+    parse_recorded_at
+)
+
+STATE_DB_PATH = os.environ.get(
+    "OVCARE_TEMPORAL_STATE_DB",
+    os.path.join(os.path.dirname(__file__), "temporal_state.db")
+)
+
+SHORT_WINDOW = 7
+LONG_WINDOW = 30
+BIOMARKERS = ('ca125', 'he4')
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class SlidingWindow:
+    """
+    Fixed-size window over the most recent readings with a running sum and
+    Welford-style mean/M2 that support both adding and evicting a value
+    """
+
+    def __init__(self, size, values=None):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        for value in values or []:
+            self.push(value)
+
+    def push(self, value):
+        """Add a value, evicting the oldest one when the window is full"""
+        if len(self.values) == self.size:
+            self._remove(self.values[0])
+        self.values.append(value)
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / len(self.values)
+        self.m2 += delta * (value - self.mean)
+
+    def _remove(self, value):
+        """Undo the contribution of the value about to be evicted"""
+        count = len(self.values) - 1
+        self.total -= value
+        if count == 0:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / count
+        self.m2 -= delta * (value - self.mean)
+
+    def average(self):
+        """Mean of the values currently in the window"""
+        if not self.values:
+            return 0.0
+        return self.total / len(self.values)
+
+    def std(self):
+        """Population standard deviation of the values in the window"""
+        if len(self.values) < 2:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / len(self.values))
+
+    def to_dict(self):
+        """Serializable snapshot of the window"""
+        return {'values': list(self.values), 'total': self.total, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, size, data):
+        """Restore a window from to_dict output"""
+        window = cls(size)
+        window.values.extend(data['values'])
+        window.total = data['total']
+        window.mean = data['mean']
+        window.m2 = data['m2']
+        return window
+
+
+class PatientTemporalState:
+    """
+    Streaming temporal state for a single patient
+
+    Holds the last three reading times and values, the last velocities and
+    a short and long sliding window per biomarker. Each update is O(1).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.times = deque(maxlen=3)
+        self.last_values = {name: deque(maxlen=3) for name in BIOMARKERS}
+        self.velocity = {name: 0.0 for name in BIOMARKERS}
+        self.acceleration = {name: 0.0 for name in BIOMARKERS}
+        self.short = {name: SlidingWindow(SHORT_WINDOW) for name in BIOMARKERS}
+        self.long = {name: SlidingWindow(LONG_WINDOW) for name in BIOMARKERS}
+
+    def update(self, ca125, he4, recorded_at):
+        """
+        Add a new reading and update every running statistic
+
+        Args:
+            ca125: CA125 value
+            he4: HE4 value
+            recorded_at: Reading timestamp (ISO string or datetime)
+
+        Returns:
+            Dictionary of temporal features after the update
+        """
+        timestamp = parse_recorded_at(recorded_at)
+        time_us = (timestamp - _EPOCH) // _MICROSECOND
+        if self.times and time_us < self.times[-1]:
+            raise ValueError(
+                "Reading is older than the latest stored reading; rebuild the state from history"
+            )
+
+        days = 1
+        if self.times:
+            days = (time_us - self.times[-1]) // MICROSECONDS_PER_DAY or 1
+
+        for name, value in (('ca125', float(ca125)), ('he4', float(he4))):
+            values = self.last_values[name]
+            if self.count >= 1:
+                velocity = (value - values[-1]) / days
+                if self.count >= 2:
+                    self.acceleration[name] = (velocity - self.velocity[name]) / days
+                self.velocity[name] = velocity
+            values.append(value)
+            self.short[name].push(value)
+            self.long[name].push(value)
+
+        self.times.append(time_us)
+        self.count += 1
+        return self.features()
+
+    def repeats_latest(self, ca125, he4, recorded_at):
+        """
+        Whether a reading is a resend of the latest stored one
+
+        Args:
+            ca125: CA125 value
+            he4: HE4 value
+            recorded_at: Reading timestamp (ISO string or datetime)
+
+        Returns:
+            True if it has the latest reading's timestamp and values
+
+        Raises:
+            ValueError: If it has the latest reading's timestamp but other values
+        """
+        if not self.times:
+            return False
+        time_us = (parse_recorded_at(recorded_at) - _EPOCH) // _MICROSECOND
+        if time_us != self.times[-1]:
+            return False
+        if (float(ca125), float(he4)) != (self.last_values['ca125'][-1], self.last_values['he4'][-1]):
+            raise ValueError(
+                "A different reading is already stored for this recorded_at; rebuild the state from history"
+            )
+        return True
+
+    def features(self):
+        """
+        Current temporal features, same keys and semantics as
+        extract_temporal_features
+        """
+        features = {key: 0.0 for key in TEMPORAL_FEATURE_KEYS}
+        features['trend_direction'] = 0
+        if self.count == 0:
+            return features
+
+        for name in BIOMARKERS:
+            features[f'{name}_velocity'] = self.velocity[name] if self.count >= 2 else 0.0
+            features[f'{name}_acceleration'] = self.acceleration[name] if self.count >= 3 else 0.0
+            features[f'{name}_ma_7d'] = self.short[name].average()
+            features[f'{name}_ma_30d'] = self.long[name].average()
+            features[f'{name}_std_30d'] = self.long[name].std()
+
+        current_he4 = self.last_values['he4'][-1]
+        if current_he4 > 0:
+            features['ca125_he4_ratio'] = self.last_values['ca125'][-1] / current_he4
+
+        if features['ca125_velocity'] > 0.5 or features['he4_velocity'] > 0.5:
+            features['trend_direction'] = 1
+        elif features['ca125_velocity'] < -0.5 or features['he4_velocity'] < -0.5:
+            features['trend_direction'] = -1
+
+        return features
+
+    def to_json(self):
+        """Serialize the state for the store"""
+        return json.dumps({
+            'count': self.count,
+            'times': list(self.times),
+            'last_values': {name: list(values) for name, values in self.last_values.items()},
+            'velocity': self.velocity,
+            'acceleration': self.acceleration,
+            'short': {name: window.to_dict() for name, window in self.short.items()},
+            'long': {name: window.to_dict() for name, window in self.long.items()}
+        })
+
+    @classmethod
+    def from_json(cls, payload):
+        """Restore a state from to_json output"""
+        data = json.loads(payload)
+        state = cls()
+        state.count = data['count']
+        state.times.extend(data['times'])
+        for name in BIOMARKERS:
+            state.last_values[name].extend(data['last_values'][name])
+            state.velocity[name] = data['velocity'][name]
+            state.acceleration[name] = data['acceleration'][name]
+            state.short[name] = SlidingWindow.from_dict(SHORT_WINDOW, data['short'][name])
+            state.long[name] = SlidingWindow.from_dict(LONG_WINDOW, data['long'][name])
+        return state
+
+    @classmethod
+    def from_history(cls, biomarker_history):
+        """
+        Build the state by replaying a full history in time order
+
+        Args:
+            biomarker_history: List of dicts with keys: ca125, he4, recorded_at
+
+        Returns:
+            PatientTemporalState
+        """
+        state = cls()
+        history = sorted(biomarker_history, key=lambda h: parse_recorded_at(h['recorded_at']))
+        for reading in history:
+            state.update(reading['ca125'], reading['he4'], reading['recorded_at'])
+        return state
+
+
+class TemporalStateStore:
+    """
+    SQLite-backed store of per-patient temporal state
+
+    Every update reads and rewrites a single row inside one transaction, so
+    several worker processes can share the same database file.
+    """
+
+    def __init__(self, path=STATE_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS temporal_state ("
+                "patient_id TEXT PRIMARY KEY, "
+                "state TEXT NOT NULL, "
+                "updated_at TEXT NOT NULL)"
+            )
+
+    def _connect(self):
+        """Per-thread connection wrapped in a write transaction"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return Transaction(conn)
+
+    def get(self, patient_id):
+        """Load a patient's state, or None if nothing is stored"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT state FROM temporal_state WHERE patient_id = ?", (str(patient_id),)
+            ).fetchone()
+        return PatientTemporalState.from_json(row[0]) if row else None
+
+    def _save(self, conn, patient_id, state):
+        """Write a patient's state inside the caller's transaction"""
+        conn.execute(
+            "INSERT OR REPLACE INTO temporal_state (patient_id, state, updated_at) VALUES (?, ?, ?)",
+            (str(patient_id), state.to_json(), datetime.now().isoformat())
+        )
+
+    def update(self, patient_id, ca125, he4, recorded_at):
+        """
+        Apply one new reading to a patient's stored state
+
+        A resend of the latest stored reading (same recorded_at and values)
+        leaves the state unchanged, so clients may retry safely.
+
+        Returns:
+            Tuple of (temporal features, number of readings seen, whether the
+            reading was a resend)
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT state FROM temporal_state WHERE patient_id = ?", (str(patient_id),)
+            ).fetchone()
+            state = PatientTemporalState.from_json(row[0]) if row else PatientTemporalState()
+            if state.repeats_latest(ca125, he4, recorded_at):
+                return state.features(), state.count, True
+            features = state.update(ca125, he4, recorded_at)
+            self._save(conn, patient_id, state)
+        return features, state.count, False
+
+    def rebuild(self, patient_id, biomarker_history):
+        """
+        Replace a patient's state by replaying their full history
+
+        Returns:
+            Tuple of (temporal features, number of readings seen)
+        """
+        state = PatientTemporalState.from_history(biomarker_history)
+        with self._connect() as conn:
+            self._save(conn, patient_id, state)
+        return state.features(), state.count
+
+
+def compare_with_batch(state, biomarker_history, tolerance=1e-6):
+    """
+    Check streaming features against extract_temporal_features
+
+    Args:
+        state: PatientTemporalState built from the same readings
+        biomarker_history: List of dicts with keys: ca125, he4, recorded_at
+        tolerance: Allowed relative difference per feature
+
+    Returns:
+        Dictionary of feature name -> (streaming, batch) for mismatches
+    """
+    streaming = state.features()
+    batch = extract_temporal_features(biomarker_history)
+    mismatches = {}
+    for key in TEMPORAL_FEATURE_KEYS:
+        if not math.isclose(streaming[key], batch[key], rel_tol=tolerance, abs_tol=tolerance):
+            mismatches[key] = (streaming[key], batch[key])
+    return mismatches
@@ -5,17 +5,42 @@ Trains Gradient Boosting model with temporal feature engineering
 
 import pandas as pd
 import numpy as np
+from scipy.stats import loguniform, randint, uniform
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report, roc_auc_score
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import (
+    train_test_split, GridSearchCV, RandomizedSearchCV, HalvingRandomSearchCV, StratifiedKFold
+)
+from sklearn.metrics import (
+    accuracy_score, precision_score, recall_score, f1_score, classification_report, roc_auc_score, log_loss
+)
+import argparse
+import copy
 import pickle
+import shutil
 import sys
 import os
+import tempfile
+import time
 from datetime import datetime
 import json
 
+from cascade import SCREENER_DIR, CascadeScreener, calibrate_error_bands, evaluate_cascade
+from compiled_model import compile_pipeline, verify_compiled_pipeline
+from drift_monitor import build_feature_profile
+from model_artifact import save_model_artifact
+from feature_backfill import (
+    PATIENT_COLUMN,
+    DATE_COLUMN,
+    TRAINING_COLUMN_NAMES,
+    backfill_training_frame,
+    check_parity,
+    parse_record_dates
+)
+from training_data import DEFAULT_CHUNK_ROWS, TRAINING_CACHE_DIR, csv_columns, load_feature_matrix, row_fingerprints
+
 # Try to import XGBoost, fallback to GradientBoostingClassifier if not available
 try:
     import xgboost as xgb
@@ -27,21 +52,66 @@ except ImportError:
 CSV_PATH = os.path.join(os.path.dirname(__file__), "train.csv")
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "model.pkl")
 METADATA_PATH = os.path.join(os.path.dirname(__file__), "model_metadata.json")
+ARTIFACT_DIR = os.path.join(os.path.dirname(__file__), "model_artifact")
+# Fingerprints of the records the current model was trained and evaluated on
+TRAINING_ROWS_PATH = os.path.join(os.path.dirname(__file__), "model_training_rows.npz")
+
+# Core features from the dataset
+BASE_FEATURES = ['Age', 'CA125_Level', 'HE4_Level', 'LDH_Level', 'Hemoglobin',
+                 'WBC', 'Platelets', 'Ovary_Size', 'Fatigue_Level', 'Pelvic_Pain',
+                 'Abdominal_Bloating', 'Early_Satiety', 'Menstrual_Irregularities',
+                 'Weight_Change']
+
+TEMPORAL_FEATURES = ['CA125_velocity', 'HE4_velocity', 'CA125_acceleration', 'HE4_acceleration',
+                     'CA125_HE4_ratio', 'CA125_ma_7d', 'HE4_ma_7d', 'CA125_ma_30d', 'HE4_ma_30d',
+                     'CA125_std_30d', 'HE4_std_30d']
+
+TARGET_COLUMN = 'Probability_of_Cancer'
+
+# Per-record history columns the temporal features are computed from
+HISTORY_COLUMNS = [PATIENT_COLUMN, DATE_COLUMN]
+
+# Patients whose backfilled features are checked against the serving implementation
+PARITY_SAMPLE_PATIENTS = 20
+
+# Bump whenever prepare_training_data changes so cached feature matrices are rebuilt
+FEATURE_PREPARATION_VERSION = 2
+
+SEARCH_STRATEGIES = ('none', 'grid', 'random', 'halving')
+SEARCH_SCORING = 'roc_auc'
+EARLY_STOPPING_ROUNDS = 20
+# Boosting rounds given to the strongest candidates in a successive-halving search
+HALVING_MIN_ROUNDS = 25
+HALVING_MAX_ROUNDS = 600
+
+# Hard-coded settings used when no search is requested
+DEFAULT_HYPERPARAMETERS = {'n_estimators': 200, 'max_depth': 6, 'learning_rate': 0.1}
+
+# Incremental training: boosting rounds added per update, the share of new
+# records held out for validation (chosen by fingerprint, so a record keeps
+# its role across runs), and how far a validation metric may fall before
+# the update is rejected in favour of a full retrain
+INCREMENTAL_ROUNDS = 50
+INCREMENTAL_HOLDOUT_FRACTION = 0.2
+INCREMENTAL_TOLERANCE = 0.005
+MIN_INCREMENTAL_ROWS = 20
+
+# Earlier lineage entries kept in the metadata
+LINEAGE_HISTORY = 20
+
+# Cascade screening model: a few shallow trees distilled from the full model
+SCREENER_HYPERPARAMETERS = {'n_estimators': 80, 'max_depth': 4, 'learning_rate': 0.3}
 
 
 def generate_synthetic_temporal_features(df):
     """
     Generate synthetic temporal features from the dataset
     
-    NOTE: This is a placeholder for demonstration purposes. In production,
-    temporal features should be calculated from actual time-series data.
-    Replace this with real temporal sequence analysis when patient history data is available.
-    
-    For real implementation, calculate velocity as:
-    velocity = (current_value - previous_value) / time_difference_in_days
+    NOTE: Fallback for CSVs without Patient_ID / date_of_record columns. When
+    they are present, prepare_training_data computes the real features from
+    each patient's history instead (see feature_backfill.py).
     """
     # Simulate velocity (rate of change) as a function of current values
-    # TODO: Replace with actual temporal calculations from patient history
     df['CA125_velocity'] = df['CA125_Level'] * np.random.uniform(-0.1, 0.1, len(df))
     df['HE4_velocity'] = df['HE4_Level'] * np.random.uniform(-0.1, 0.1, len(df))
     
@@ -65,83 +135,293 @@ def generate_synthetic_temporal_features(df):
     return df
 
 
-def main():
-    print("=" * 80)
-    print("Enhanced OvCare Training System - Temporal Analysis")
-    print("=" * 80)
-    
-    if not os.path.exists(CSV_PATH):
-        print(f"Error: train.csv not found at {CSV_PATH}")
-        return
+def prepare_training_data(df):
+    """
+    Feature matrix and binary labels from the raw training columns
     
-    print(f"\nLoading dataset from {CSV_PATH}...")
-    df = pd.read_csv(CSV_PATH)
+    Args:
+        df: DataFrame with BASE_FEATURES and TARGET_COLUMN, plus
+            HISTORY_COLUMNS when the CSV has them
+        
+    Returns:
+        Tuple of (float32 array in BASE_FEATURES + TEMPORAL_FEATURES order, int8 labels)
+        
+    Raises:
+        RuntimeError: If backfilled features disagree with the serving implementation
+    """
     print(f"Dataset loaded: {len(df)} records")
     
-    # Core features from the dataset
-    base_features = ['Age', 'CA125_Level', 'HE4_Level', 'LDH_Level', 'Hemoglobin', 
-                     'WBC', 'Platelets', 'Ovary_Size', 'Fatigue_Level', 'Pelvic_Pain',
-                     'Abdominal_Bloating', 'Early_Satiety', 'Menstrual_Irregularities', 
-                     'Weight_Change']
-    
-    target_column = 'Probability_of_Cancer'
+    if all(column in df.columns for column in HISTORY_COLUMNS):
+        print("\nComputing temporal features from patient history...")
+        df = df.dropna(subset=HISTORY_COLUMNS + ['CA125_Level', 'HE4_Level'])
+        df = backfill_training_frame(df)
+        
+        # Training/serving skew check on a sample of patients
+        parity = check_parity(
+            df[PATIENT_COLUMN].to_numpy(), parse_record_dates(df[DATE_COLUMN]),
+            df['CA125_Level'].to_numpy(), df['HE4_Level'].to_numpy(),
+            {key: df[column].to_numpy() for key, column in TRAINING_COLUMN_NAMES.items()},
+            sample_patients=PARITY_SAMPLE_PATIENTS
+        )
+        print(f"Serving parity: {parity['records_checked']} records checked, "
+              f"max relative difference {parity['max_relative_diff']:.2e}")
+        if not parity['passed']:
+            raise RuntimeError(f"Backfilled temporal features differ from serving: {parity['mismatches']}")
+    else:
+        print("\nNo patient history columns, generating synthetic temporal features...")
+        df = generate_synthetic_temporal_features(df)
     
-    # Check for missing columns
-    missing_cols = [col for col in base_features + [target_column] if col not in df.columns]
-    if missing_cols:
-        print(f"Error: Missing columns: {missing_cols}")
-        return
+    # Drop rows with missing values
+    df = df.dropna(subset=BASE_FEATURES + TEMPORAL_FEATURES + [TARGET_COLUMN])
+    print(f"After cleaning: {len(df)} records")
     
-    print("\nGenerating synthetic temporal features...")
-    df = generate_synthetic_temporal_features(df)
+    X = df[BASE_FEATURES + TEMPORAL_FEATURES].to_numpy(dtype=np.float32)
+    y = (df[TARGET_COLUMN] > 0.5).to_numpy(dtype=np.int8)  # Binary classification: risk > 50%
+    return X, y
+
+
+def make_classifier(**params):
+    """
+    Gradient boosting classifier (XGBoost when available) with the given hyperparameters
+    """
+    params = dict(DEFAULT_HYPERPARAMETERS, **params)
+    if USE_XGBOOST:
+        return xgb.XGBClassifier(random_state=42, eval_metric='logloss', **params)
+    return GradientBoostingClassifier(random_state=42, **params)
+
+
+def default_search_space(strategy):
+    """
+    Search space for the pipeline's classifier step
     
-    # Extended features with temporal features
-    temporal_features = ['CA125_velocity', 'HE4_velocity', 'CA125_acceleration', 'HE4_acceleration',
-                        'CA125_HE4_ratio', 'CA125_ma_7d', 'HE4_ma_7d', 'CA125_ma_30d', 'HE4_ma_30d',
-                        'CA125_std_30d', 'HE4_std_30d']
+    Args:
+        strategy: 'grid' (lists of values) or 'random'/'halving' (distributions)
+        
+    Returns:
+        Dictionary of pipeline parameter name to values or scipy distribution
+    """
+    if strategy == 'grid':
+        space = {
+            'clf__n_estimators': [200, 400],
+            'clf__max_depth': [3, 4, 6],
+            'clf__learning_rate': [0.05, 0.1, 0.2],
+            'clf__subsample': [0.8, 1.0]
+        }
+        if USE_XGBOOST:
+            space['clf__min_child_weight'] = [1, 5]
+        else:
+            space['clf__min_samples_leaf'] = [1, 5]
+        return space
+    
+    space = {
+        'clf__n_estimators': randint(100, HALVING_MAX_ROUNDS + 1),
+        'clf__max_depth': randint(2, 9),
+        'clf__learning_rate': loguniform(0.01, 0.3),
+        'clf__subsample': uniform(0.6, 0.4)
+    }
+    if USE_XGBOOST:
+        space['clf__min_child_weight'] = randint(1, 11)
+        space['clf__colsample_bytree'] = uniform(0.6, 0.4)
+    else:
+        space['clf__min_samples_leaf'] = randint(1, 11)
+        space['clf__max_features'] = uniform(0.6, 0.4)
+    return space
+
+
+def load_search_space(path):
+    """
+    Read a search space from JSON: {"max_depth": [3, 4, 6], ...}
     
-    all_features = base_features + temporal_features
+    Names without a pipeline step prefix refer to the classifier.
+    """
+    with open(path, 'r') as f:
+        space = json.load(f)
+    if not isinstance(space, dict) or not all(isinstance(v, list) and v for v in space.values()):
+        raise ValueError(f"{path} must map parameter names to non-empty lists of values")
+    return {(name if '__' in name else f'clf__{name}'): values for name, values in space.items()}
+
+
+def _json_value(value):
+    """Convert NumPy scalars in search results to plain Python values"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def summarize_search_results(cv_results):
+    """
+    Full search results table, best candidate first
     
-    # Drop rows with missing values
-    df = df.dropna(subset=all_features + [target_column])
-    print(f"After cleaning: {len(df)} records")
+    Args:
+        cv_results: The search's cv_results_
+        
+    Returns:
+        List of dictionaries, one per candidate (and halving iteration)
+    """
+    rows = []
+    for i, params in enumerate(cv_results['params']):
+        row = {
+            'params': {name.replace('clf__', ''): _json_value(v) for name, v in params.items()},
+            'mean_test_score': float(cv_results['mean_test_score'][i]),
+            'std_test_score': float(cv_results['std_test_score'][i]),
+            'rank_test_score': int(cv_results['rank_test_score'][i]),
+            'mean_fit_time': float(cv_results['mean_fit_time'][i])
+        }
+        if 'n_resources' in cv_results:
+            row['iter'] = int(cv_results['iter'][i])
+            row['n_resources'] = int(cv_results['n_resources'][i])
+        rows.append(row)
+    
+    # Halving ranks every (candidate, iteration) pair; list later iterations first
+    rows.sort(key=lambda row: (-row.get('iter', 0), row['rank_test_score']))
+    return rows
+
+
+def run_hyperparameter_search(X_train, y_train, strategy, search_space=None,
+                              n_iter=40, cv_folds=5, n_jobs=-1):
+    """
+    Cross-validated hyperparameter search over a process pool
+    
+    Args:
+        X_train: Training features
+        y_train: Training labels
+        strategy: 'grid', 'random' or 'halving'
+        search_space: Optional space from load_search_space (defaults per strategy)
+        n_iter: Candidates sampled by the randomized search
+        cv_folds: Stratified cross-validation folds
+        n_jobs: Worker processes (-1 uses every core)
+        
+    Returns:
+        Tuple of (best classifier parameters, search summary for the metadata)
+    """
+    space = dict(search_space or default_search_space(strategy))
+    # One thread per model: the process pool already keeps every core busy
+    classifier = make_classifier(n_jobs=1) if USE_XGBOOST else make_classifier(
+        n_iter_no_change=EARLY_STOPPING_ROUNDS, validation_fraction=0.1
+    )
     
-    # Prepare features and target
-    X = df[all_features]
-    y = (df[target_column] > 0.5).astype(int)  # Binary classification: risk > 50%
+    # Scaler fits are cached on disk and shared by candidates on the same fold
+    cache_dir = tempfile.mkdtemp(prefix="ovcare-search-")
+    try:
+        pipe = Pipeline([
+            ('scaler', StandardScaler()),
+            ('clf', classifier)
+        ], memory=cache_dir)
+        cv = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=42)
+        common = dict(scoring=SEARCH_SCORING, cv=cv, n_jobs=n_jobs, refit=False)
+        
+        if strategy == 'grid':
+            search = GridSearchCV(pipe, space, **common)
+        elif strategy == 'random':
+            search = RandomizedSearchCV(pipe, space, n_iter=n_iter, random_state=42, **common)
+        elif strategy == 'halving':
+            # Boosting rounds are the budget: weak candidates are cut after a few
+            space.pop('clf__n_estimators', None)
+            search = HalvingRandomSearchCV(
+                pipe, space, resource='clf__n_estimators',
+                min_resources=HALVING_MIN_ROUNDS, max_resources=HALVING_MAX_ROUNDS,
+                factor=3, random_state=42, **common
+            )
+        else:
+            raise ValueError(f"Unknown search strategy: {strategy}")
+        
+        start = time.perf_counter()
+        search.fit(X_train, y_train)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    
+    best_params = {name.replace('clf__', ''): _json_value(v) for name, v in search.best_params_.items()}
+    if strategy == 'halving':
+        best_params['n_estimators'] = int(search.cv_results_['n_resources'][search.best_index_])
+    
+    results = summarize_search_results(search.cv_results_)
+    summary = {
+        'strategy': strategy,
+        'scoring': SEARCH_SCORING,
+        'cv_folds': cv_folds,
+        'n_jobs': n_jobs,
+        'n_candidates': int(search.n_candidates_[0]) if strategy == 'halving' else len(results),
+        'n_fits': len(results) * cv_folds,
+        'elapsed_seconds': round(elapsed, 2),
+        'best_params': dict(best_params),
+        'best_score': float(search.best_score_),
+        'results': results
+    }
+    return best_params, summary
+
+
+def early_stopped_rounds(params, X_train, y_train):
+    """
+    Number of boosting rounds to keep for the final model
     
-    print(f"\nClass distribution:")
-    print(f"  Class 0 (Low Risk): {(y == 0).sum()} ({(y == 0).sum() / len(y) * 100:.1f}%)")
-    print(f"  Class 1 (High Risk): {(y == 1).sum()} ({(y == 1).sum() / len(y) * 100:.1f}%)")
+    Trains on 90% of the training set and stops once the held-out 10% has
+    not improved for EARLY_STOPPING_ROUNDS rounds.
     
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
+    Returns:
+        Boosting rounds (never more than params['n_estimators'])
+    """
+    if not USE_XGBOOST:
+        # GradientBoostingClassifier holds out validation_fraction internally
+        classifier = make_classifier(n_iter_no_change=EARLY_STOPPING_ROUNDS, validation_fraction=0.1, **params)
+        classifier.fit(StandardScaler().fit_transform(X_train), y_train)
+        return int(classifier.n_estimators_)
+    
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=0.1, random_state=42, stratify=y_train
     )
+    scaler = StandardScaler().fit(X_fit)
+    classifier = make_classifier(early_stopping_rounds=EARLY_STOPPING_ROUNDS, **params)
+    classifier.fit(scaler.transform(X_fit), y_fit,
+                   eval_set=[(scaler.transform(X_val), y_val)], verbose=False)
+    return int(classifier.best_iteration) + 1
+
+
+def train_full_model(args, X, y):
+    """
+    Split, optionally search hyperparameters, and fit the pipeline on all training rows
     
-    print(f"\nTraining set: {len(X_train)} samples")
-    print(f"Test set: {len(X_test)} samples")
+    Returns:
+        Tuple of (pipeline, training-row mask, held-out-row mask, hyperparameters, search summary)
+    """
+    train_rows, test_rows = train_test_split(
+        np.arange(len(X)), test_size=0.2, random_state=42, stratify=y
+    )
+    X_train, y_train = X.iloc[train_rows], y[train_rows]
+    
+    print(f"\nTraining set: {len(train_rows)} samples")
+    print(f"Test set: {len(test_rows)} samples")
+    
+    hyperparameters = dict(DEFAULT_HYPERPARAMETERS)
+    search_summary = None
+    
+    if args.search != 'none':
+        print("\n" + "=" * 80)
+        print(f"Hyperparameter Search ({args.search}, {args.cv}-fold CV, n_jobs={args.n_jobs})")
+        print("=" * 80)
+        search_space = load_search_space(args.search_space) if args.search_space else None
+        hyperparameters, search_summary = run_hyperparameter_search(
+            X_train, y_train, args.search, search_space,
+            n_iter=args.n_iter, cv_folds=args.cv, n_jobs=args.n_jobs
+        )
+        print(f"Evaluated {search_summary['n_candidates']} candidates "
+              f"in {search_summary['elapsed_seconds']:.1f}s")
+        print(f"Best CV {SEARCH_SCORING}: {search_summary['best_score']:.4f}")
+        print(f"Best parameters: {hyperparameters}")
+        
+        rounds = early_stopped_rounds(hyperparameters, X_train, y_train)
+        print(f"Early stopping kept {rounds} of {hyperparameters.get('n_estimators', rounds)} boosting rounds")
+        hyperparameters['n_estimators'] = rounds
+        search_summary['early_stopped_n_estimators'] = rounds
     
     # Create model pipeline
     print("\nTraining model...")
     
     if USE_XGBOOST:
         print("Using XGBoost Classifier")
-        classifier = xgb.XGBClassifier(
-            n_estimators=200,
-            max_depth=6,
-            learning_rate=0.1,
-            random_state=42,
-            eval_metric='logloss'
-        )
     else:
         print("Using Gradient Boosting Classifier")
-        classifier = GradientBoostingClassifier(
-            n_estimators=200,
-            max_depth=6,
-            learning_rate=0.1,
-            random_state=42
-        )
+    classifier = make_classifier(**hyperparameters)
     
     pipe = Pipeline([
         ('scaler', StandardScaler()),
@@ -151,6 +431,284 @@ def main():
     # Train model
     pipe.fit(X_train, y_train)
     
+    train_mask = np.zeros(len(X), dtype=bool)
+    train_mask[train_rows] = True
+    return pipe, train_mask, ~train_mask, hyperparameters, search_summary
+
+
+def validation_metrics(pipe, X, y):
+    """Accuracy, ROC-AUC and log loss of a pipeline on labelled rows"""
+    proba = pipe.predict_proba(X)[:, 1]
+    return {
+        'accuracy': float(accuracy_score(y, proba >= 0.5)),
+        'roc_auc': float(roc_auc_score(y, proba)),
+        'log_loss': float(log_loss(y, proba, labels=[0, 1]))
+    }
+
+
+def continue_training(base_pipe, X_new, y_new, rounds):
+    """
+    Copy of a fitted pipeline with boosting rounds added on new records
+    
+    XGBoost continues from the existing booster; GradientBoostingClassifier
+    adds stages with warm_start. The scaler is kept as fitted: the existing
+    trees split on its output, so changing it would move every old split.
+    
+    Args:
+        base_pipe: Fitted scaler + classifier pipeline (not modified)
+        X_new: New or changed training records
+        y_new: Their labels
+        rounds: Boosting rounds to add
+        
+    Returns:
+        Tuple of (updated pipeline, total boosting rounds)
+    """
+    pipe = copy.deepcopy(base_pipe)
+    clf = pipe.named_steps['clf']
+    X_scaled = pipe.named_steps['scaler'].transform(X_new)
+    if USE_XGBOOST and isinstance(clf, xgb.XGBClassifier):
+        booster = clf.get_booster()
+        clf.set_params(n_estimators=rounds)
+        clf.fit(X_scaled, y_new, xgb_model=booster, verbose=False)
+        total = clf.get_booster().num_boosted_rounds()
+    else:
+        clf.set_params(warm_start=True, n_estimators=clf.n_estimators_ + rounds)
+        clf.fit(X_scaled, y_new)
+        total = int(clf.n_estimators_)
+    clf.set_params(n_estimators=total)
+    return pipe, total
+
+
+def incremental_update(X, y, fingerprints, rounds=INCREMENTAL_ROUNDS, tolerance=INCREMENTAL_TOLERANCE):
+    """
+    Add boosting rounds to the current model on records it has not seen
+    
+    Records are matched to the previous run by fingerprint. A share of the
+    new records is held out; together with the previous run's held-out
+    records they validate the update against the current model.
+    
+    Args:
+        X: Feature DataFrame of every record
+        y: Labels
+        fingerprints: row_fingerprints of X and y
+        rounds: Boosting rounds to add
+        tolerance: Largest allowed drop in validation accuracy or ROC-AUC
+        
+    Returns:
+        Tuple of (updated pipeline or None, training-row mask, held-out-row
+        mask, lineage dict); without a pipeline, lineage['fallback_reason']
+        says why a full retrain is needed, or lineage['up_to_date'] is set
+    """
+    lineage = {'mode': 'incremental'}
+    
+    def fall_back(reason):
+        lineage['fallback_reason'] = reason
+        return None, None, None, lineage
+    
+    if not all(os.path.exists(path) for path in (MODEL_PATH, METADATA_PATH, TRAINING_ROWS_PATH)):
+        return fall_back("no previous model with training record fingerprints")
+    with open(METADATA_PATH, 'r') as f:
+        base_metadata = json.load(f)
+    if base_metadata.get('features') != list(X.columns):
+        return fall_back("the feature list changed")
+    if base_metadata.get('model_type') != ('XGBoost' if USE_XGBOOST else 'GradientBoosting'):
+        return fall_back(f"the previous model is {base_metadata.get('model_type')}")
+    lineage['base_version'] = f"{base_metadata.get('model_version', 'Unknown')}:{base_metadata.get('training_date', '')}"
+    
+    with np.load(TRAINING_ROWS_PATH) as seen:
+        seen_train, seen_holdout = seen['train'], seen['holdout']
+    old_holdout = np.isin(fingerprints, seen_holdout)
+    new = ~(np.isin(fingerprints, seen_train) | old_holdout)
+    new_holdout = new & (fingerprints % np.uint64(1000) < int(INCREMENTAL_HOLDOUT_FRACTION * 1000))
+    new_train = new & ~new_holdout
+    holdout = old_holdout | new_holdout
+    lineage.update({
+        'rows_added': int(new_train.sum()),
+        'holdout_rows_added': int(new_holdout.sum()),
+        'rows_total': int(len(X))
+    })
+    print(f"Base model: {lineage['base_version']}")
+    print(f"New or changed records: {int(new.sum())} ({lineage['rows_added']} to train on, "
+          f"{lineage['holdout_rows_added']} held out)")
+    
+    if not new.any():
+        lineage['up_to_date'] = True
+        return None, None, None, lineage
+    if new_train.sum() < MIN_INCREMENTAL_ROWS or len(np.unique(y[new_train])) < 2:
+        return fall_back(f"too few new records to train on ({int(new_train.sum())}, need "
+                         f"{MIN_INCREMENTAL_ROWS} covering both classes)")
+    if len(np.unique(y[holdout])) < 2:
+        return fall_back("the validation records do not cover both classes")
+    
+    with open(MODEL_PATH, "rb") as f:
+        base_pipe = pickle.load(f)
+    start = time.perf_counter()
+    pipe, total_rounds = continue_training(base_pipe, X[new_train], y[new_train], rounds)
+    lineage['boosting_rounds_added'] = rounds
+    lineage['boosting_rounds_total'] = total_rounds
+    lineage['update_seconds'] = round(time.perf_counter() - start, 2)
+    
+    base_metrics = validation_metrics(base_pipe, X[holdout], y[holdout])
+    updated_metrics = validation_metrics(pipe, X[holdout], y[holdout])
+    lineage['validation'] = {'rows': int(holdout.sum()), 'base': base_metrics, 'updated': updated_metrics}
+    print(f"Validation on {int(holdout.sum())} held-out records: "
+          f"ROC-AUC {base_metrics['roc_auc']:.4f} -> {updated_metrics['roc_auc']:.4f}, "
+          f"accuracy {base_metrics['accuracy']:.4f} -> {updated_metrics['accuracy']:.4f}")
+    for metric in ('roc_auc', 'accuracy'):
+        if updated_metrics[metric] < base_metrics[metric] - tolerance:
+            return fall_back(f"validation {metric} fell from {base_metrics[metric]:.4f} "
+                             f"to {updated_metrics[metric]:.4f}")
+    
+    previous = dict(base_metadata.get('lineage', {'mode': 'full'}), version=lineage['base_version'])
+    lineage['history'] = ([previous] + previous.pop('history', []))[:LINEAGE_HISTORY]
+    return pipe, ~holdout, holdout, lineage
+
+
+def train_screener(pipe, X_train, X_holdout):
+    """
+    Distill a small screening model from the full pipeline and calibrate its error bands
+    
+    The screener is fit to the full model's probabilities rather than the
+    labels (each training row appears once per class, weighted by the full
+    model's probability of that class). Its error bands are calibrated on
+    the held-out rows; the reported held-out cascade scores each half of
+    them with bands calibrated on the other half.
+    
+    Args:
+        pipe: Fitted full pipeline
+        X_train: Training features
+        X_holdout: Held-out features (the test set)
+        
+    Returns:
+        Tuple of (fitted screener pipeline, cascade summary for the metadata)
+    """
+    soft_labels = pipe.predict_proba(X_train)[:, 1]
+    n = len(X_train)
+    screener = Pipeline([
+        ('scaler', StandardScaler()),
+        ('clf', make_classifier(**SCREENER_HYPERPARAMETERS))
+    ])
+    screener.fit(
+        pd.concat([X_train, X_train]), np.r_[np.zeros(n, dtype=np.int8), np.ones(n, dtype=np.int8)],
+        clf__sample_weight=np.r_[1.0 - soft_labels, soft_labels]
+    )
+    
+    full_holdout = pipe.predict_proba(X_holdout)[:, 1]
+    screen_holdout = screener.predict_proba(X_holdout)[:, 1]
+    bands = calibrate_error_bands(screen_holdout, full_holdout)
+    
+    # Held-out evaluation: each half is screened with bands calibrated on the other
+    first, second = train_test_split(np.arange(len(X_holdout)), test_size=0.5, random_state=42)
+    band_widths = np.empty(len(X_holdout))
+    for calibration, evaluation in ((first, second), (second, first)):
+        half_bands = calibrate_error_bands(screen_holdout[calibration], full_holdout[calibration])
+        band_widths[evaluation] = CascadeScreener(None, half_bands).band(screen_holdout[evaluation])
+    evaluation = evaluate_cascade(screen_holdout, full_holdout, band_widths)
+    summary = {
+        'hyperparameters': dict(DEFAULT_HYPERPARAMETERS, **SCREENER_HYPERPARAMETERS),
+        'calibration_rows': len(X_holdout),
+        'bands': bands,
+        'holdout': evaluation
+    }
+    return screener, summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the OvCare risk model")
+    parser.add_argument("--search", choices=SEARCH_STRATEGIES, default='none',
+                        help="hyperparameter search strategy (default: none, use fixed settings)")
+    parser.add_argument("--search-space", help="JSON file mapping parameter names to candidate values")
+    parser.add_argument("--n-iter", type=int, default=40, help="candidates for --search random")
+    parser.add_argument("--cv", type=int, default=5, help="cross-validation folds")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="search worker processes (-1: all cores)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always parse the CSV instead of reusing the cached feature matrix")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="CSV rows parsed per chunk (the loaded columns are still held in full)")
+    parser.add_argument("--no-screener", action="store_true",
+                        help="do not train the cascade screening model")
+    parser.add_argument("--incremental", action="store_true",
+                        help="add boosting rounds to the current model on new or changed records only "
+                             "(falls back to a full retrain if validation metrics degrade)")
+    parser.add_argument("--rounds", type=int, default=INCREMENTAL_ROUNDS,
+                        help="boosting rounds added by --incremental")
+    args = parser.parse_args(argv)
+    if args.incremental and args.search != 'none':
+        parser.error("--incremental keeps the current hyperparameters; it cannot be combined with --search")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    
+    print("=" * 80)
+    print("Enhanced OvCare Training System - Temporal Analysis")
+    print("=" * 80)
+    
+    if not os.path.exists(CSV_PATH):
+        print(f"Error: train.csv not found at {CSV_PATH}")
+        return
+    
+    print(f"\nLoading dataset from {CSV_PATH}...")
+    
+    base_features = BASE_FEATURES
+    temporal_features = TEMPORAL_FEATURES
+    all_features = base_features + temporal_features
+    
+    # Check for missing columns
+    available = set(csv_columns(CSV_PATH))
+    missing_cols = [col for col in base_features + [TARGET_COLUMN] if col not in available]
+    if missing_cols:
+        print(f"Error: Missing columns: {missing_cols}")
+        return
+    
+    history_columns = [col for col in HISTORY_COLUMNS if col in available]
+    temporal_source = 'patient_history' if len(history_columns) == len(HISTORY_COLUMNS) else 'synthetic'
+    
+    X, y, load_info = load_feature_matrix(
+        CSV_PATH, base_features + [TARGET_COLUMN] + history_columns, prepare_training_data,
+        key_fields={'features': all_features, 'version': FEATURE_PREPARATION_VERSION,
+                    'temporal_source': temporal_source},
+        use_cache=not args.no_cache, cache_dir=TRAINING_CACHE_DIR, chunk_rows=args.chunk_rows
+    )
+    if load_info['cache'] == 'hit':
+        print(f"Loaded cached feature matrix ({len(X)} records): {load_info['cache_path']}")
+    
+    # Prepare features and target
+    X = pd.DataFrame(X, columns=all_features)
+    
+    print(f"\nClass distribution:")
+    print(f"  Class 0 (Low Risk): {(y == 0).sum()} ({(y == 0).sum() / len(y) * 100:.1f}%)")
+    print(f"  Class 1 (High Risk): {(y == 1).sum()} ({(y == 1).sum() / len(y) * 100:.1f}%)")
+    
+    fingerprints = row_fingerprints(X.to_numpy(), y)
+    pipe = None
+    lineage = {'mode': 'full'}
+    
+    if args.incremental:
+        print("\n" + "=" * 80)
+        print(f"Incremental Update (+{args.rounds} boosting rounds)")
+        print("=" * 80)
+        pipe, train_mask, test_mask, lineage = incremental_update(X, y, fingerprints, rounds=args.rounds)
+        if lineage.get('up_to_date'):
+            print("No new or changed records; the current model is up to date")
+            return
+        if pipe is None:
+            print(f"Falling back to a full retrain: {lineage['fallback_reason']}")
+            lineage = {'mode': 'full', 'fallback_reason': lineage['fallback_reason'],
+                       **{key: lineage[key] for key in ('base_version',) if key in lineage}}
+        else:
+            hyperparameters = {
+                name: _json_value(pipe.named_steps['clf'].get_params()[name]) for name in DEFAULT_HYPERPARAMETERS
+            }
+            search_summary = None
+    
+    if pipe is None:
+        pipe, train_mask, test_mask, hyperparameters, search_summary = train_full_model(args, X, y)
+        lineage['rows_total'] = int(len(X))
+    
+    X_train, X_test, y_test = X[train_mask], X[test_mask], y[test_mask]
+    
     # Evaluate
     print("\n" + "=" * 80)
     print("Model Evaluation")
@@ -193,6 +751,45 @@ def main():
         for i, (feature, importance) in enumerate(feature_importance[:15], 1):
             print(f"{i:2d}. {feature:30s} {importance:.4f}")
     
+    # Cascade screener: answers requests far from every risk tier boundary
+    screener = compiled_screener = cascade_summary = None
+    if not args.no_screener:
+        print("\n" + "=" * 80)
+        print("Cascade Screener")
+        print("=" * 80)
+        screener, cascade_summary = train_screener(pipe, X_train, X_test)
+        try:
+            compiled_screener = compile_pipeline(screener)
+        except ValueError as e:
+            print(f"Skipping cascade screener: {e}")
+            cascade_summary = None
+        else:
+            holdout = cascade_summary['holdout']
+            print(f"Screener: {SCREENER_HYPERPARAMETERS['n_estimators']} trees of depth "
+                  f"{SCREENER_HYPERPARAMETERS['max_depth']}, error band "
+                  f"{cascade_summary['bands']['overall_width']:.3f} at "
+                  f"{cascade_summary['bands']['coverage']:.0%} coverage")
+            print(f"Held-out fast path: {holdout['fast_path_fraction']:.1%} of rows, "
+                  f"tier agreement {holdout['fast_path_tier_agreement']:.2%} on the fast path, "
+                  f"{holdout['tier_agreement']:.2%} overall")
+    
+    # The compiled engine and the memory-mapped artifact must reproduce the
+    # pipeline on every held-out row
+    print("\n" + "=" * 80)
+    print("Compiled Model Parity")
+    print("=" * 80)
+    try:
+        compiled, compiled_parity = verify_compiled_pipeline(pipe, X_test)
+    except ValueError as e:
+        print(f"Skipping compiled model: {e}")
+        compiled = compiled_parity = None
+    else:
+        print(f"{compiled_parity['rows']} held-out rows, max probability difference "
+              f"{compiled_parity['max_abs_probability_diff']:.2e}, "
+              f"label agreement {compiled_parity['label_agreement']:.2%}")
+        if not compiled_parity['passed']:
+            print("Compiled model does not match the pipeline; not writing the memory-mapped artifact")
+    
     # Save model
     print(f"\n" + "=" * 80)
     print("Saving Model")
@@ -209,6 +806,7 @@ def main():
         'features': all_features,
         'base_features': base_features,
         'temporal_features': temporal_features,
+        'temporal_feature_source': temporal_source,
         'model_type': 'XGBoost' if USE_XGBOOST else 'GradientBoosting',
         'metrics': {
             'accuracy': float(accuracy),
@@ -217,13 +815,42 @@ def main():
             'f1_score': float(f1),
             'roc_auc': float(roc_auc)
         },
-        'feature_importance': {feat: float(imp) for feat, imp in feature_importance[:15]} if hasattr(clf, 'feature_importances_') else {}
+        'feature_importance': {feat: float(imp) for feat, imp in feature_importance[:15]} if hasattr(clf, 'feature_importances_') else {},
+        'hyperparameters': hyperparameters
     }
+    if search_summary is not None:
+        metadata['hyperparameter_search'] = search_summary
+    metadata['lineage'] = lineage
+    # Training distribution the API's drift monitor compares live inputs with
+    metadata['feature_profile'] = build_feature_profile(X_train.to_numpy(), all_features)
+    if cascade_summary is not None:
+        metadata['cascade'] = cascade_summary
+    if compiled_parity is not None:
+        metadata['compiled_parity'] = compiled_parity
     
     with open(METADATA_PATH, 'w') as f:
         json.dump(metadata, f, indent=2)
     print(f"Metadata saved to: {METADATA_PATH}")
     
+    # Which records this model was trained and evaluated on, for --incremental
+    tmp_path = f"{TRAINING_ROWS_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, train=np.sort(fingerprints[train_mask]), holdout=np.sort(fingerprints[test_mask]))
+    os.replace(tmp_path, TRAINING_ROWS_PATH)
+    
+    # Save pickle-free, memory-mappable copy of the model
+    if compiled_parity is not None and compiled_parity['passed']:
+        artifact_dir = save_model_artifact(
+            compiled, metadata, scaler=pipe.named_steps['scaler'], directory=ARTIFACT_DIR
+        )
+        print(f"Memory-mapped artifact saved to: {artifact_dir}")
+    
+    if compiled_screener is not None:
+        save_model_artifact(
+            compiled_screener, metadata, scaler=screener.named_steps['scaler'], directory=SCREENER_DIR
+        )
+        print(f"Cascade screener saved to: {SCREENER_DIR}")
+    
     print("\n" + "=" * 80)
     print("Training Complete!")
     print("=" * 80)
@@ -0,0 +1,188 @@
+"""
+Training Data Loader for OvCare
+Reads only the columns training needs, with compact dtypes and in chunks,
+and caches the prepared float32 feature matrix keyed by the CSV's content
+hash so that reruns skip CSV parsing
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+TRAINING_CACHE_DIR = os.environ.get(
+    "OVCARE_TRAINING_CACHE_DIR", os.path.join(os.path.dirname(__file__), "training_cache")
+)
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Explicit dtypes for known columns; any other numeric column is read as float32
+COLUMN_DTYPES = {
+    'Patient_ID': 'category',
+    'date_of_record': 'str',
+    'Age': 'float32',
+    'CA125_Level': 'float32',
+    'HE4_Level': 'float32',
+    'LDH_Level': 'float32',
+    'Hemoglobin': 'float32',
+    'WBC': 'float32',
+    'Platelets': 'float32',
+    'Ovary_Size': 'float32',
+    'Fatigue_Level': 'float32',
+    'Pelvic_Pain': 'float32',
+    'Abdominal_Bloating': 'float32',
+    'Early_Satiety': 'float32',
+    'Menstrual_Irregularities': 'float32',
+    'Weight_Change': 'float32',
+    'Probability_of_Cancer': 'float32'
+}
+
+
+def csv_columns(csv_path):
+    """Column names from the CSV header"""
+    return list(pd.read_csv(csv_path, nrows=0).columns)
+
+
+def iter_column_chunks(csv_path, columns, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Stream the CSV as DataFrames holding only `columns`
+
+    Args:
+        csv_path: Path of the CSV
+        columns: Columns to read; all others are skipped by the parser
+        chunk_rows: Rows per chunk
+
+    Yields:
+        DataFrames of at most chunk_rows rows
+    """
+    dtypes = {column: COLUMN_DTYPES.get(column, 'float32') for column in columns}
+    yield from pd.read_csv(csv_path, usecols=columns, dtype=dtypes, chunksize=chunk_rows)
+
+
+def read_columns(csv_path, columns, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Read `columns` of the whole CSV with compact dtypes, one chunk at a time
+
+    Each chunk is split into per-column arrays as it arrives and the pieces
+    are joined one column at a time. Peak memory is the finished frame plus
+    one chunk and one column's pieces, not the frame plus every chunk. The
+    selected columns of the whole CSV are still held in memory.
+    """
+    parts = {column: [] for column in columns}
+    for chunk in iter_column_chunks(csv_path, columns, chunk_rows):
+        # The parser returns columns in file order
+        columns = list(chunk.columns)
+        for column in columns:
+            values = chunk[column]
+            parts[column].append(values.array if isinstance(values.dtype, pd.CategoricalDtype)
+                                 else values.to_numpy())
+        del chunk
+    if not parts[columns[0]]:
+        return pd.DataFrame(columns=columns)
+
+    data = {}
+    for column in columns:
+        pieces = parts.pop(column)
+        if isinstance(pieces[0], pd.Categorical):
+            data[column] = pd.api.types.union_categoricals(pieces)
+        else:
+            data[column] = np.concatenate(pieces)
+        del pieces
+    return pd.DataFrame(data, columns=columns, copy=False)
+
+
+def csv_content_hash(csv_path):
+    """SHA-256 of the CSV's bytes, read 1 MiB at a time"""
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def feature_cache_path(csv_path, key_fields, cache_dir=TRAINING_CACHE_DIR):
+    """
+    Cache file for the feature matrix prepared from this CSV
+
+    Args:
+        csv_path: Path of the CSV
+        key_fields: JSON-serializable description of how features are prepared;
+                    changing it (e.g. the feature list) invalidates the cache
+        cache_dir: Directory holding cached matrices
+    """
+    key = hashlib.sha256(
+        (csv_content_hash(csv_path) + json.dumps(key_fields, sort_keys=True)).encode()
+    ).hexdigest()[:32]
+    return os.path.join(cache_dir, f"features-{key}.npz")
+
+
+def load_feature_matrix(csv_path, columns, prepare, key_fields, use_cache=True,
+                        cache_dir=TRAINING_CACHE_DIR, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Prepared float32 feature matrix and labels, from the cache when possible
+
+    Args:
+        csv_path: Path of the CSV
+        columns: Columns `prepare` needs
+        prepare: Function mapping the loaded DataFrame to (X, y)
+        key_fields: Description of the preparation, part of the cache key
+        use_cache: Read and write the binary cache
+        cache_dir: Directory holding cached matrices
+        chunk_rows: Rows per CSV chunk on a cache miss
+
+    Returns:
+        Tuple of (X float32 array, y array, info dictionary)
+    """
+    info = {'cache': 'disabled', 'cache_path': None}
+    if use_cache:
+        path = feature_cache_path(csv_path, key_fields, cache_dir)
+        info['cache_path'] = path
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                info['cache'] = 'hit'
+                return cached['X'], cached['y'], info
+        info['cache'] = 'miss'
+
+    df = read_columns(csv_path, columns, chunk_rows)
+    info['rows_read'] = len(df)
+    X, y = prepare(df)
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y)
+
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, X=X, y=y)
+        os.replace(tmp_path, path)
+    return X, y, info
+
+
+def row_fingerprints(X, y):
+    """
+    64-bit fingerprint of every prepared record (feature row plus label)
+
+    A record that is new, or whose features or label changed, gets a
+    fingerprint that an earlier training run did not see.
+
+    Args:
+        X: Feature matrix
+        y: Labels
+
+    Returns:
+        uint64 array with one fingerprint per row
+    """
+    words = np.ascontiguousarray(X, dtype=np.float32).view(np.uint32).astype(np.uint64)
+    labels = np.asarray(y).astype(np.uint64)
+    h = np.full(len(words), 0xcbf29ce484222325, dtype=np.uint64)
+    prime = np.uint64(0x100000001b3)
+    with np.errstate(over='ignore'):
+        # FNV-1a over the 32-bit words, then a 64-bit finalizer so the low
+        # bits are usable for sampling
+        for column in np.column_stack([words, labels]).T:
+            h = (h ^ column) * prime
+        h ^= h >> np.uint64(33)
+        h *= np.uint64(0xff51afd7ed558ccd)
+        h ^= h >> np.uint64(33)
+    return h
@@ -6,6 +6,7 @@ if (!isset($_SESSION['patient_id'])) {
     exit;
 }
 require_once 'db.php';
+require_once 'includes/functions.php';
 
 $message = "";
 if ($_SERVER['REQUEST_METHOD'] === 'POST') {
@@ -22,6 +23,8 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST') {
     $stmt->bind_param("idddddss", $patient_id, $CA125, $HE4, $heart_rate, $temperature, $sleep_hours, $symptoms, $recorded_at);
     if ($stmt->execute()) {
         $message = "Data saved successfully.";
+        // Risk is recomputed by the background worker, not on this request
+        enqueue_risk_recompute($patient_id);
     } else {
         $message = "Failed to save data.";
     }
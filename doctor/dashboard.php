@@ -102,41 +102,44 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST' && isset($_POST['patient_id'])) {
                 }
             }
 
-            // Calculate risk automatically after saving biomarker data
-            // Fetch previous biomarker data to calculate velocity
-            $prev_stmt = $conn->prepare("SELECT CA125, HE4, recorded_at FROM biomarker_data WHERE patient_id = ? AND recorded_at < ? ORDER BY recorded_at DESC LIMIT 1");
-            $prev_stmt->bind_param("is", $patient_id, $recorded_at);
-            $prev_stmt->execute();
-            $prev_result = $prev_stmt->get_result();
-            $prev_data = $prev_result->fetch_assoc();
-            $prev_stmt->close();
-            
-            $ca125_velocity = 0;
-            $he4_velocity = 0;
-            
-            if ($prev_data) {
-                $time_diff = (strtotime($recorded_at) - strtotime($prev_data['recorded_at'])) / 86400; // days
-                if ($time_diff > 0) {
-                    $ca125_velocity = ($CA125 - $prev_data['CA125']) / $time_diff;
-                    $he4_velocity = ($HE4 - $prev_data['HE4']) / $time_diff;
+            // Recompute risk in the background worker; the simple rules below
+            // only run when the queue is unavailable or no worker is draining it
+            if (!enqueue_risk_recompute($patient_id)) {
+                // Fetch previous biomarker data to calculate velocity
+                $prev_stmt = $conn->prepare("SELECT CA125, HE4, recorded_at FROM biomarker_data WHERE patient_id = ? AND recorded_at < ? ORDER BY recorded_at DESC LIMIT 1");
+                $prev_stmt->bind_param("is", $patient_id, $recorded_at);
+                $prev_stmt->execute();
+                $prev_result = $prev_stmt->get_result();
+                $prev_data = $prev_result->fetch_assoc();
+                $prev_stmt->close();
+                
+                $ca125_velocity = 0;
+                $he4_velocity = 0;
+                
+                if ($prev_data) {
+                    $time_diff = (strtotime($recorded_at) - strtotime($prev_data['recorded_at'])) / 86400; // days
+                    if ($time_diff > 0) {
+                        $ca125_velocity = ($CA125 - $prev_data['CA125']) / $time_diff;
+                        $he4_velocity = ($HE4 - $prev_data['HE4']) / $time_diff;
+                    }
                 }
+                
+                // Simple risk calculation (you can enhance this with ML API call)
+                $risk_score = 0;
+                if ($CA125 > 35) $risk_score += 0.3;
+                if ($HE4 > 140) $risk_score += 0.3;
+                if ($ca125_velocity > 5) $risk_score += 0.2;
+                if ($he4_velocity > 10) $risk_score += 0.2;
+                
+                $probability = min($risk_score, 1.0);
+                $risk_tier = get_risk_tier($probability);
+                
+                // Insert into risk_history
+                $risk_stmt = $conn->prepare("INSERT INTO risk_history (patient_id, risk_score, risk_tier, probability, ca125, he4, ca125_velocity, he4_velocity, calculated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)");
+                $risk_stmt->bind_param("idssdddds", $patient_id, $risk_score, $risk_tier, $probability, $CA125, $HE4, $ca125_velocity, $he4_velocity, $recorded_at);
+                $risk_stmt->execute();
+                $risk_stmt->close();
             }
-            
-            // Simple risk calculation (you can enhance this with ML API call)
-            $risk_score = 0;
-            if ($CA125 > 35) $risk_score += 0.3;
-            if ($HE4 > 140) $risk_score += 0.3;
-            if ($ca125_velocity > 5) $risk_score += 0.2;
-            if ($he4_velocity > 10) $risk_score += 0.2;
-            
-            $probability = min($risk_score, 1.0);
-            $risk_tier = get_risk_tier($probability);
-            
-            // Insert into risk_history
-            $risk_stmt = $conn->prepare("INSERT INTO risk_history (patient_id, risk_score, risk_tier, probability, ca125, he4, ca125_velocity, he4_velocity, calculated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)");
-            $risk_stmt->bind_param("idssdddds", $patient_id, $risk_score, $risk_tier, $probability, $CA125, $HE4, $ca125_velocity, $he4_velocity, $recorded_at);
-            $risk_stmt->execute();
-            $risk_stmt->close();
         } else {
             $message = 'Failed to save biomarker data.';
             $message_type = 'danger';
@@ -150,6 +153,7 @@ $query = "SELECT id, name, email, age FROM patients WHERE user_type = 'patient'
 $result = $conn->query($query);
 $patients = [];
 $risk_stats = ['Low' => 0, 'Moderate' => 0, 'High' => 0, 'Critical' => 0];
+$ml_pending = [];
 
 while ($row = $result->fetch_assoc()) {
     $patient_id = $row['id'];
@@ -199,22 +203,47 @@ while ($row = $result->fetch_assoc()) {
                 "Weight_Change" => 0.0
             ];
 
-            $ml_result = call_ml_api('/predict', $payload);
-            if (is_array($ml_result) && empty($ml_result['error'])) {
-                if (isset($ml_result['probability'])) {
-                    $row['probability'] = floatval($ml_result['probability']);
-                    $row['risk_tier'] = get_risk_tier($row['probability']);
-                    $row['calculated_at'] = $row['recorded_at'];
-                } elseif (isset($ml_result['risk'])) {
-                    $row['probability'] = $ml_result['risk'] ? 0.75 : 0.25;
-                    $row['risk_tier'] = $ml_result['risk'] ? 'High' : 'Low';
-                    $row['calculated_at'] = $row['recorded_at'];
-                }
-            }
+            // Scored together with the other pending patients after the loop
+            $ml_pending[count($patients)] = $payload;
         }
     }
     
     $patients[] = $row;
+}
+
+// Patients without risk_history are scored by the background worker; only
+// when the queue is unavailable or no worker is draining it are they scored
+// here in one batch request
+$pending_ids = [];
+foreach (array_keys($ml_pending) as $index) {
+    $pending_ids[] = $patients[$index]['id'];
+}
+if (!empty($ml_pending) && enqueue_risk_recompute($pending_ids)) {
+    foreach (array_keys($ml_pending) as $index) {
+        $patients[$index]['risk_pending'] = true;
+    }
+} elseif (!empty($ml_pending)) {
+    $ml_result = call_ml_api('/predict-batch', ['records' => array_values($ml_pending)]);
+    if (is_array($ml_result) && empty($ml_result['error']) && isset($ml_result['predictions'])) {
+        foreach (array_keys($ml_pending) as $i => $index) {
+            $prediction = $ml_result['predictions'][$i] ?? null;
+            if (!$prediction) {
+                continue;
+            }
+            if (isset($prediction['probability'])) {
+                $patients[$index]['probability'] = floatval($prediction['probability']);
+                $patients[$index]['risk_tier'] = get_risk_tier($patients[$index]['probability']);
+                $patients[$index]['calculated_at'] = $patients[$index]['recorded_at'];
+            } elseif (isset($prediction['risk'])) {
+                $patients[$index]['probability'] = $prediction['risk'] ? 0.75 : 0.25;
+                $patients[$index]['risk_tier'] = $prediction['risk'] ? 'High' : 'Low';
+                $patients[$index]['calculated_at'] = $patients[$index]['recorded_at'];
+            }
+        }
+    }
+}
+
+foreach ($patients as $row) {
     $tier = $row['risk_tier'];
     if ($tier && isset($risk_stats[$tier])) {
         $risk_stats[$tier]++;
@@ -458,7 +487,7 @@ $total_patients = count($patients);
                                         <td><?php echo htmlspecialchars($patient['email']); ?></td>
                                         <td>
                                             <?php
-                                            $tier = $patient['risk_tier'] ?? 'Unknown';
+                                            $tier = $patient['risk_tier'] ?? (!empty($patient['risk_pending']) ? 'Pending' : 'Unknown');
                                             $color = get_risk_tier_color($tier);
                                             ?>
                                             <span class="glass-badge" style="background-color: <?php echo $color; ?>20; border-color: <?php echo $color; ?>; color: <?php echo $color; ?>;">
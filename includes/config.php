@@ -21,6 +21,13 @@ define('SESSION_TIMEOUT', 1800); // 30 minutes in seconds
 define('ML_API_URL', 'http://127.0.0.1:5000');
 define('ML_API_TIMEOUT', 6);
 
+// Background risk recompute queue (created by backend/risk_worker.py)
+define('RISK_QUEUE_DB', getenv('OVCARE_RISK_QUEUE_DB') ?: dirname(__DIR__) . '/backend/risk_queue.db');
+// Pages score inline when no worker has written a heartbeat for this long, or
+// when a due job has been waiting this long (the worker is alive but stuck)
+define('RISK_WORKER_HEARTBEAT_MAX_AGE', (int) (getenv('OVCARE_RISK_WORKER_HEARTBEAT_MAX_AGE') ?: 60));
+define('RISK_QUEUE_MAX_WAIT', (int) (getenv('OVCARE_RISK_QUEUE_MAX_WAIT') ?: 300));
+
 // Risk tier thresholds
 define('RISK_TIER_LOW', 0.25);
 define('RISK_TIER_MODERATE', 0.50);
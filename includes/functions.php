@@ -258,6 +258,55 @@ function call_ml_api($endpoint, $data) {
     return $result;
 }
 
+/**
+ * Queue a background risk recompute for the given patients
+ * Returns false when the queue is unavailable (worker never started,
+ * pdo_sqlite missing) or no worker is draining it (no heartbeat within
+ * RISK_WORKER_HEARTBEAT_MAX_AGE, or a due job has waited longer than
+ * RISK_QUEUE_MAX_WAIT) so callers can fall back to scoring inline. Jobs are
+ * still queued in the latter case and run once a worker is back.
+ */
+function enqueue_risk_recompute($patient_ids) {
+    $patient_ids = array_values(array_unique(array_map('intval', (array) $patient_ids)));
+    if (empty($patient_ids)) {
+        return true;
+    }
+    if (!file_exists(RISK_QUEUE_DB) || !in_array('sqlite', PDO::getAvailableDrivers())) {
+        return false;
+    }
+    
+    try {
+        $queue = new PDO('sqlite:' . RISK_QUEUE_DB, null, null, [
+            PDO::ATTR_ERRMODE => PDO::ERRMODE_EXCEPTION,
+            PDO::ATTR_TIMEOUT => 5
+        ]);
+        $now = microtime(true);
+        $health = $queue->prepare("SELECT (SELECT MAX(beat_at) FROM worker_heartbeats), (SELECT MIN(available_at) FROM risk_jobs WHERE status = 'pending' AND available_at <= ?)");
+        $health->execute([$now]);
+        list($beat_at, $oldest_due) = $health->fetch(PDO::FETCH_NUM);
+        $draining = true;
+        if ($beat_at === null || $now - $beat_at > RISK_WORKER_HEARTBEAT_MAX_AGE) {
+            error_log('Risk worker heartbeat is stale; scoring inline');
+            $draining = false;
+        } elseif ($oldest_due !== null && $now - $oldest_due > RISK_QUEUE_MAX_WAIT) {
+            error_log('Risk queue is not draining; scoring inline');
+            $draining = false;
+        }
+        
+        $queue->beginTransaction();
+        // At most one pending job per patient; repeated saves collapse into it
+        $stmt = $queue->prepare("INSERT OR IGNORE INTO risk_jobs (patient_id, status, attempts, enqueued_at, available_at) VALUES (?, 'pending', 0, ?, ?)");
+        foreach ($patient_ids as $patient_id) {
+            $stmt->execute([$patient_id, $now, $now]);
+        }
+        $queue->commit();
+        return $draining;
+    } catch (PDOException $e) {
+        error_log('Risk queue unavailable: ' . $e->getMessage());
+        return false;
+    }
+}
+
 /**
  * Create notification
  */
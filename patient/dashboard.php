@@ -52,8 +52,11 @@ if ($risk_summary) {
   $risk_tier = $risk_summary['risk_tier'];
   $probability = $risk_summary['probability'];
   $risk = ($risk_tier === 'High' || $risk_tier === 'Critical') ? 1 : 0;
+} elseif ($latest && enqueue_risk_recompute($patient_id)) {
+    // No risk_history yet: the background worker scores this patient shortly
+    $risk_tier = 'Pending';
 } elseif ($latest) {
-    // Fallback: Call ML API if no risk_history exists
+    // Fallback: Call ML API if no risk_history exists and no worker is draining the queue
     $payload = [
         "Age" => $patient_age,
         "CA125_Level" => floatval($latest['CA125']),
@@ -347,6 +350,10 @@ if ($latest) {
       <div class="alert-modern alert-success">
         <i class="fas fa-check-circle me-2"></i><strong>Low Risk Status</strong> — Continue regular monitoring and maintain healthy lifestyle habits.
       </div>
+    <?php elseif ($risk_tier === 'Pending'): ?>
+      <div class="alert-modern alert-info">
+        <i class="fas fa-hourglass-half me-2"></i><strong>Assessment in progress</strong> — Your latest readings are being analysed. Refresh in a moment to see your risk assessment.
+      </div>
     <?php elseif (!empty($explanation['error'])): ?>
       <div class="alert-modern alert-warning">
         <i class="fas fa-info-circle me-2"></i><strong>Note:</strong> <?php echo htmlentities($explanation['error']); ?>
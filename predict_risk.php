@@ -9,11 +9,9 @@ $res = $conn->query($sql);
 if($res->num_rows == 1) {
   $data = $res->fetch_assoc();
   $payload = [
-    "CA125" => floatval($data["CA125"]),
-    "HE4" => floatval($data["HE4"]),
-    "hr" => floatval($data["heart_rate"]),
-    "temp" => floatval($data["temperature"]),
-    "sleep" => floatval($data["sleep_hours"])
+    "CA125_Level" => floatval($data["CA125"]),
+    "HE4_Level" => floatval($data["HE4"]),
+    "WBC" => floatval($data["heart_rate"]) * 100
   ];
   
   $ch = curl_init('http://localhost:5000/predict');
@@ -24,12 +22,20 @@ if($res->num_rows == 1) {
   $python_output = json_decode($response, true);
   curl_close($ch);
 
-  // Dummy SHAP-style explanation (normally from Python)
-  $explanation = [
-    "CA125" => $payload["CA125"] >= 35 ? "High" : "Normal",
-    "HE4" => $payload["HE4"] >= 140 ? "High" : "Normal",
-    "Symptoms" => $data["symptoms"]
-  ];
+  // Per-patient feature contributions (log-odds) from the ML service,
+  // falling back to reference-range flags when it returns none
+  $explanation = [];
+  if (!empty($python_output["feature_contributions"]["contributions"])) {
+    foreach ($python_output["feature_contributions"]["contributions"] as $item) {
+      $explanation[$item["feature"]] = round($item["contribution"], 4);
+    }
+  } else {
+    $explanation = [
+      "CA125" => $payload["CA125_Level"] >= 35 ? "High" : "Normal",
+      "HE4" => $payload["HE4_Level"] >= 140 ? "High" : "Normal"
+    ];
+  }
+  $explanation["Symptoms"] = $data["symptoms"];
 
   echo json_encode([
     "risk" => $python_output["risk"],